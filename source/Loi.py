@@ -1,39 +1,37 @@
+import time
+STARTUP_BEGIN = time.perf_counter()
+
+import sys
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import os
-import re
+from tkinter import ttk, messagebox
 from datetime import datetime
 
-class BillEntry:
-    def __init__(self, date, name, amount, note=""):
-        self.date = date
-        self.name = name
-        self.amount = amount
-        self.note = note
+from appbase import BillAppBase
+from oplog import LOG_ERROR, LOG_WARNING
+from perf import profiler, timings
+from session import session_value, valid_geometry
+from startup import StartupProfile
 
-class BillApp:
-    def __init__(self, root):
+class BillApp(BillAppBase):
+    def __init__(self, root, startup_profile=None):
         self.root = root
         self.root.title("账单记录软件")
         self.root.geometry("1200x800")
         
-        # 初始化数据
-        self.current_file = None
-        self.bill_data = []  # 原始数据
-        self.display_data = []  # 显示数据
-        self.selected_items = []
-        self.undo_stack = []
-        self.font_size = 10  # 默认字体大小
-        self.modified = False  # 跟踪是否有未保存的修改
-        
-        # 排序状态
-        self.sort_column = None
-        self.sort_reverse = False
+        # 数据、排序、筛选、日志等共用的状态
+        self.init_state()
         
-        # 创建界面
+        # 创建界面；扫描和加载账单推迟到首帧绘制之后
+        self.startup_profile = startup_profile or StartupProfile(time.perf_counter())
         self.create_widgets()
         self.create_menu()
-        self.load_available_files()
+        geometry = session_value(self.session, "geometry", "")
+        if valid_geometry(geometry):
+            self.root.geometry(geometry)
+        if self.font_size != 10:
+            self.update_font_size()
+        self.startup_profile.mark("创建界面")
+        self.root.after(0, self.finish_startup)
         
         # 绑定快捷键
         self.bind_shortcuts()
@@ -57,6 +55,28 @@ class BillApp:
         font_menu.add_command(label="中", command=lambda: self.set_font_size(10))
         font_menu.add_command(label="大", command=lambda: self.set_font_size(12))
         
+        # 结余列
+        settings_menu.add_command(label="显示/隐藏结余列", command=self.toggle_balance_column)
+        settings_menu.add_command(label="按日期分组/列表视图", command=self.toggle_day_groups)
+        settings_menu.add_command(label="开启/关闭操作日志文件", command=self.toggle_log_file)
+        settings_menu.add_command(label="日志面板行数...", command=self.set_log_lines)
+        
+        # 工具菜单
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="工具", menu=tools_menu)
+        tools_menu.add_command(label="分组报表", command=self.show_report)
+        tools_menu.add_command(label="透视表", command=self.show_pivot)
+        tools_menu.add_command(label="批量录入", command=self.show_bulk_entry)
+        tools_menu.add_command(label="周期条目", command=self.show_recurring)
+        tools_menu.add_command(label="导入", command=self.show_import)
+        tools_menu.add_command(label="导出", command=self.show_export)
+        tools_menu.add_command(label="重新加载预算", command=self.reload_budgets)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="开启/关闭计时", command=self.toggle_timings)
+        tools_menu.add_command(label="耗时统计", command=self.show_timings)
+        tools_menu.add_command(label="开启/关闭 Tk 调用统计", command=self.toggle_tk_trace)
+        tools_menu.add_command(label="Tk 调用统计", command=self.show_tk_calls)
+        
     def set_font_size(self, size):
         self.font_size = size
         self.update_font_size()
@@ -83,33 +103,48 @@ class BillApp:
         display_frame = ttk.LabelFrame(main_frame, text="账单内容", padding="5")
         display_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(0, 10))
         
+        # 筛选框：输入时即时筛选表格
+        filter_frame = ttk.Frame(display_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        ttk.Label(filter_frame, text="筛选:").pack(side=tk.LEFT, padx=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", self.on_filter_change)
+        self.filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.filter_entry.bind('<Escape>', lambda e: self.filter_var.set(""))
+        
         # 创建Treeview
-        columns = ("date", "name", "amount", "note")
-        self.tree = ttk.Treeview(display_frame, columns=columns, show="headings", selectmode="extended")
+        columns = ("date", "name", "amount", "note", "balance")
+        self.tree = ttk.Treeview(display_frame, columns=columns, show="headings", selectmode="extended",
+                                 displaycolumns=("date", "name", "amount", "note"))
         
         # 定义列
         self.tree.heading("date", text="日期", command=lambda: self.sort_treeview("date"))
         self.tree.heading("name", text="名称", command=lambda: self.sort_treeview("name"))
         self.tree.heading("amount", text="流水", command=lambda: self.sort_treeview("amount"))
         self.tree.heading("note", text="备注", command=lambda: self.sort_treeview("note"))
+        self.tree.heading("balance", text="结余")
         
         # 设置列宽
         self.tree.column("date", width=100)
         self.tree.column("name", width=150)
         self.tree.column("amount", width=120)
         self.tree.column("note", width=250)
+        self.tree.column("balance", width=120)
+        self.tree.column("#0", width=40, stretch=False)  # 分组视图的展开标记列
         
         # 添加滚动条
         v_scrollbar = ttk.Scrollbar(display_frame, orient=tk.VERTICAL, command=self.tree.yview)
         h_scrollbar = ttk.Scrollbar(display_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
         self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
         
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        v_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        h_scrollbar.grid(row=2, column=0, sticky=(tk.W, tk.E))
         
         # 绑定选择事件
         self.tree.bind('<<TreeviewSelect>>', self.on_item_select)
+        self.tree.bind('<<TreeviewOpen>>', self.on_day_group_open)
         
         # 工作区域
         work_frame = ttk.LabelFrame(main_frame, text="工作区域", padding="5")
@@ -175,10 +210,18 @@ class BillApp:
         
         self.same_type_var = tk.StringVar()
         self.same_type_var.set("同类流水: 0.0")
-        ttk.Label(stats_frame, textvariable=self.same_type_var, font=("Arial", 12)).grid(row=0, column=2)
+        ttk.Label(stats_frame, textvariable=self.same_type_var, font=("Arial", 12)).grid(row=0, column=2, padx=(0, 20))
+        
+        self.balance_var = tk.StringVar()
+        self.balance_var.set("累计结余: 0.0")
+        ttk.Label(stats_frame, textvariable=self.balance_var, font=("Arial", 12)).grid(row=0, column=3, padx=(0, 20))
+        
+        self.budget_var = tk.StringVar()
+        self.budget_var.set("预算: 未设置")
+        ttk.Label(stats_frame, textvariable=self.budget_var, font=("Arial", 12)).grid(row=0, column=4)
         
         # 字体大小提示
-        ttk.Label(stats_frame, text="Ctrl+加号/减号或Ctrl+鼠标滚轮调整字体大小  <<按下 ctrl+H 查阅帮助>>", font=("Arial", 9)).grid(row=1, column=0, columnspan=3, pady=(5, 0))
+        ttk.Label(stats_frame, text="Ctrl+加号/减号或Ctrl+鼠标滚轮调整字体大小  <<按下 ctrl+H 查阅帮助>>", font=("Arial", 9)).grid(row=1, column=0, columnspan=5, pady=(5, 0))
         
         # 日志区域
         log_frame = ttk.LabelFrame(main_frame, text="日志", padding="5")
@@ -189,6 +232,8 @@ class BillApp:
         log_scrollbar = ttk.Scrollbar(log_frame, orient=tk.VERTICAL, command=self.log_text.yview)
         self.log_text.configure(yscrollcommand=log_scrollbar.set)
         
+        self.log_text.tag_configure(LOG_WARNING, foreground="#d08000")
+        self.log_text.tag_configure(LOG_ERROR, foreground="#d03030")
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         log_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
@@ -202,7 +247,7 @@ class BillApp:
         main_frame.rowconfigure(3, weight=0)  # 日志区域不需要太多空间
         
         display_frame.columnconfigure(0, weight=1)
-        display_frame.rowconfigure(0, weight=1)
+        display_frame.rowconfigure(1, weight=1)
         
         work_frame.columnconfigure(0, weight=1)
         form_frame.columnconfigure(1, weight=1)
@@ -210,60 +255,6 @@ class BillApp:
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
         
-    def sort_treeview(self, column):
-        """根据列进行排序"""
-        # 如果点击的是当前排序列，则切换排序方向
-        if self.sort_column == column:
-            self.sort_reverse = not self.sort_reverse
-        else:
-            self.sort_column = column
-            self.sort_reverse = False
-        
-        # 更新表头箭头指示
-        for col in ["date", "name", "amount", "note"]:
-            if col == column:
-                arrow = " ↓" if self.sort_reverse else " ↑"
-                self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", "") + arrow)
-            else:
-                self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", ""))
-        
-        # 对显示数据进行排序
-        if column == "date":
-            self.display_data.sort(key=lambda x: x.date, reverse=self.sort_reverse)
-        elif column == "name":
-            self.display_data.sort(key=lambda x: x.name, reverse=self.sort_reverse)
-        elif column == "amount":
-            # 特殊处理：将金额转换为数字进行排序
-            def amount_key(x):
-                try:
-                    if x.amount.startswith('+'):
-                        return float(x.amount[1:])
-                    else:
-                        return float(x.amount)
-                except ValueError:
-                    return 0
-            self.display_data.sort(key=amount_key, reverse=self.sort_reverse)
-        elif column == "note":
-            self.display_data.sort(key=lambda x: x.note, reverse=self.sort_reverse)
-        
-        # 刷新显示
-        self.refresh_treeview()
-        self.log_message(f"已按{column} {'降序' if self.sort_reverse else '升序'}排序")
-        
-    def reset_display(self):
-        """重置显示为原始顺序"""
-        self.sort_column = None
-        self.sort_reverse = False
-        
-        # 清除表头箭头
-        for col in ["date", "name", "amount", "note"]:
-            self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", ""))
-        
-        # 恢复原始显示顺序
-        self.display_data = self.bill_data.copy()
-        self.refresh_treeview()
-        self.log_message("已重置显示顺序")
-        
     def bind_shortcuts(self):
         self.root.bind('<Control-n>', lambda e: self.add_item())
         self.root.bind('<Control-N>', lambda e: self.add_item())
@@ -281,6 +272,13 @@ class BillApp:
         self.root.bind('<Control-MouseWheel>', self.on_mousewheel)
         self.root.bind('<Control-h>', lambda e: self.show_help())
         self.root.bind('<Control-H>', lambda e: self.show_help())
+        self.root.bind('<Control-b>', lambda e: self.show_bulk_entry())
+        self.root.bind('<Control-B>', lambda e: self.show_bulk_entry())
+        self.root.bind('<F9>', self.toggle_profiling)
+        self.root.bind('<Control-l>', lambda e: self.focus_filter())
+        self.root.bind('<Control-g>', lambda e: self.toggle_day_groups())
+        self.root.bind('<Control-G>', lambda e: self.toggle_day_groups())
+        self.root.bind('<Control-L>', lambda e: self.focus_filter())
         self.root.bind('<Control-m>', lambda e: self.show_statistics())
         self.root.bind('<Control-M>', lambda e: self.show_statistics())
         self.root.bind('<Control-Up>', lambda e: self.move_up())
@@ -288,74 +286,6 @@ class BillApp:
         self.root.bind('<Control-r>', lambda e: self.reset_display())
         self.root.bind('<Control-R>', lambda e: self.reset_display())
         
-    def log_message(self, message):
-        """在日志区域添加消息"""
-        now = datetime.now().strftime("%H:%M")
-        self.log_text.insert(tk.END, f"[{now}] {message}\n")
-        self.log_text.see(tk.END)  # 自动滚动到底部
-        
-    def move_up(self):
-	    """上移选中条目"""
-	    if not self.selected_items:
-	        return
-	    # 如果当前是排序状态，先重置显示
-	    if self.sort_column is not None:
-	        self.reset_display()
-	    # 保存当前状态以便撤销
-	    self.save_state()
-	    self.modified = True
-	    # 获取所有选中项目的索引
-	    indices = [self.tree.index(item) for item in self.selected_items]
-	    # 如果最上面的项目已经是第一个，则不能上移
-	    if min(indices) == 0:
-	        return
-	    # 移动数据
-	    for index in sorted(indices):
-	        # 交换数据
-	        self.bill_data[index], self.bill_data[index-1] = self.bill_data[index-1], self.bill_data[index]
-	    if self.sort_column is None:
-	        self.display_data = self.bill_data.copy()
-	    # 更新Treeview
-	    self.refresh_treeview()
-	    # 重新选中移动后的项目
-	    new_indices = [i-1 for i in indices]
-	    self.tree.selection_set([self.tree.get_children()[i] for i in new_indices])
-	    self.log_message("已上移选中条目")
-        
-    def move_down(self):
-	    """下移选中条目"""
-	    if not self.selected_items:
-	        return
-	    # 如果当前是排序状态，先重置显示
-	    if self.sort_column is not None:
-	        self.reset_display()
-	    # 保存当前状态以便撤销
-	    self.save_state()
-	    self.modified = True
-	    # 获取所有选中项目的索引
-	    indices = [self.tree.index(item) for item in self.selected_items]
-	    # 如果最下面的项目已经是最后一个，则不能下移
-	    if max(indices) == len(self.bill_data) - 1:
-	        return
-	    # 移动数据（从下往上处理）
-	    for index in sorted(indices, reverse=True):
-	        # 交换数据
-	        self.bill_data[index], self.bill_data[index+1] = self.bill_data[index+1], self.bill_data[index]
-	    if self.sort_column is None:
-	        self.display_data = self.bill_data.copy()
-	    # 更新Treeview
-	    self.refresh_treeview()
-	    # 重新选中移动后的项目
-	    new_indices = [i+1 for i in indices]
-	    self.tree.selection_set([self.tree.get_children()[i] for i in new_indices])
-	    self.log_message("已下移选中条目")
-        
-    def refresh_treeview(self):
-        """刷新Treeview显示"""
-        self.tree.delete(*self.tree.get_children())
-        for entry in self.display_data:
-            self.tree.insert("", "end", values=(entry.date, entry.name, entry.amount, entry.note))
-        
     def increase_font(self, event=None):
         self.font_size = min(20, self.font_size + 1)
         self.update_font_size()
@@ -364,12 +294,6 @@ class BillApp:
         self.font_size = max(8, self.font_size - 1)
         self.update_font_size()
         
-    def on_mousewheel(self, event):
-        if event.delta > 0:
-            self.increase_font()
-        else:
-            self.decrease_font()
-            
     def update_font_size(self):
         # 更新Treeview的字体大小
         style = ttk.Style()
@@ -413,10 +337,14 @@ class BillApp:
 - Ctrl+U: 修改选中条目
 - Delete: 删除选中条目
 - Ctrl+F: 查找条目
+- Ctrl+G: 按日期分组显示（每日条数和小计，展开查看条目；编辑时自动切换回列表）
+- Ctrl+L: 筛选（在表格上方的筛选框中输入即筛选，Esc 清空）
 - Ctrl+S: 保存文件
 - Ctrl+Z: 撤销操作
 - Ctrl+H: 显示帮助
 - Ctrl+M: 高级统计
+- Ctrl+B: 批量录入（可粘贴多行）
+- F9: 开始/停止性能采样（结果保存在 .loi/profiles）
 - Ctrl+上/下: 上下移动选中条目
 - Ctrl+R: 重置显示顺序
 - Ctrl+加号/减号: 调整字体大小
@@ -427,6 +355,7 @@ class BillApp:
 - 总流水: 显示所有条目的流水合计
 - 选中流水: 显示选中条目的流水合计
 - 同类流水: 显示与选中条目同名的所有条目的流水合计
+- 预算: 在 budget.md 中按名称或备注标签设置每月预算（表头为 | 类型 | 名称 | 预算 |，类型填"名称"或"标签"），显示剩余最少的几项，编辑后超出预算时提醒
 - 高级统计: 点击"统计"按钮或按Ctrl+M，可以进行多条件筛选统计
 
 数据格式:
@@ -458,210 +387,6 @@ class BillApp:
         y = self.root.winfo_y() + (self.root.winfo_height() - help_window.winfo_height()) // 2
         help_window.geometry(f"+{x}+{y}")
         
-    def show_statistics(self):
-        """显示高级统计窗口"""
-        if not self.bill_data:
-            messagebox.showinfo("提示", "没有数据可统计")
-            return
-            
-        stats_window = tk.Toplevel(self.root)
-        stats_window.title("高级统计")
-        stats_window.geometry("500x400")
-        stats_window.transient(self.root)
-        stats_window.grab_set()
-        
-        # 创建统计条件框架
-        condition_frame = ttk.LabelFrame(stats_window, text="统计条件", padding="10")
-        condition_frame.pack(fill="x", padx=10, pady=5)
-        
-        # 日期范围
-        ttk.Label(condition_frame, text="日期范围:").grid(row=0, column=0, sticky="w", pady=2)
-        date_frame = ttk.Frame(condition_frame)
-        date_frame.grid(row=0, column=1, sticky="ew", pady=2)
-        
-        self.start_date_var = tk.StringVar()
-        ttk.Entry(date_frame, textvariable=self.start_date_var, width=8).pack(side="left", padx=(0, 5))
-        ttk.Label(date_frame, text="至").pack(side="left", padx=5)
-        self.end_date_var = tk.StringVar()
-        ttk.Entry(date_frame, textvariable=self.end_date_var, width=8).pack(side="left")
-        
-        # 名称筛选
-        ttk.Label(condition_frame, text="名称包含:").grid(row=1, column=0, sticky="w", pady=2)
-        self.name_filter_var = tk.StringVar()
-        ttk.Entry(condition_frame, textvariable=self.name_filter_var, width=20).grid(row=1, column=1, sticky="w", pady=2)
-        
-        # 备注筛选
-        ttk.Label(condition_frame, text="备注包含:").grid(row=2, column=0, sticky="w", pady=2)
-        self.note_filter_var = tk.StringVar()
-        ttk.Entry(condition_frame, textvariable=self.note_filter_var, width=20).grid(row=2, column=1, sticky="w", pady=2)
-        
-        # 金额类型
-        ttk.Label(condition_frame, text="金额类型:").grid(row=3, column=0, sticky="w", pady=2)
-        self.amount_type_var = tk.StringVar(value="全部")
-        amount_frame = ttk.Frame(condition_frame)
-        amount_frame.grid(row=3, column=1, sticky="w", pady=2)
-        ttk.Radiobutton(amount_frame, text="全部", variable=self.amount_type_var, value="全部").pack(side="left")
-        ttk.Radiobutton(amount_frame, text="收入", variable=self.amount_type_var, value="收入").pack(side="left", padx=(10, 0))
-        ttk.Radiobutton(amount_frame, text="支出", variable=self.amount_type_var, value="支出").pack(side="left", padx=(10, 0))
-        
-        # 统计按钮
-        button_frame = ttk.Frame(stats_window)
-        button_frame.pack(fill="x", padx=10, pady=5)
-        
-        ttk.Button(button_frame, text="统计", command=lambda: self.calculate_advanced_stats(stats_window)).pack(side="left", padx=(0, 10))
-        ttk.Button(button_frame, text="关闭", command=stats_window.destroy).pack(side="left")
-        
-        # 结果显示区域
-        result_frame = ttk.LabelFrame(stats_window, text="统计结果", padding="10")
-        result_frame.pack(fill="both", expand=True, padx=10, pady=5)
-        
-        self.stats_result_var = tk.StringVar()
-        self.stats_result_var.set("请设置条件后点击\"统计\"按钮")
-        ttk.Label(result_frame, textvariable=self.stats_result_var, wraplength=400).pack(anchor="w")
-        
-        # 居中显示
-        stats_window.update_idletasks()
-        x = self.root.winfo_x() + (self.root.winfo_width() - stats_window.winfo_width()) // 2
-        y = self.root.winfo_y() + (self.root.winfo_height() - stats_window.winfo_height()) // 2
-        stats_window.geometry(f"+{x}+{y}")
-        
-    def calculate_advanced_stats(self, stats_window):
-        """根据条件计算高级统计"""
-        # 获取筛选条件
-        start_date = self.start_date_var.get().strip()
-        end_date = self.end_date_var.get().strip()
-        name_filter = self.name_filter_var.get().strip()
-        note_filter = self.note_filter_var.get().strip()
-        amount_type = self.amount_type_var.get()
-        
-        # 筛选数据
-        filtered_data = []
-        for entry in self.bill_data:
-            # 日期筛选
-            if start_date and end_date:
-                try:
-                    date_num = int(entry.date)
-                    start_num = int(start_date)
-                    end_num = int(end_date)
-                    if not (start_num <= date_num <= end_num):
-                        continue
-                except ValueError:
-                    # 如果日期不是数字，使用字符串比较
-                    if not (start_date <= entry.date <= end_date):
-                        continue
-            elif start_date and entry.date != start_date:
-                continue
-            elif end_date and entry.date != end_date:
-                continue
-                
-            # 名称筛选
-            if name_filter and name_filter not in entry.name:
-                continue
-                
-            # 备注筛选
-            if note_filter and note_filter not in entry.note:
-                continue
-                
-            # 金额类型筛选
-            if amount_type == "收入" and not entry.amount.startswith('+'):
-                continue
-            if amount_type == "支出" and entry.amount.startswith('+'):
-                continue
-                
-            filtered_data.append(entry)
-        
-        # 计算统计结果
-        total = 0
-        income_count = 0
-        expense_count = 0
-        income_total = 0
-        expense_total = 0
-        
-        for entry in filtered_data:
-            amount = entry.amount
-            if amount.startswith('+'):
-                amount_value = float(amount[1:])
-                total += amount_value
-                income_count += 1
-                income_total += amount_value
-            else:
-                amount_value = float(amount)
-                total -= amount_value
-                expense_count += 1
-                expense_total += amount_value
-        
-        # 显示结果
-        result_text = f"符合条件的条目数: {len(filtered_data)}\n"
-        result_text += f"总收入条目: {income_count}, 总支出条目: {expense_count}\n"
-        result_text += f"总收入: {income_total:.2f}, 总支出: {expense_total:.2f}\n"
-        result_text += f"净收入: {total:.2f}"
-        
-        self.stats_result_var.set(result_text)
-        
-    def load_available_files(self):
-        files = [f for f in os.listdir('.') if f.endswith('.md') and re.match(r'^\d{6}\.md$', f)]
-        self.file_combo['values'] = files
-        if files and not self.file_var.get():
-            self.file_var.set(files[0])
-            self.load_file(files[0])
-            
-    def on_file_select(self, event):
-        if self.modified:
-            if messagebox.askyesno("保存修改", "当前文件已修改，是否保存？"):
-                self.save_file()
-            self.modified = False
-        self.load_file(self.file_var.get())
-        
-    def load_file(self, filename):
-        if not filename:
-            return
-            
-        self.current_file = filename
-        self.bill_data = []
-        self.display_data = []
-        self.tree.delete(*self.tree.get_children())
-        
-        # 重置排序状态
-        self.sort_column = None
-        self.sort_reverse = False
-        for col in ["date", "name", "amount", "note"]:
-            self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", ""))
-        
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            # 跳过文件头
-            start_index = 0
-            for i, line in enumerate(lines):
-                if line.startswith('| 日期'):
-                    start_index = i + 2  # 跳过表头和分隔线
-                    break
-                    
-            # 解析数据行
-            for i in range(start_index, len(lines)):
-                line = lines[i].strip()
-                if not line or not line.startswith('|'):
-                    continue
-                    
-                # 解析markdown表格行
-                parts = [part.strip() for part in line.split('|')[1:-1]]
-                if len(parts) >= 3:
-                    date, name, amount = parts[0], parts[1], parts[2]
-                    note = parts[3] if len(parts) > 3 else ""
-                    self.bill_data.append(BillEntry(date, name, amount, note))
-                    self.tree.insert("", "end", values=(date, name, amount, note))
-                    
-            # 初始化显示数据
-            self.display_data = self.bill_data.copy()
-            
-            self.calculate_totals()
-            self.modified = False
-            self.log_message(f"已加载文件: {filename}")
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"加载文件时出错: {str(e)}")
-            
     def new_file(self):
         """打开年月选择弹窗创建新文件"""
         # 创建年月选择对话框
@@ -721,353 +446,27 @@ class BillApp:
         ttk.Button(btn_frame, text="确定", command=create_file).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side="left", padx=5)
         
-    def create_and_load_file(self, filename):
-        """创建新的账单文件并加载"""
-        # 创建文件头
-        content = f"""# {filename[:4]}年{filename[4:6]}月账单
-
-| 日期 | 名称 | 流水 | 备注 |
-| ---- | ---- | ---- | ---- |
-"""
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(content)
-                
-            self.log_message(f"已创建新文件: {filename}")
-            self.load_available_files()
-            self.file_var.set(filename)
-            self.load_file(filename)
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"创建文件时出错: {str(e)}")
-            
-    def save_file(self):
-        if not self.current_file:
-            messagebox.showwarning("警告", "没有打开的文件")
-            return
-            
-        try:
-            # 生成文件内容
-            content = f"""# {self.current_file[:4]}年{self.current_file[4:6]}月账单
-
-| 日期 | 名称 | 流水 | 备注 |
-| ---- | ---- | ---- | ---- |
-"""
-            for entry in self.bill_data:
-                content += f"| {entry.date} | {entry.name} | {entry.amount} | {entry.note} |\n"
-                
-            with open(self.current_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-                
-            self.modified = False
-            self.log_message(f"已保存文件: {self.current_file}")
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"保存文件时出错: {str(e)}")
-            
-    def on_item_select(self, event):
-	    self.selected_items = list(self.tree.selection())
-	    self.update_form()
-	    self.calculate_totals()
-
-    def update_form(self):
-        """更新表单内容"""
-        if len(self.selected_items) == 1:
-            item = self.selected_items[0]
-            values = self.tree.item(item, 'values')
-            self.date_var.set(values[0])
-            self.name_var.set(values[1])
-            self.amount_var.set(values[2])
-            self.note_var.set(values[3] if len(values) > 3 else "")
-        else:
-            self.clear_form()
-            
-    def clear_form(self):
-        """清空表单"""
-        self.date_var.set("")
-        self.name_var.set("")
-        self.amount_var.set("")
-        self.note_var.set("")
-        
-    def add_item(self):
-	    """新增条目：插入到选中项之后，或末尾"""
-	    date = self.date_var.get().strip()
-	    name = self.name_var.get().strip()
-	    amount = self.amount_var.get().strip()
-	    note = self.note_var.get().strip()
-
-	    # 如果已有数据但表单为空，说明用户想新增，不报错
-	    # 但如果是第一次添加，允许用户填写表单后新增
-	    if not all([date, name, amount]):
-	        # 如果是占位状态（无数据），允许添加新条目而不报错，但需填写
-	        if not self.bill_data:
-	            messagebox.showwarning("警告", "请填写日期、名称和流水")
-	            return
-	        # 否则，允许插入空条目？我们不允许
-	        messagebox.showwarning("警告", "日期、名称和流水不能为空")
-	        return
-
-	    # 验证金额格式
-	    try:
-	        if amount.startswith('+'):
-	            float(amount[1:])
-	        else:
-	            float(amount)
-	    except ValueError:
-	        messagebox.showwarning("警告", "金额格式不正确")
-	        return
-
-	    # 保存状态用于撤销
-	    self.save_state()
-	    self.modified = True
-
-	    # 创建新条目
-	    new_entry = BillEntry(date, name, amount, note)
-
-	    # 确定插入位置
-	    insert_index = len(self.bill_data)  # 默认末尾
-	    if self.selected_items:
-	        # 插入到选中项的下一位
-	        last_selected = self.selected_items[-1]
-	        display_index = self.tree.index(last_selected)
-	        if self.sort_column is None:
-	            insert_index = display_index + 1
-	        else:
-	            insert_index = len(self.bill_data)
-
-	    # 插入到原始数据
-	    self.bill_data.insert(insert_index, new_entry)
-
-	    # 更新 display_data
-	    if self.sort_column is not None:
-	        self.reset_display()
-	    else:
-	        self.display_data.insert(insert_index, new_entry)
-	        self.refresh_treeview()
-
-	    # 选中新条目
-	    new_item = self.tree.get_children()[insert_index]
-	    self.tree.selection_set(new_item)
-	    self.tree.focus(new_item)
-	    self.tree.see(new_item)
-
-	    self.log_message(f"已添加条目: {name} {amount}")
-	    self.calculate_totals()
-	    self.clear_form()  # 清空表单，准备下一次输入
-        
-    def update_item(self):
-	    """修改选中条目，并在刷新后保持选中"""
-	    if not self.selected_items:
-	        messagebox.showwarning("警告", "请先选择要修改的条目")
-	        return
-
-	    date = self.date_var.get().strip()
-	    name = self.name_var.get().strip()
-	    amount = self.amount_var.get().strip()
-	    note = self.note_var.get().strip()
-
-	    if not all([date, name, amount]):
-	        messagebox.showwarning("警告", "日期、名称和流水不能为空")
-	        return
-
-	    # 验证金额格式
-	    try:
-	        if amount.startswith('+'):
-	            float(amount[1:])
-	        else:
-	            float(amount)
-	    except ValueError:
-	        messagebox.showwarning("警告", "金额格式不正确")
-	        return
-
-	    # 保存状态用于撤销
-	    self.save_state()
-	    self.modified = True
-
-	    # 记录每个选中项在 display_data 中的索引
-	    indices_to_update = []
-	    for item in self.selected_items:
-	        display_index = self.tree.index(item)
-	        indices_to_update.append(display_index)
-
-	    # 获取当前选中项对应的 display_data 条目
-	    updated_entries = []
-	    for idx in indices_to_update:
-	        old_entry = self.display_data[idx]
-	        # 创建新条目
-	        new_entry = BillEntry(date, name, amount, note)
-	        # 更新 display_data
-	        self.display_data[idx] = new_entry
-	        # 更新 bill_data：找到原始条目并替换
-	        try:
-	            original_index = self.bill_data.index(old_entry)
-	            self.bill_data[original_index] = new_entry
-	        except ValueError:
-	            # 安全查找匹配项
-	            for i, entry in enumerate(self.bill_data):
-	                if entry == old_entry:
-	                    self.bill_data[i] = new_entry
-	                    break
-	        updated_entries.append(new_entry)
-
-	    # 刷新界面
-	    self.refresh_treeview()
-
-	    # 恢复选中：根据之前记录的索引重新选中
-	    children = self.tree.get_children()
-	    new_selection = []
-	    for idx in indices_to_update:
-	        if idx < len(children):
-	            new_item = children[idx]
-	            new_selection.append(new_item)
-
-	    if new_selection:
-	        self.tree.selection_set(new_selection)
-	        self.tree.focus(new_selection[-1])  # 焦点设到最后一个
-	        self.tree.see(new_selection[-1])    # 滚动到可见
-
-	    # 更新 selected_items 和表单
-	    self.selected_items = new_selection
-	    self.update_form()  # 更新表单显示新值
-
-	    self.log_message(f"已更新 {len(updated_entries)} 个条目")
-	    self.calculate_totals()
-        
-    def delete_item(self):
-	    """删除选中条目，并保持选中状态"""
-	    if not self.selected_items:
-	        messagebox.showwarning("警告", "请先选择要删除的条目")
-	        return
-	    # 保存状态
-	    self.save_state()
-	    self.modified = True
-	    # 获取要删除的原始索引
-	    indices_to_delete = []
-	    for item in self.selected_items:
-	        display_index = self.tree.index(item)
-	        old_entry = self.display_data[display_index]
-	        try:
-	            original_index = self.bill_data.index(old_entry)
-	            indices_to_delete.append(original_index)
-	        except ValueError:
-	            continue
-	    indices_to_delete.sort(reverse=True)
-	    for index in indices_to_delete:
-	        del self.bill_data[index]
-	    self.reset_display()
-	    children = self.tree.get_children()
-	    if children:
-	        # 选中原来位置附近的项 (使用新的 children 列表)
-	        last_idx = max(0, indices_to_delete[-1] - 1)
-	        last_idx = min(last_idx, len(children) - 1)
-	        new_item = children[last_idx]
-	        self.tree.selection_set(new_item)
-	        self.tree.focus(new_item)
-	        self.tree.see(new_item)
-	    else:
-	        # 表格为空，清空表单
-	        self.clear_form()
-	    self.selected_items = self.tree.selection()
-	    self.log_message(f"已删除 {len(indices_to_delete)} 个条目")
-	    self.calculate_totals()
-        
-    def search_item(self):
-        keyword = simpledialog.askstring("查找", "请输入要查找的关键词:")
-        if not keyword:
-            return
-            
-        # 清除当前选择
-        self.tree.selection_remove(self.tree.selection())
-        
-        # 查找匹配的条目
-        found_items = []
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if any(keyword.lower() in str(value).lower() for value in values):
-                found_items.append(item)
-                
-        if found_items:
-            # 选中所有匹配的条目
-            for item in found_items:
-                self.tree.selection_add(item)
-                self.tree.focus(item)
-                self.tree.see(item)  # 滚动到可见位置
-                
-            self.log_message(f"找到 {len(found_items)} 个匹配的条目")
-        else:
-            messagebox.showinfo("查找结果", "没有找到匹配的条目")
-            self.log_message(f"未找到包含\"{keyword}\"的条目")
-            
-    def calculate_totals(self):
-        """计算总流水、选中流水和同类流水"""
-        self.selected_items = [item for item in self.selected_items if self.tree.exists(item)]
-        total = 0
-        selected_total = 0
-        same_type_total = 0
-        
-        # 计算总流水
-        for entry in self.bill_data:
-            amount = entry.amount
-            if amount.startswith('+'):
-                total += float(amount[1:])
-            else:
-                total -= float(amount)
-                
-        # 计算选中流水和同类名称
-        selected_names = set()
-        for item in self.selected_items:
-            values = self.tree.item(item, 'values')
-            amount = values[2]
-            if amount.startswith('+'):
-                selected_total += float(amount[1:])
-            else:
-                selected_total -= float(amount)
-            selected_names.add(values[1])
-            
-        # 计算同类流水
-        if selected_names:
-            for entry in self.bill_data:
-                if entry.name in selected_names:
-                    amount = entry.amount
-                    if amount.startswith('+'):
-                        same_type_total += float(amount[1:])
-                    else:
-                        same_type_total -= float(amount)
-        
-        self.total_var.set(f"总流水: {total:.2f}")
-        self.selected_var.set(f"选中流水: {selected_total:.2f}")
-        self.same_type_var.set(f"同类流水: {same_type_total:.2f}")
-        
-    def save_state(self):
-        """保存当前状态以便撤销"""
-        self.undo_stack.append([BillEntry(e.date, e.name, e.amount, e.note) for e in self.bill_data])
-        # 限制撤销栈大小
-        if len(self.undo_stack) > 50:
-            self.undo_stack.pop(0)
-            
-    def undo(self):
-        """撤销操作"""
-        if not self.undo_stack:
-            messagebox.showinfo("提示", "没有可撤销的操作")
-            return
-            
-        # 恢复上个状态
-        self.bill_data = self.undo_stack.pop()
-        
-        # 刷新显示
-        self.reset_display()
-        self.calculate_totals()
-        self.modified = True
-        self.log_message("已撤销上一步操作")
-        
     def on_closing(self):
         """处理窗口关闭事件"""
         if self.modified:
             if messagebox.askyesno("保存修改", "当前文件已修改，是否保存？"):
                 self.save_file()
+        self.save_session()
+        self.dump_timings()
+        if self.operation_log is not None:
+            self.operation_log.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    profile = StartupProfile(STARTUP_BEGIN, "--profile-startup" in sys.argv)
+    if "--perf" in sys.argv:
+        timings.enabled = True
+    if "--profile" in sys.argv:
+        profiler.start()
+    profile.mark("导入模块")
     root = tk.Tk()
-    app = BillApp(root)
+    profile.mark("创建窗口")
+    app = BillApp(root, profile)
+    if "--tk-trace" in sys.argv:
+        app.toggle_tk_trace()
     root.mainloop()
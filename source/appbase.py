@@ -0,0 +1,1195 @@
+import bisect
+import itertools
+import os
+import re
+import time
+import tkinter as tk
+from tkinter import messagebox, simpledialog
+
+from budget import BudgetTracker, load_budgets
+from ledger import EncodedEntries, LedgerBackup, StringTable, amount_cents, merge_entries, read_ledger, write_ledger, write_ledgers
+from stats import DateIndex, LiveFilter, NameTotals, RunningBalance, SortedView, StatsCache
+from summary import MonthChain
+from oplog import LOG_ERROR, LOG_FILE, LOG_INFO, LOG_LINES, LOG_WARNING, LogRecord, LogView, OperationLog
+from perf import profiler, timed, timings, tk_calls
+from session import ledger_snapshot, load_session, save_session, session_value, snapshot_entries
+
+# 选择事件的合并间隔（毫秒）：Shift 点击或按住方向键时只处理最后一次
+SELECT_DELAY = 30
+
+# 筛选框的合并间隔（毫秒）：停止输入后再筛选
+FILTER_DELAY = 150
+
+
+class BillAppBase:
+    """BillApp（Loi.py）与 ElegantBillApp（loiUI.py）共用的部分
+
+    子类创建窗口和控件（tree、log_text、filter_var、file_var、表单变量等）；这里是账单的
+    读写、编辑、排序、筛选、分组、合计、撤销、会话和性能工具等与界面外观无关的操作。
+    """
+
+    def init_state(self):
+        """初始化数据和各项状态（在创建控件之前调用）"""
+        self.current_file = None
+        self.bill_data = []  # 原始数据
+        self.strings = StringTable()  # 当前账单的字符串表，条目共用其中的文本
+        self.display_data = []  # 显示数据
+        self.selected_items = []
+        self.undo_stack = []
+        self.font_size = 10  # 默认字体大小
+        self.modified = False  # 跟踪是否有未保存的修改
+        
+        # 上次退出时的会话状态（打开的账单、排序、字体、窗口位置等），启动时恢复
+        self.session = load_session()
+        self.font_size = min(20, max(8, session_value(self.session, "font_size", self.font_size)))
+        
+        # 日志面板最多保留的行数；可选把操作日志写入 .loi/operations.log（后台线程写入）
+        self.log_view = LogView(session_value(self.session, "log_lines", LOG_LINES))
+        self.log_flush_job = None
+        self.operation_log = None
+        if session_value(self.session, "log_file", False):
+            try:
+                self.operation_log = OperationLog()
+            except OSError:
+                pass
+        
+        # 数据版本：加载时取文件修改时间，每次编辑递增，用作统计缓存的键
+        self.version_counter = itertools.count(1)
+        self.data_version = (0, 0)
+        self.stats_cache = StatsCache()
+        self.date_index = DateIndex()  # 按日期的收支前缀和，日期范围统计用
+        
+        # 结余列（可选）：逐行累计结余，期初结余为之前各月的合计
+        self.show_balance = False
+        self.running_balance = RunningBalance()
+        
+        # 总流水和按名称的合计（同类流水用），随编辑增量维护
+        self.name_totals = NameTotals()
+        
+        # 选中流水按选择的变化增量累计：选中项 -> (金额（分）, 名称)
+        self.select_job = None
+        self.selection_values = {}
+        self.selected_cents = 0
+        self.selected_names = {}  # 名称 -> 选中的条数
+        
+        # 各月汇总与结转链，启动时直接取累计结余而不必重读全部账单
+        self.month_chain = MonthChain()
+        
+        # 月度预算（budget.md），编辑时增量累计各项支出
+        self.budget_tracker = BudgetTracker(load_budgets())
+        
+        # 打开的高级统计窗口，编辑后通知它更新结果
+        self.stats_window = None
+        
+        # 排序状态
+        self.sort_column = None
+        self.sort_reverse = False
+        self.sorted_view = SortedView()  # 排序后各行的排序键，编辑时二分查找行的位置
+        
+        # 按日期分组的视图：分组行 -> 该日的条目，展开后的条目行 -> 条目
+        self.group_by_day = False
+        self.day_groups = {}
+        self.group_children = {}
+        
+        # 筛选框的状态，加长查询时只在上次的结果中继续筛选
+        self.live_filter = LiveFilter()
+        self.filter_job = None
+        self.applied_filter = ""
+        
+    def on_mousewheel(self, event):
+        if event.delta > 0:
+            self.increase_font()
+        else:
+            self.decrease_font()
+        
+    def log_message(self, message, level=LOG_INFO):
+        """在日志区域添加消息：先暂存，每帧一次性插入"""
+        record = LogRecord(time.time(), level, message)
+        if self.operation_log is not None:
+            self.operation_log.write(record)
+        if self.log_view.add(record):
+            self.log_flush_job = self.root.after_idle(self.flush_log)
+        
+    def flush_log(self):
+        """插入暂存的日志，超出行数上限时移除最早的记录"""
+        self.log_flush_job = None
+        delete_lines, records = self.log_view.flush()
+        if delete_lines:
+            self.log_text.delete("1.0", f"{delete_lines + 1}.0")
+        if records:
+            chunks = []
+            for record, text in records:
+                chunks += [text, record.level]
+            self.log_text.insert(tk.END, *chunks)
+            self.log_text.see(tk.END)  # 自动滚动到底部
+        
+    def toggle_log_file(self):
+        """开启或关闭写入磁盘的操作日志"""
+        if self.operation_log is not None:
+            self.log_message("已关闭操作日志文件")
+            self.operation_log.close()
+            self.operation_log = None
+            return
+        try:
+            self.operation_log = OperationLog()
+        except OSError as e:
+            self.log_message(f"无法创建操作日志: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"无法创建操作日志: {str(e)}")
+            return
+        self.log_message(f"操作日志将写入 {LOG_FILE}")
+        
+    def set_log_lines(self):
+        """设置日志面板最多显示的行数（随会话保存）"""
+        lines = simpledialog.askinteger("日志行数", "日志面板最多显示的行数:", initialvalue=self.log_view.max_lines,
+                                        minvalue=1, maxvalue=100000, parent=self.root)
+        if lines is None:
+            return
+        self.log_view.max_lines = lines
+        # 下一次刷新日志时移除超出的旧记录
+        self.log_message(f"日志面板最多显示 {lines} 行")
+        
+    @timed("move_up")
+    def move_up(self):
+        """上移选中条目"""
+        self.begin_edit()
+        if not self.selected_items:
+            return
+        # 如果当前是排序状态，先重置显示
+        if not self.is_original_order():
+            self.reset_display()
+        # 保存当前状态以便撤销
+        self.save_state()
+        self.modified = True
+        # 获取所有选中项目的索引
+        indices = [self.tree.index(item) for item in self.selected_items]
+        # 如果最上面的项目已经是第一个，则不能上移
+        if min(indices) == 0:
+            return
+        # 移动数据
+        for index in sorted(indices):
+            # 交换数据
+            self.bill_data[index], self.bill_data[index-1] = self.bill_data[index-1], self.bill_data[index]
+        self.mark_data_changed(first_index=min(indices) - 1)
+        if self.is_original_order():
+            self.display_data = self.bill_data.copy()
+        # 更新Treeview
+        self.refresh_treeview()
+        # 重新选中移动后的项目
+        new_indices = [i-1 for i in indices]
+        self.tree.selection_set([self.tree.get_children()[i] for i in new_indices])
+        self.log_message("已上移选中条目")
+        
+    @timed("move_down")
+    def move_down(self):
+        """下移选中条目"""
+        self.begin_edit()
+        if not self.selected_items:
+            return
+        # 如果当前是排序状态，先重置显示
+        if not self.is_original_order():
+            self.reset_display()
+        # 保存当前状态以便撤销
+        self.save_state()
+        self.modified = True
+        # 获取所有选中项目的索引
+        indices = [self.tree.index(item) for item in self.selected_items]
+        # 如果最下面的项目已经是最后一个，则不能下移
+        if max(indices) == len(self.bill_data) - 1:
+            return
+        # 移动数据（从下往上处理）
+        for index in sorted(indices, reverse=True):
+            # 交换数据
+            self.bill_data[index], self.bill_data[index+1] = self.bill_data[index+1], self.bill_data[index]
+        self.mark_data_changed(first_index=min(indices))
+        if self.is_original_order():
+            self.display_data = self.bill_data.copy()
+        # 更新Treeview
+        self.refresh_treeview()
+        # 重新选中移动后的项目
+        new_indices = [i+1 for i in indices]
+        self.tree.selection_set([self.tree.get_children()[i] for i in new_indices])
+        self.log_message("已下移选中条目")
+        
+    @timed("refresh_treeview")
+    def refresh_treeview(self):
+        """刷新Treeview显示"""
+        self.tree.delete(*self.tree.get_children())
+        self.day_groups = {}
+        self.group_children = {}
+        if self.group_by_day:
+            self.insert_day_groups()
+            return
+        if not self.show_balance:
+            for entry in self.display_data:
+                self.tree.insert("", "end", values=(entry.date, entry.name, entry.amount, entry.note))
+            return
+        
+        # 只重算上次编辑之后失效的结余
+        self.running_balance.refresh(self.bill_data)
+        balances = self.running_balance.balances
+        if self.is_original_order():
+            rows = zip(self.display_data, balances)
+        else:
+            positions = {id(entry): i for i, entry in enumerate(self.bill_data)}
+            rows = ((entry, balances[positions[id(entry)]]) for entry in self.display_data)
+        for entry, balance in rows:
+            self.tree.insert("", "end", values=(entry.date, entry.name, entry.amount, entry.note, f"{balance:.2f}"))
+        
+    def insert_day_groups(self):
+        """按日期分组显示：每个日期一行，显示条数和小计；条目行在展开分组时才插入"""
+        groups = {}
+        for entry in self.display_data:
+            groups.setdefault(entry.date, []).append(entry)
+        for date, entries in groups.items():
+            total = 0
+            for entry in entries:
+                try:
+                    total += amount_cents(entry.amount)
+                except (ValueError, OverflowError):
+                    pass
+            # 小计沿用流水的写法：收入以 + 开头，支出为正数
+            subtotal = f"+{total / 100:.2f}" if total > 0 else f"{-total / 100:.2f}"
+            item = self.tree.insert("", "end", values=(date, f"{len(entries)} 条", subtotal, ""))
+            self.day_groups[item] = entries
+            self.tree.insert(item, "end")  # 占位，使分组显示展开标记
+        
+    def on_day_group_open(self, event):
+        """展开分组时插入该日的条目"""
+        item = self.tree.focus()
+        entries = self.day_groups.get(item)
+        children = self.tree.get_children(item)
+        if entries is None or (children and children[0] in self.group_children):
+            return  # 不是分组行，或已经展开过
+        self.tree.delete(*children)
+        balances = {}
+        if self.show_balance:
+            self.running_balance.refresh(self.bill_data)
+            wanted = {id(entry) for entry in entries}
+            balances = {id(entry): balance for entry, balance in zip(self.bill_data, self.running_balance.balances)
+                        if id(entry) in wanted}
+        for entry in entries:
+            balance = balances.get(id(entry))
+            values = (entry.date, entry.name, entry.amount, entry.note, "" if balance is None else f"{balance:.2f}")
+            self.group_children[self.tree.insert(item, "end", values=values)] = entry
+        
+    def toggle_day_groups(self):
+        """切换按日期分组的视图"""
+        if self.group_by_day:
+            self.leave_day_groups()
+            return
+        self.flush_selection()
+        self.group_by_day = True
+        self.tree["show"] = ("tree", "headings")
+        self.refresh_treeview()
+        self.selected_items = []
+        self.calculate_totals()
+        self.log_message("已按日期分组显示，展开日期查看条目")
+        
+    def leave_day_groups(self):
+        """从分组视图切换回列表视图，保持选中的条目"""
+        if not self.group_by_day:
+            return
+        selected = [self.group_children[item] for item in self.tree.selection() if item in self.group_children]
+        self.group_by_day = False
+        self.tree["show"] = "headings"
+        self.refresh_treeview()
+        positions = {id(entry): i for i, entry in enumerate(self.display_data)}
+        children = self.tree.get_children()
+        self.selected_items = [children[positions[id(entry)]] for entry in selected if id(entry) in positions]
+        self.tree.selection_set(self.selected_items)
+        if self.selected_items:
+            self.tree.see(self.selected_items[-1])
+        self.log_message("已切换回列表视图")
+        
+    def toggle_balance_column(self):
+        """显示或隐藏结余列"""
+        self.show_balance = not self.show_balance
+        if self.show_balance:
+            self.running_balance.set_opening(self.month_chain.opening_balance(self.current_file) if self.current_file else 0)
+            self.tree["displaycolumns"] = ("date", "name", "amount", "note", "balance")
+        else:
+            self.tree["displaycolumns"] = ("date", "name", "amount", "note")
+        self.refresh_treeview()
+        self.log_message("已显示结余列" if self.show_balance else "已隐藏结余列")
+        
+    @timed("sort_treeview")
+    def sort_treeview(self, column):
+        """根据列进行排序"""
+        # 如果点击的是当前排序列，则切换排序方向
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        
+        # 更新表头箭头指示
+        for col in ["date", "name", "amount", "note"]:
+            if col == column:
+                arrow = " ↓" if self.sort_reverse else " ↑"
+                self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", "") + arrow)
+            else:
+                self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", ""))
+        
+        self.sort_display()
+        
+        # 刷新显示
+        self.refresh_treeview()
+        self.log_message(f"已按{column} {'降序' if self.sort_reverse else '升序'}排序")
+        
+    def sort_display(self):
+        """按当前排序列排序显示数据，并记下各行的排序键"""
+        self.sorted_view.sort(self.display_data, self.sort_column, self.sort_reverse)
+        
+    def view_insert(self, entry):
+        """把条目放进排序或筛选后的 display_data：排序时按排序键二分查找位置，
+        只筛选时按条目在账单中的顺序，返回插入的位置"""
+        if self.sort_column is not None:
+            return self.sorted_view.insert(self.display_data, entry)
+        positions = {id(e): i for i, e in enumerate(self.bill_data)}
+        shown = [positions[id(e)] for e in self.display_data]
+        index = bisect.bisect_left(shown, positions[id(entry)])
+        self.display_data.insert(index, entry)
+        return index
+        
+    def view_remove(self, index):
+        """从排序或筛选后的 display_data 中删除第 index 个条目"""
+        if self.sort_column is not None:
+            self.sorted_view.remove(self.display_data, index)
+        else:
+            del self.display_data[index]
+        
+    def insert_view_row(self, entry):
+        """排序或筛选时，新条目（已加入账单）符合筛选就插入对应的行并返回，否则返回 None。
+        结余列由调用方用 refresh_balance_cells 补上"""
+        if not self.live_filter.accepts(entry):
+            return None
+        index = self.view_insert(entry)
+        return self.tree.insert("", index, values=(entry.date, entry.name, entry.amount, entry.note))
+        
+    def move_view_row(self, item, entry):
+        """行对应的条目已替换为 entry：仍符合筛选就把该行移到新位置并更新内容，返回 True；
+        否则删除该行，返回 False"""
+        self.view_remove(self.tree.index(item))
+        if not self.live_filter.accepts(entry):
+            self.tree.delete(item)
+            return False
+        index = self.view_insert(entry)
+        self.tree.move(item, "", index)
+        self.tree.item(item, values=(entry.date, entry.name, entry.amount, entry.note))
+        return True
+        
+    def remove_view_rows(self, items):
+        """从排序或筛选后的视图中删除这些行，返回最靠前的被删行的上一行的位置"""
+        indices = sorted((self.tree.index(item) for item in items), reverse=True)
+        for index in indices:
+            self.view_remove(index)
+        self.tree.delete(*items)
+        return max(0, indices[-1] - 1) if indices else 0
+        
+    def refresh_balance_cells(self, first_index):
+        """排序或筛选视图中原地编辑后，更新账单中 first_index 及之后的条目所在行的结余"""
+        if not self.show_balance:
+            return
+        self.running_balance.refresh(self.bill_data)
+        balances = self.running_balance.balances
+        changed = {id(entry): balances[i] for i, entry in enumerate(self.bill_data[first_index:], first_index)}
+        for item, entry in zip(self.tree.get_children(), self.display_data):
+            balance = changed.get(id(entry))
+            if balance is not None:
+                self.tree.set(item, "balance", f"{balance:.2f}")
+        
+    def reset_display(self):
+        """重置显示为原始顺序"""
+        self.sort_column = None
+        self.sort_reverse = False
+        
+        # 清除表头箭头
+        for col in ["date", "name", "amount", "note"]:
+            self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", ""))
+        
+        # 恢复原始显示顺序，并清空筛选
+        self.clear_filter()
+        self.display_data = self.bill_data.copy()
+        self.refresh_treeview()
+        self.log_message("已重置显示顺序")
+        
+    def is_original_order(self):
+        """表格是否按账单中的顺序显示全部条目（未排序也未筛选），此时行号即条目在账单中的位置"""
+        return self.sort_column is None and self.live_filter.matches is None
+        
+    def on_filter_change(self, *args):
+        """筛选框内容改变：合并连续的按键，停止输入后再筛选"""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DELAY, self.apply_filter)
+        
+    @timed("apply_filter")
+    def apply_filter(self):
+        """按筛选框内容筛选表格，保持当前排序"""
+        self.filter_job = None
+        query = self.filter_var.get()
+        if query == self.applied_filter:
+            return
+        self.applied_filter = query
+        matches = self.live_filter.filter(self.bill_data, query, self.data_version)
+        self.display_data = self.bill_data.copy() if matches is None else matches
+        if self.sort_column is not None:
+            self.sort_display()
+        self.refresh_treeview()
+        self.calculate_totals()
+        
+    def clear_filter(self):
+        """清空筛选框（不刷新表格）"""
+        self.applied_filter = ""
+        self.live_filter.reset()
+        self.filter_var.set("")
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+            self.filter_job = None
+        
+    def focus_filter(self):
+        self.filter_entry.focus_set()
+        self.filter_entry.select_range(0, tk.END)
+        
+    def finish_startup(self):
+        """主循环开始后执行：先完成首帧绘制，再扫描账单并加载第一个月"""
+        self.root.update_idletasks()
+        self.startup_profile.mark("首帧绘制")
+        first_frame = self.startup_profile.elapsed()
+        last_file = session_value(self.session, "file", "")
+        if last_file and os.path.exists(last_file):
+            self.file_var.set(last_file)
+        self.load_available_files()
+        if last_file and self.file_var.get() == last_file:
+            self.restore_session(last_file)
+        self.startup_profile.mark("加载账单")
+        self.log_message(f"启动完成：首帧 {first_frame:.0f} 毫秒，加载账单后 {self.startup_profile.elapsed():.0f} 毫秒")
+        self.startup_profile.report()
+        
+    def restore_session(self, filename):
+        """打开上次的账单并恢复排序、选中项和滚动位置；账单未变时直接用快照中的条目"""
+        self.load_file(filename, self.session.get("snapshot"))
+        sort_column = session_value(self.session, "sort_column", "")
+        if sort_column in ("date", "name", "amount", "note"):
+            self.sort_treeview(sort_column)
+            if session_value(self.session, "sort_reverse", False):
+                self.sort_treeview(sort_column)
+        children = self.tree.get_children()
+        selection = [children[i] for i in session_value(self.session, "selection", [])
+                     if isinstance(i, int) and 0 <= i < len(children)]
+        if selection:
+            self.tree.selection_set(selection)
+            self.tree.focus(selection[-1])
+        self.tree.update_idletasks()
+        self.tree.yview_moveto(session_value(self.session, "scroll", 0.0))
+        
+    def session_state(self):
+        """下次启动时恢复的状态"""
+        return {
+            "file": self.current_file or "",
+            "sort_column": self.sort_column or "",
+            "sort_reverse": self.sort_reverse,
+            "scroll": self.tree.yview()[0],
+            "selection": [] if self.group_by_day else [self.tree.index(item) for item in self.tree.selection()],
+            "font_size": self.font_size,
+            "geometry": self.root.geometry(),
+            "log_lines": self.log_view.max_lines,
+            "log_file": self.operation_log is not None,
+        }
+        
+    def save_session(self):
+        """保存会话状态，下次启动时恢复；账单已保存时一并保存条目快照"""
+        state = self.session_state()
+        if self.current_file and not self.modified:
+            state["snapshot"] = ledger_snapshot(self.current_file, self.bill_data)
+        save_session(state)
+        
+    def toggle_timings(self):
+        """开启或关闭操作计时"""
+        timings.enabled = not timings.enabled
+        self.log_message("已开启操作计时" if timings.enabled else "已关闭操作计时")
+        
+    def show_timings(self):
+        """在日志区域显示各操作的耗时统计"""
+        self.log_message("操作耗时统计:\n" + timings.format_summary())
+        
+    def toggle_tk_trace(self):
+        """开启或关闭表格和日志控件的 Tk 调用统计（同时开启操作计时，以便按操作归类）"""
+        if tk_calls.enabled:
+            tk_calls.remove()
+            self.log_message("已关闭 Tk 调用统计")
+            return
+        timings.enabled = True
+        tk_calls.reset()
+        tk_calls.install(self.tree, "tree")
+        tk_calls.install(self.log_text, "log")
+        self.log_message("已开启 Tk 调用统计")
+        
+    def show_tk_calls(self):
+        """在日志区域显示 Tcl 调用最多的操作"""
+        self.log_message("Tk 调用统计:\n" + tk_calls.format_summary())
+        
+    def toggle_profiling(self, event=None):
+        """开始或停止 cProfile/tracemalloc 采样，停止时写出结果"""
+        if not profiler.running:
+            profiler.start()
+            self.log_message("已开始性能采样，再按 F9 停止")
+            return
+        try:
+            filename = profiler.stop(self.profile_structures())
+        except OSError as e:
+            self.log_message(f"无法保存性能采样结果: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"无法保存性能采样结果: {str(e)}")
+            return
+        self.log_message(f"性能采样结果已保存到 {filename}")
+        
+    def profile_structures(self):
+        """采样结果中列出的各数据结构"""
+        return {
+            "bill_data": self.bill_data,
+            "display_data": self.display_data,
+            "undo_stack": self.undo_stack,
+            "表格行数": len(self.tree.get_children()),
+        }
+        
+    def dump_timings(self):
+        """退出时保存计时汇总和未停止的性能采样"""
+        try:
+            if profiler.running:
+                profiler.stop(self.profile_structures())
+            if timings.enabled and timings.samples:
+                timings.dump()
+        except OSError:
+            pass
+        
+    def load_available_files(self):
+        files = [f for f in os.listdir('.') if f.endswith('.md') and re.match(r'^\d{6}\.md$', f)]
+        self.file_combo['values'] = files
+        self.month_chain.refresh()
+        self.update_balance_display()
+        if files and not self.file_var.get():
+            self.file_var.set(files[0])
+            self.load_file(files[0])
+        
+    def on_file_select(self, event):
+        if self.modified:
+            if messagebox.askyesno("保存修改", "当前文件已修改，是否保存？"):
+                self.save_file()
+            self.modified = False
+        self.load_file(self.file_var.get())
+        
+    @timed("load_file")
+    def load_file(self, filename, snapshot=None):
+        """打开账单，snapshot 为会话中保存的条目快照，文件未变时免去解析"""
+        if not filename:
+            return
+            
+        self.current_file = filename
+        self.bill_data = []
+        self.strings = StringTable()
+        self.display_data = []
+        self.tree.delete(*self.tree.get_children())
+        
+        self.name_totals.invalidate()
+        self.clear_filter()
+        
+        # 重置排序状态
+        self.sort_column = None
+        self.sort_reverse = False
+        for col in ["date", "name", "amount", "note"]:
+            self.tree.heading(col, text=self.tree.heading(col)["text"].replace(" ↑", "").replace(" ↓", ""))
+        
+        try:
+            entries = snapshot_entries(snapshot, filename, self.strings)
+            self.bill_data = read_ledger(filename, self.strings) if entries is None else entries
+                    
+            # 初始化显示数据
+            self.display_data = self.bill_data.copy()
+            self.data_version = (os.stat(filename).st_mtime_ns, 0)
+            self.date_index.rebuild(self.bill_data)
+            self.budget_tracker.rebuild(self.bill_data)
+            self.update_budget_display()
+            if self.stats_window is not None:
+                self.stats_window.data_changed(rebuild=True)
+            if self.show_balance:
+                self.running_balance.set_opening(self.month_chain.opening_balance(filename))
+            else:
+                self.running_balance.invalidate(0)
+            self.refresh_treeview()
+            
+            self.calculate_totals()
+            self.modified = False
+            self.log_message(f"已加载文件: {filename}")
+            
+        except Exception as e:
+            self.log_message(f"加载文件时出错: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"加载文件时出错: {str(e)}")
+        
+    def create_and_load_file(self, filename):
+        """创建新的账单文件并加载"""
+        # 创建文件头
+        content = f"""# {filename[:4]}年{filename[4:6]}月账单
+
+| 日期 | 名称 | 流水 | 备注 |
+| ---- | ---- | ---- | ---- |
+"""
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(content)
+                
+            self.log_message(f"已创建新文件: {filename}")
+            self.load_available_files()
+            self.file_var.set(filename)
+            self.load_file(filename)
+            
+        except Exception as e:
+            self.log_message(f"创建文件时出错: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"创建文件时出错: {str(e)}")
+        
+    @timed("save_file")
+    def save_file(self):
+        if not self.current_file:
+            messagebox.showwarning("警告", "没有打开的文件")
+            return
+            
+        try:
+            content = write_ledger(self.current_file, self.bill_data)
+                
+            # 更新本月汇总，结转只从本月向后重算
+            self.month_chain.update_month(self.current_file, self.bill_data, content)
+            self.update_balance_display()
+            self.modified = False
+            self.log_message(f"已保存文件: {self.current_file}")
+            
+        except Exception as e:
+            self.log_message(f"保存文件时出错: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"保存文件时出错: {str(e)}")
+        
+    def on_item_select(self, event):
+        # 连续的选择事件合并为一次处理
+        if self.select_job is not None:
+            self.root.after_cancel(self.select_job)
+        self.select_job = self.root.after(SELECT_DELAY, self.process_selection)
+        
+    @timed("process_selection")
+    def process_selection(self):
+        """处理合并后的选择变化：更新表单和选中流水"""
+        self.select_job = None
+        self.selected_items = [item for item in self.tree.selection() if item not in self.day_groups]
+        self.update_form()
+        self.update_selection_totals()
+        
+    def begin_edit(self):
+        """编辑操作开始前调用：编辑按列表中的位置进行，分组视图先切换回列表视图"""
+        self.flush_selection()
+        self.leave_day_groups()
+        
+    def flush_selection(self):
+        """立即处理尚未处理的选择变化，编辑操作开始前调用"""
+        if self.select_job is not None:
+            self.root.after_cancel(self.select_job)
+            self.process_selection()
+        
+    def update_form(self):
+        """更新表单内容"""
+        if len(self.selected_items) == 1:
+            item = self.selected_items[0]
+            values = self.tree.item(item, 'values')
+            self.date_var.set(values[0])
+            self.name_var.set(values[1])
+            self.amount_var.set(values[2])
+            self.note_var.set(values[3] if len(values) > 3 else "")
+        else:
+            self.clear_form()
+        
+    def clear_form(self):
+        """清空表单"""
+        self.date_var.set("")
+        self.name_var.set("")
+        self.amount_var.set("")
+        self.note_var.set("")
+        
+    @timed("add_item")
+    def add_item(self):
+        """新增条目：插入到选中项之后，或末尾"""
+        self.begin_edit()
+        date = self.date_var.get().strip()
+        name = self.name_var.get().strip()
+        amount = self.amount_var.get().strip()
+        note = self.note_var.get().strip()
+
+        # 如果已有数据但表单为空，说明用户想新增，不报错
+        # 但如果是第一次添加，允许用户填写表单后新增
+        if not all([date, name, amount]):
+            # 如果是占位状态（无数据），允许添加新条目而不报错，但需填写
+            if not self.bill_data:
+                messagebox.showwarning("警告", "请填写日期、名称和流水")
+                return
+            # 否则，允许插入空条目？我们不允许
+            messagebox.showwarning("警告", "日期、名称和流水不能为空")
+            return
+
+        # 验证金额格式
+        try:
+            amount_cents(amount)
+        except (ValueError, OverflowError):
+            messagebox.showwarning("警告", "金额格式不正确")
+            return
+
+        # 保存状态用于撤销
+        self.save_state()
+        self.modified = True
+
+        # 创建新条目
+        new_entry = self.strings.entry(date, name, amount, note)
+
+        # 确定插入位置
+        insert_index = len(self.bill_data)  # 默认末尾
+        if self.selected_items:
+            # 插入到选中项的下一位
+            last_selected = self.selected_items[-1]
+            display_index = self.tree.index(last_selected)
+            if self.is_original_order():
+                insert_index = display_index + 1
+            else:
+                insert_index = len(self.bill_data)
+
+        # 插入到原始数据
+        self.bill_data.insert(insert_index, new_entry)
+        self.mark_data_changed(added=[new_entry], first_index=insert_index)
+
+        # 更新 display_data
+        if not self.is_original_order():
+            # 排序或筛选视图：只插入这一行，保持排序和筛选
+            new_item = self.insert_view_row(new_entry)
+            self.refresh_balance_cells(insert_index)
+        else:
+            self.display_data.insert(insert_index, new_entry)
+            self.refresh_treeview()
+            new_item = self.tree.get_children()[insert_index]
+
+        # 选中新条目
+        if new_item is not None:
+            self.tree.selection_set(new_item)
+            self.tree.focus(new_item)
+            self.tree.see(new_item)
+            self.log_message(f"已添加条目: {name} {amount}")
+        else:
+            self.log_message(f"已添加条目: {name} {amount}（不符合当前筛选，未显示）")
+        self.calculate_totals()
+        self.clear_form()  # 清空表单，准备下一次输入
+        
+    @timed("update_item")
+    def update_item(self):
+        """修改选中条目，并在刷新后保持选中"""
+        self.begin_edit()
+        if not self.selected_items:
+            messagebox.showwarning("警告", "请先选择要修改的条目")
+            return
+
+        date = self.date_var.get().strip()
+        name = self.name_var.get().strip()
+        amount = self.amount_var.get().strip()
+        note = self.note_var.get().strip()
+
+        if not all([date, name, amount]):
+            messagebox.showwarning("警告", "日期、名称和流水不能为空")
+            return
+
+        # 验证金额格式
+        try:
+            amount_cents(amount)
+        except (ValueError, OverflowError):
+            messagebox.showwarning("警告", "金额格式不正确")
+            return
+
+        # 保存状态用于撤销
+        self.save_state()
+        self.modified = True
+
+        # 记录每个选中项在 display_data 中的索引
+        indices_to_update = []
+        for item in self.selected_items:
+            display_index = self.tree.index(item)
+            indices_to_update.append(display_index)
+
+        # 获取当前选中项对应的 display_data 条目
+        updated_entries = []
+        replaced_entries = []
+        first_changed = len(self.bill_data)
+        for idx in indices_to_update:
+            old_entry = self.display_data[idx]
+            # 创建新条目
+            new_entry = self.strings.entry(date, name, amount, note)
+            # 更新 display_data
+            self.display_data[idx] = new_entry
+            # 更新 bill_data：找到原始条目并替换
+            try:
+                original_index = self.bill_data.index(old_entry)
+                self.bill_data[original_index] = new_entry
+                first_changed = min(first_changed, original_index)
+            except ValueError:
+                # 安全查找匹配项
+                for i, entry in enumerate(self.bill_data):
+                    if entry == old_entry:
+                        self.bill_data[i] = new_entry
+                        first_changed = min(first_changed, i)
+                        break
+            updated_entries.append(new_entry)
+            replaced_entries.append(old_entry)
+        self.mark_data_changed(removed=replaced_entries, added=updated_entries, first_index=first_changed)
+
+        # 刷新界面
+        if not self.is_original_order():
+            # 排序或筛选视图：只把改动的行移到新位置，不再符合筛选的行移出表格
+            new_selection = [item for item, entry in zip(self.selected_items, updated_entries)
+                             if self.move_view_row(item, entry)]
+            self.refresh_balance_cells(first_changed)
+        else:
+            self.refresh_treeview()
+
+            # 恢复选中：根据之前记录的索引重新选中
+            children = self.tree.get_children()
+            new_selection = []
+            for idx in indices_to_update:
+                if idx < len(children):
+                    new_item = children[idx]
+                    new_selection.append(new_item)
+
+        if new_selection:
+            self.tree.selection_set(new_selection)
+            self.tree.focus(new_selection[-1])  # 焦点设到最后一个
+            self.tree.see(new_selection[-1])    # 滚动到可见
+
+        # 更新 selected_items 和表单
+        self.selected_items = new_selection
+        self.update_form()  # 更新表单显示新值
+
+        self.log_message(f"已更新 {len(updated_entries)} 个条目")
+        self.calculate_totals()
+        
+    @timed("delete_item")
+    def delete_item(self):
+        """删除选中条目，并保持选中状态"""
+        self.begin_edit()
+        if not self.selected_items:
+            messagebox.showwarning("警告", "请先选择要删除的条目")
+            return
+        # 保存状态
+        self.save_state()
+        self.modified = True
+        # 获取要删除的原始索引
+        indices_to_delete = []
+        for item in self.selected_items:
+            display_index = self.tree.index(item)
+            old_entry = self.display_data[display_index]
+            try:
+                original_index = self.bill_data.index(old_entry)
+                indices_to_delete.append(original_index)
+            except ValueError:
+                continue
+        indices_to_delete.sort(reverse=True)
+        deleted_entries = [self.bill_data[index] for index in indices_to_delete]
+        for index in indices_to_delete:
+            del self.bill_data[index]
+        first_changed = min(indices_to_delete, default=0)
+        self.mark_data_changed(removed=deleted_entries, first_index=first_changed)
+        if not self.is_original_order():
+            # 排序或筛选视图：原地删除这些行，保持排序和筛选
+            last_idx = self.remove_view_rows(self.selected_items)
+            self.refresh_balance_cells(first_changed)
+        else:
+            self.reset_display()
+            last_idx = max(0, indices_to_delete[-1] - 1) if indices_to_delete else 0
+        children = self.tree.get_children()
+        if children:
+            # 选中原来位置附近的项 (使用新的 children 列表)
+            last_idx = min(last_idx, len(children) - 1)
+            new_item = children[last_idx]
+            self.tree.selection_set(new_item)
+            self.tree.focus(new_item)
+            self.tree.see(new_item)
+        else:
+            # 表格为空，清空表单
+            self.clear_form()
+        self.selected_items = self.tree.selection()
+        self.log_message(f"已删除 {len(indices_to_delete)} 个条目")
+        self.calculate_totals()
+        
+    def search_item(self):
+        keyword = simpledialog.askstring("查找", "请输入要查找的关键词:")
+        if not keyword:
+            return
+        if not self.find_items(keyword):
+            messagebox.showinfo("查找结果", "没有找到匹配的条目")
+        
+    @timed("search_item")
+    def find_items(self, keyword):
+        """选中包含关键词的条目，返回找到的条目数"""
+        self.leave_day_groups()
+        # 清除当前选择
+        self.tree.selection_remove(self.tree.selection())
+        
+        # 查找匹配的条目
+        found_items = []
+        for item in self.tree.get_children():
+            values = self.tree.item(item, 'values')[:4]
+            if any(keyword.lower() in str(value).lower() for value in values):
+                found_items.append(item)
+                
+        if found_items:
+            # 选中所有匹配的条目
+            for item in found_items:
+                self.tree.selection_add(item)
+                self.tree.focus(item)
+                self.tree.see(item)  # 滚动到可见位置
+                
+            self.log_message(f"找到 {len(found_items)} 个匹配的条目")
+        else:
+            self.log_message(f"未找到包含\"{keyword}\"的条目")
+        return len(found_items)
+        
+    @timed("calculate_totals")
+    def calculate_totals(self):
+        """重新计算总流水、选中流水和同类流水（编辑后调用，表格中的行可能已经改变）"""
+        self.selected_items = [item for item in self.selected_items if self.tree.exists(item)]
+        self.selection_values = {}
+        self.selected_cents = 0
+        self.selected_names = {}
+        self.update_selection_totals()
+        
+    def update_selection_totals(self):
+        """按选择的变化增量更新选中流水，只读取新选中的行"""
+        current = set(self.selected_items)
+        for item in [item for item in self.selection_values if item not in current]:
+            cents, name = self.selection_values.pop(item)
+            self.selected_cents -= cents
+            self.selected_names[name] -= 1
+            if not self.selected_names[name]:
+                del self.selected_names[name]
+        for item in self.selected_items:
+            if item in self.selection_values:
+                continue
+            values = self.tree.item(item, 'values')
+            try:
+                cents = amount_cents(values[2])
+            except (ValueError, OverflowError):
+                cents = 0
+            self.selection_values[item] = (cents, values[1])
+            self.selected_cents += cents
+            self.selected_names[values[1]] = self.selected_names.get(values[1], 0) + 1
+            
+        # 总流水和同类流水取自按名称的合计
+        self.name_totals.refresh(self.bill_data)
+        same_type_total = self.name_totals.same_name_total(self.selected_names)
+        self.total_var.set(f"总流水: {self.name_totals.total / 100:.2f}")
+        self.selected_var.set(f"选中流水: {self.selected_cents / 100:.2f}")
+        self.same_type_var.set(f"同类流水: {same_type_total / 100:.2f}")
+        
+    def mark_data_changed(self, removed=(), added=(), rebuild=False, first_index=0):
+        """数据被编辑后调用：更新数据版本，丢弃该账单已失效的统计缓存，
+        并按移除/新增的条目增量维护日期索引（rebuild 为真时整体重建），
+        first_index 为第一个变动的位置，结余只从这里开始重算"""
+        self.data_version = (self.data_version[0], next(self.version_counter))
+        self.stats_cache.invalidate(self.current_file)
+        self.running_balance.invalidate(0 if rebuild else first_index)
+        if rebuild:
+            self.name_totals.invalidate()
+            self.date_index.rebuild(self.bill_data)
+            self.budget_tracker.rebuild(self.bill_data)
+            self.update_budget_display()
+            if self.stats_window is not None:
+                self.stats_window.data_changed(rebuild=True)
+            return
+        self.name_totals.update(removed, added)
+        for entry in removed:
+            self.date_index.remove(entry)
+        for entry in added:
+            self.date_index.add(entry)
+        over_budget = self.budget_tracker.update(removed, added)
+        self.update_budget_display()
+        if self.stats_window is not None:
+            self.stats_window.data_changed(removed, added)
+        if over_budget:
+            self.log_message("超出预算: " + "、".join(budget.key for budget in over_budget), LOG_WARNING)
+            messagebox.showwarning("超出预算", self.budget_tracker.format_over(over_budget))
+        
+    def update_balance_display(self):
+        """显示全部账单的累计结余（取自月度汇总）"""
+        self.balance_var.set(f"累计结余: {self.month_chain.current_balance():.2f}")
+        
+    def update_budget_display(self):
+        """显示剩余最少的几项预算"""
+        self.budget_var.set(self.budget_tracker.describe())
+        
+    def reload_budgets(self):
+        """重新读取预算定义文件"""
+        self.budget_tracker.set_budgets(load_budgets())
+        self.budget_tracker.rebuild(self.bill_data)
+        self.update_budget_display()
+        self.log_message(f"已加载预算 {len(self.budget_tracker.budgets)} 项")
+        
+    def save_state(self, batch=None):
+        """保存当前状态以便撤销，batch 为批量操作前的 LedgerBackup"""
+        if batch is not None:
+            self.undo_stack.append(batch)
+        else:
+            # 快照只保存各字段在字符串表中的编号
+            self.undo_stack.append(EncodedEntries(self.strings, self.bill_data))
+        # 限制撤销栈大小
+        if len(self.undo_stack) > 50:
+            self.undo_stack.pop(0)
+        
+    @timed("undo")
+    def undo(self):
+        """撤销操作"""
+        if not self.undo_stack:
+            messagebox.showinfo("提示", "没有可撤销的操作")
+            return
+            
+        # 恢复上个状态
+        state = self.undo_stack.pop()
+        if isinstance(state, LedgerBackup):
+            self.undo_batch(state)
+            return
+        self.bill_data = state.entries()
+        self.mark_data_changed(rebuild=True)
+        
+        # 刷新显示
+        self.reset_display()
+        self.calculate_totals()
+        self.modified = True
+        self.log_message("已撤销上一步操作")
+        
+    def show_report(self):
+        """打开分组报表窗口"""
+        from windows import ReportWindow
+        ReportWindow(self)
+        
+    def show_pivot(self):
+        """打开透视表窗口"""
+        from windows import PivotWindow
+        PivotWindow(self)
+        
+    def show_recurring(self):
+        """打开周期条目窗口"""
+        from windows import RecurringWindow
+        RecurringWindow(self)
+        
+    def show_import(self):
+        """打开导入窗口"""
+        from windows import ImportWindow
+        ImportWindow(self)
+        
+    def show_bulk_entry(self):
+        """打开批量录入窗口"""
+        from windows import BulkEntryWindow
+        BulkEntryWindow(self)
+        
+    def insert_entries(self, entries):
+        """批量插入条目：插入到选中项之后或末尾，只保存一次撤销状态、刷新一次列表和合计"""
+        self.begin_edit()
+        if not entries:
+            return
+        self.save_state()
+        self.modified = True
+        entries = self.strings.adopt(entries)
+        
+        insert_index = len(self.bill_data)
+        if self.selected_items and self.is_original_order():
+            insert_index = self.tree.index(self.selected_items[-1]) + 1
+        self.bill_data[insert_index:insert_index] = entries
+        self.mark_data_changed(added=entries, first_index=insert_index)
+        
+        if not self.is_original_order():
+            # 排序或筛选视图：逐条插入符合筛选的行，保持排序和筛选
+            new_items = [item for item in map(self.insert_view_row, entries) if item is not None]
+            self.refresh_balance_cells(insert_index)
+        else:
+            self.display_data[insert_index:insert_index] = entries
+            self.refresh_treeview()
+            new_items = self.tree.get_children()[insert_index:insert_index + len(entries)]
+            
+        # 选中新插入的条目
+        self.tree.selection_set(new_items)
+        if new_items:
+            self.tree.see(new_items[-1])
+        self.selected_items = list(new_items)
+        
+        hidden = len(entries) - len(new_items)
+        if hidden:
+            self.log_message(f"已批量添加 {len(entries)} 个条目（{hidden} 个不符合当前筛选，未显示）")
+        else:
+            self.log_message(f"已批量添加 {len(entries)} 个条目")
+        self.calculate_totals()
+        
+    def show_export(self):
+        """打开导出窗口"""
+        from windows import ExportWindow
+        ExportWindow(self)
+        
+    def apply_batch(self, plan, description):
+        """将 {文件名: 新条目列表} 按日期合并写入各账单
+
+        每个账单只读写一次，整批操作只占一步撤销。当前账单也只把新条目合并进磁盘上的文件，
+        内存中未保存的修改不会随之写入，仍由用户决定是否保存。
+        """
+        backup = LedgerBackup(description)
+        current_entries = plan.get(self.current_file)
+        try:
+            written, count = write_ledgers(plan, backup)
+        except (OSError, ValueError) as e:
+            # ValueError 包括账单不是 UTF-8 编码时的 UnicodeDecodeError
+            backup.restore()
+            self.log_message(f"写入账单时出错: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"写入账单时出错: {str(e)}")
+            return
+        
+        self.load_available_files()
+        self.refresh_opening_balance()
+        if current_entries:
+            backup.entries = self.bill_data
+            self.bill_data = merge_entries(self.bill_data, self.strings.adopt(current_entries))
+            self.mark_data_changed(rebuild=True)
+            self.reset_display()
+            self.calculate_totals()
+        elif self.show_balance:
+            self.refresh_treeview()
+        self.save_state(backup)
+        self.log_message(f"{description}: {count} 个条目，写入 {written} 个账单")
+        
+    def undo_batch(self, backup):
+        """撤销批量操作：恢复各账单文件的原内容"""
+        try:
+            backup.restore()
+        except OSError as e:
+            self.log_message(f"撤销时出错: {str(e)}", LOG_ERROR)
+            messagebox.showerror("错误", f"撤销时出错: {str(e)}")
+            return
+        self.load_available_files()
+        self.refresh_opening_balance()
+        if backup.entries is not None:
+            self.bill_data = backup.entries
+            self.mark_data_changed(rebuild=True)
+            self.reset_display()
+            self.calculate_totals()
+            self.modified = True
+        elif self.show_balance:
+            self.refresh_treeview()
+        self.log_message(f"已撤销: {backup.description}")
+        
+    def refresh_opening_balance(self):
+        """其他账单文件变动后，按结转链更新当前账单的期初结余"""
+        if self.show_balance and self.current_file:
+            self.running_balance.set_opening(self.month_chain.opening_balance(self.current_file))
+        
+    def show_statistics(self):
+        """显示高级统计窗口（非模态，结果随条件和账单编辑自动更新）"""
+        if not self.bill_data:
+            messagebox.showinfo("提示", "没有数据可统计")
+            return
+        if self.stats_window is not None:
+            self.stats_window.window.lift()
+            return
+        from windows import StatsWindow
+        self.stats_window = StatsWindow(self)
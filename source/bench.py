@@ -0,0 +1,255 @@
+"""性能基准：用确定性的合成账单测量解析、保存、排序、查找、合计、统计、撤销等操作
+
+    python bench.py                          # 默认 1k/10k/100k/1M 行
+    python bench.py --sizes 1000,10000 -o results.jsonl
+    python bench.py --compare results.jsonl  # 与之前的结果对比
+    python bench.py --gui                    # 另外在真实的 Tk 窗口中测量 Loi.py 的界面操作（需要显示器）
+
+结果每行一个 JSON 对象（JSON Lines），便于在不同版本之间比较。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from ledger import BillEntry, EncodedEntries, StringTable, amount_value, format_ledger, parse_ledger, write_ledger
+from stats import SORT_KEYS, DateIndex, SortedView, calculate_stats, normalize_filter
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+WORDS = "饭 菜 车 书 房 水 电 网 药 衣 鞋 茶 果 米 油 票 礼 游 课 剧".split()
+
+
+class LedgerGenerator:
+    """确定性的合成账单生成器：相同参数和种子总是生成相同的账单"""
+
+    def __init__(self, seed=1, names=200, income_ratio=0.1, note_length=8, months=1):
+        self.seed = seed
+        self.names = names
+        self.income_ratio = income_ratio
+        self.note_length = note_length
+        self.months = months
+
+    def vocabulary(self, rng):
+        return ["".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + str(i) for i in range(self.names)]
+
+    def entries(self, rows):
+        """生成一个有 rows 个条目的账单（日期按顺序排列）"""
+        rng = random.Random(self.seed)
+        vocabulary = self.vocabulary(rng)
+        entries = []
+        for i in range(rows):
+            day = f"{i * 28 // max(rows, 1) + 1:02d}"
+            if rng.random() < self.income_ratio:
+                amount = f"+{rng.randint(100, 2000000) / 100}"
+            else:
+                amount = f"{rng.randint(1, 50000) / 100}"
+            note = "".join(rng.choice(WORDS) for _ in range(rng.randint(0, self.note_length)))
+            entries.append(BillEntry(day, rng.choice(vocabulary), amount, note))
+        return entries
+
+    def write_months(self, directory, rows):
+        """在目录中生成 months 个月的账单文件，共约 rows 个条目"""
+        per_month = max(1, rows // self.months)
+        year, month = 2000, 1
+        for i in range(self.months):
+            generator = LedgerGenerator(self.seed + i, self.names, self.income_ratio, self.note_length)
+            write_ledger(os.path.join(directory, f"{year:04d}{month:02d}.md"), generator.entries(per_month))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def scenarios(entries, directory, generator):
+    """各场景：名称 -> 无参函数。界面无关的部分与应用中的实现相同"""
+    from summary import MonthChain
+
+    lines = format_ledger("200001.md", entries).splitlines(True)
+    path = os.path.join(directory, "200001.md")
+    keyword = entries[len(entries) // 2].name.lower()
+    conditions = normalize_filter("5", "20", "", "", "支出")
+    name_conditions = normalize_filter("5", "20", entries[0].name, "", "全部")
+    date_index = DateIndex(entries)
+
+    # 多个月的账单，用于测量没有缓存时的月度汇总
+    history = os.path.join(directory, "history")
+    os.makedirs(history)
+    generator.write_months(history, len(entries))
+
+    def month_summary():
+        shutil.rmtree(os.path.join(history, ".loi"), ignore_errors=True)
+        MonthChain(history).refresh()
+
+    def sort_all():
+        # 与应用中点击列标题相同：按各列排序并记下排序键
+        data = list(entries)
+        view = SortedView()
+        for column in SORT_KEYS:
+            view.sort(data, column)
+
+    def search():
+        return [e for e in entries if any(keyword in str(v).lower() for v in (e.date, e.name, e.amount, e.note))]
+
+    def totals():
+        total = 0
+        for e in entries:
+            total += amount_value(e.amount)
+        return total
+
+    strings = StringTable()
+    snapshot = EncodedEntries(strings, entries)
+
+    def undo_snapshot():
+        return EncodedEntries(strings, entries)
+
+    return {
+        "parse": lambda: parse_ledger(lines),
+        "save": lambda: write_ledger(path, entries),
+        "sort": sort_all,
+        "search": search,
+        "totals": totals,
+        "stats_scan": lambda: calculate_stats(entries, name_conditions),
+        "stats_index_build": lambda: DateIndex(entries),
+        "stats_indexed": lambda: calculate_stats(entries, conditions, date_index),
+        "undo_snapshot": undo_snapshot,
+        "undo_restore": snapshot.entries,
+        "month_summary": month_summary,
+    }
+
+
+def gui_scenarios(entries, directory):
+    """在真实的 Tk 窗口中测量 Loi.py 的界面操作"""
+    import tkinter as tk
+    from Loi import BillApp
+
+    path = os.path.join(directory, "200001.md")
+    write_ledger(path, entries)
+    os.chdir(directory)
+    root = tk.Tk()
+    root.withdraw()
+    app = BillApp(root)
+    app.load_file("200001.md")
+
+    def sort_treeview():
+        app.sort_treeview("amount")
+        root.update_idletasks()
+
+    def select_and_total():
+        app.tree.selection_set(app.tree.get_children()[:100])
+        app.selected_items = list(app.tree.selection())
+        app.calculate_totals()
+
+    def undo():
+        app.save_state()
+        app.undo()
+        root.update_idletasks()
+
+    def load_file():
+        app.load_file("200001.md")
+        root.update_idletasks()
+
+    return {
+        "gui_load_file": load_file,
+        "gui_save_file": app.save_file,
+        "gui_sort_treeview": sort_treeview,
+        "gui_refresh_treeview": app.refresh_treeview,
+        "gui_calculate_totals": select_and_total,
+        "gui_undo": undo,
+    }, root.destroy
+
+
+def timed(function, repeats):
+    """运行 repeats 次，返回最短和平均耗时（秒）"""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times), sum(times) / len(times)
+
+
+def code_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(sizes, repeats, generator, gui=False, only=None):
+    version = code_version()
+    for rows in sizes:
+        entries = generator.entries(rows)
+        directory = tempfile.mkdtemp(prefix="loi-bench-")
+        cleanup = None
+        try:
+            cases = scenarios(entries, directory, generator)
+            if gui:
+                gui_cases, cleanup = gui_scenarios(entries, directory)
+                cases.update(gui_cases)
+            # 大账单少跑几次，避免整套基准耗时过长
+            count = repeats if rows < 1000000 else 1
+            for name, function in cases.items():
+                if only and name not in only:
+                    continue
+                best, mean = timed(function, count)
+                yield {
+                    "scenario": name,
+                    "rows": rows,
+                    "best": round(best, 6),
+                    "mean": round(mean, 6),
+                    "repeats": count,
+                    "version": version,
+                    "python": platform.python_version(),
+                }
+        finally:
+            if cleanup is not None:
+                cleanup()
+            os.chdir(os.path.dirname(directory))
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_results(filename):
+    with open(filename, 'r', encoding='utf-8') as f:
+        return {(r["scenario"], r["rows"]): r for r in map(json.loads, filter(str.strip, f))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账单性能基准")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="条目数，逗号分隔")
+    parser.add_argument("--repeats", type=int, default=5, help="每个场景运行次数（取最短）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--names", type=int, default=200, help="名称种类数")
+    parser.add_argument("--income-ratio", type=float, default=0.1, help="收入条目比例")
+    parser.add_argument("--note-length", type=int, default=8, help="备注最长字数")
+    parser.add_argument("--months", type=int, default=12, help="月度汇总场景的月数")
+    parser.add_argument("--scenario", action="append", help="只运行指定场景，可重复")
+    parser.add_argument("--gui", action="store_true", help="另外测量 Loi.py 的界面操作（需要显示器）")
+    parser.add_argument("-o", "--output", help="结果写入文件（JSON Lines），默认输出到标准输出")
+    parser.add_argument("--compare", help="与之前保存的结果比较")
+    args = parser.parse_args(argv)
+
+    generator = LedgerGenerator(args.seed, args.names, args.income_ratio, args.note_length, args.months)
+    baseline = load_results(args.compare) if args.compare else {}
+    sizes = [int(size) for size in args.sizes.split(",")]
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for result in run(sizes, args.repeats, generator, args.gui, args.scenario):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            old = baseline.get((result["scenario"], result["rows"]))
+            if old:
+                ratio = result["best"] / old["best"] if old["best"] else float("inf")
+                print(f"{result['scenario']:<22}{result['rows']:>9} 行  {old['best'] * 1000:10.2f} -> "
+                      f"{result['best'] * 1000:10.2f} 毫秒  x{ratio:.2f}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
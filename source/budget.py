@@ -0,0 +1,123 @@
+from collections import namedtuple
+
+from ledger import amount_cents, note_tags, parse_table_rows
+
+# 预算定义文件：与账单同目录的 Markdown 表格
+BUDGET_FILE = 'budget.md'
+
+# 预算种类
+BUDGET_KINDS = {
+    "名称": "name",
+    "标签": "tag",
+}
+
+# 单项预算：种类（name/tag）、名称或标签、每月限额（分）
+Budget = namedtuple("Budget", "kind key limit")
+
+
+def parse_budgets(lines):
+    """解析预算表格 | 类型 | 名称 | 预算 |，无法识别的行跳过"""
+    budgets = []
+    for cells in parse_table_rows(lines, "类型"):
+        if len(cells) < 3:
+            continue
+        kind = BUDGET_KINDS.get(cells[0])
+        if kind is None or not cells[1]:
+            continue
+        try:
+            limit = round(abs(float(cells[2])) * 100)
+        except (ValueError, OverflowError):
+            continue
+        budgets.append(Budget(kind, cells[1], limit))
+    return budgets
+
+
+def load_budgets(filename=BUDGET_FILE):
+    """读取预算定义文件，文件不存在时没有预算"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return parse_budgets(f.readlines())
+    except OSError:
+        return []
+
+
+class BudgetTracker:
+    """按名称/标签统计当月支出并与预算比较
+
+    每个预算一个累计值（分）。编辑时只对移除、新增条目所属的预算增减，
+    不必重新扫描整个账单。
+    """
+
+    def __init__(self, budgets=()):
+        self.set_budgets(budgets)
+
+    def set_budgets(self, budgets):
+        self.budgets = list(budgets)
+        self.by_name = {}  # 名称 -> 预算序号列表
+        self.by_tag = {}  # 标签 -> 预算序号列表
+        for i, budget in enumerate(self.budgets):
+            lookup = self.by_name if budget.kind == "name" else self.by_tag
+            lookup.setdefault(budget.key, []).append(i)
+        self.spent = [0] * len(self.budgets)
+
+    def _targets(self, entry):
+        """条目计入的预算序号及支出金额（分）；收入或金额无法识别时不计入"""
+        if not self.budgets or entry.amount.startswith('+'):
+            return (), 0
+        try:
+            cents = -amount_cents(entry.amount)
+        except (ValueError, OverflowError):
+            return (), 0
+        targets = set(self.by_name.get(entry.name, ()))
+        if self.by_tag:
+            for tag in note_tags(entry.note):
+                targets.update(self.by_tag.get(tag, ()))
+        return targets, cents
+
+    def rebuild(self, entries):
+        self.spent = [0] * len(self.budgets)
+        for entry in entries:
+            targets, cents = self._targets(entry)
+            for i in targets:
+                self.spent[i] += cents
+
+    def update(self, removed=(), added=()):
+        """按移除、新增的条目增量更新，返回因此超出预算的项"""
+        if not self.budgets:
+            return []
+        before = {}
+        for sign, entries in ((-1, removed), (1, added)):
+            for entry in entries:
+                targets, cents = self._targets(entry)
+                for i in targets:
+                    before.setdefault(i, self.spent[i])
+                    self.spent[i] += sign * cents
+        return [self.budgets[i] for i, old in sorted(before.items())
+                if old <= self.budgets[i].limit < self.spent[i]]
+
+    def remaining(self, budget_index):
+        """剩余预算（元），超出时为负数"""
+        return (self.budgets[budget_index].limit - self.spent[budget_index]) / 100
+
+    def describe(self, limit=3):
+        """剩余最少的几项预算"""
+        if not self.budgets:
+            return "预算: 未设置"
+        order = sorted(range(len(self.budgets)), key=self.remaining)
+        parts = []
+        for i in order[:limit]:
+            left = self.remaining(i)
+            state = f"超 {-left:.2f}" if left < 0 else f"余 {left:.2f}"
+            parts.append(f"{self.budgets[i].key} {state}")
+        text = "预算: " + "，".join(parts)
+        if len(order) > limit:
+            text += f" 等{len(order)}项"
+        return text
+
+    def format_over(self, budgets):
+        """超出预算的提示文本"""
+        lines = []
+        for budget in budgets:
+            i = self.budgets.index(budget)
+            lines.append(f"{budget.key}: 已支出 {self.spent[i] / 100:.2f}，预算 {budget.limit / 100:.2f}")
+        return "\n".join(lines)
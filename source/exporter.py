@@ -0,0 +1,192 @@
+import csv
+import json
+import math
+import os
+import re
+import threading
+import zipfile
+
+from ledger import amount_value
+
+# 支持的导出格式（按扩展名）
+EXPORT_FORMATS = {
+    ".csv": "CSV",
+    ".jsonl": "JSON Lines",
+    ".xlsx": "Excel",
+}
+
+EXPORT_COLUMNS = ("年月", "日期", "名称", "流水", "金额", "备注")
+
+# 每导出多少行报告一次进度
+PROGRESS_EVERY = 10000
+
+# XML 1.0 不允许的控制字符
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def escape(text):
+    """XML 转义（不导入 xml.sax，它会连带导入整个 urllib）"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def export_format(filename):
+    """按扩展名判断导出格式，不支持时返回 None"""
+    extension = os.path.splitext(filename)[1].lower()
+    return extension if extension in EXPORT_FORMATS else None
+
+
+def export_record(month, entry):
+    """(年月, 条目) 转换为导出的一行；金额为带符号的数值，无法识别时为空"""
+    try:
+        value = amount_value(entry.amount)
+    except ValueError:
+        value = None
+    return (month, entry.date, entry.name, entry.amount, value, entry.note)
+
+
+class CsvExportWriter:
+    def __init__(self, filename):
+        # utf-8-sig 便于 Excel 直接打开
+        self.file = open(filename, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write_row(self, row):
+        self.writer.writerow(["" if value is None else value for value in row])
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesExportWriter:
+    def __init__(self, filename):
+        self.file = open(filename, 'w', encoding='utf-8')
+
+    def write_row(self, row):
+        self.file.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxExportWriter:
+    """只用标准库的流式 xlsx 写入：工作表 XML 逐行写入压缩包，不在内存中构建整个文档
+
+    字符串用内联字符串（inlineStr），不需要先收集共享字符串表。
+    """
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )
+    ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    WORKBOOK = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="账单" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+
+    def __init__(self, filename):
+        self.zip = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED)
+        self.zip.writestr('[Content_Types].xml', self.CONTENT_TYPES)
+        self.zip.writestr('_rels/.rels', self.ROOT_RELS)
+        self.zip.writestr('xl/workbook.xml', self.WORKBOOK)
+        self.zip.writestr('xl/_rels/workbook.xml.rels', self.WORKBOOK_RELS)
+        self.sheet = self.zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self.sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self.row_number = 0
+        self.write_row(EXPORT_COLUMNS)
+
+    def write_row(self, row):
+        self.row_number += 1
+        cells = []
+        for value in row:
+            if value is None:
+                cells.append('<c/>')
+            elif isinstance(value, (int, float)) and math.isfinite(value):
+                cells.append(f'<c><v>{value!r}</v></c>')
+            else:
+                text = escape(INVALID_XML_CHARS.sub('', str(value)))
+                cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+        self.sheet.write(f'<row r="{self.row_number}">{"".join(cells)}</row>'.encode('utf-8'))
+
+    def close(self):
+        self.sheet.write(b'</sheetData></worksheet>')
+        self.sheet.close()
+        self.zip.close()
+
+
+EXPORT_WRITERS = {
+    ".csv": CsvExportWriter,
+    ".jsonl": JsonLinesExportWriter,
+    ".xlsx": XlsxExportWriter,
+}
+
+
+def export_rows(rows, filename, progress=None):
+    """将 (年月, 条目) 序列逐行导出到文件，格式由扩展名决定，返回导出的行数
+
+    progress(已导出行数) 每 PROGRESS_EVERY 行调用一次。
+    """
+    extension = export_format(filename)
+    if extension is None:
+        raise ValueError(f"不支持的导出格式: {os.path.splitext(filename)[1]}")
+    writer = EXPORT_WRITERS[extension](filename)
+    count = 0
+    try:
+        for month, entry in rows:
+            writer.write_row(export_record(month, entry))
+            count += 1
+            if progress is not None and count % PROGRESS_EVERY == 0:
+                progress(count)
+    finally:
+        writer.close()
+    return count
+
+
+class ExportJob(threading.Thread):
+    """在后台线程中导出；进度和结果放入 messages，由界面线程取出显示
+
+    messages 中的元素为 ("progress", 行数)、("done", 行数) 或 ("error", 说明)。
+    """
+
+    def __init__(self, rows, filename, messages):
+        super().__init__(daemon=True)
+        self.rows = rows
+        self.filename = filename
+        self.messages = messages
+
+    def run(self):
+        try:
+            count = export_rows(self.rows, self.filename, lambda n: self.messages.put(("progress", n)))
+        except (OSError, ValueError) as e:
+            self.messages.put(("error", str(e)))
+            return
+        self.messages.put(("done", count))
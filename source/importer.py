@@ -0,0 +1,220 @@
+import csv
+import itertools
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+from collections import namedtuple
+from collections.abc import Mapping
+from datetime import date
+
+from ledger import CACHE_DIR, BillEntry
+
+# 支持的导入格式
+IMPORT_FORMATS = {
+    "csv": "CSV",
+    "jsonl": "JSON Lines",
+}
+
+# 金额格式：带符号（负数为支出，银行导出常见）或本软件格式（+ 开头为收入）
+AMOUNT_MODES = {
+    "signed": "带符号（负数为支出）",
+    "ledger": "本软件格式（+为收入）",
+}
+
+# 列映射：日期、名称、流水、备注各取自哪一列（备注可为空）
+ImportMapping = namedtuple("ImportMapping", "date name amount note amount_mode")
+
+# 导入结果：成功条数、出错条数、前若干条错误 (行号, 说明)
+ImportResult = namedtuple("ImportResult", "imported error_count errors")
+
+# 最多保留的错误说明条数，其余只计数
+MAX_ERRORS = 200
+
+DATE_PATTERN = re.compile(r'^\s*(\d{4})[-/.年]?(\d{1,2})[-/.月]?(\d{1,2})')
+
+
+def detect_format(filename):
+    """按扩展名判断导入格式"""
+    return "jsonl" if os.path.splitext(filename)[1].lower() in (".jsonl", ".json", ".ndjson") else "csv"
+
+
+def open_text(filename):
+    # utf-8-sig 可以读取带 BOM 的文件（Excel 导出的 CSV 常带 BOM）
+    return open(filename, 'r', encoding='utf-8-sig', newline='')
+
+
+def read_columns(filename, fmt):
+    """导入文件的列名：CSV 的表头，或第一条 JSON 记录的键"""
+    with open_text(filename) as f:
+        if fmt == "csv":
+            return next(csv.reader(f), [])
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                return list(record) if isinstance(record, dict) else []
+    return []
+
+
+def iter_records(filename, fmt):
+    """逐条读取导入文件，产生 (行号, 记录字典, 错误说明)"""
+    with open_text(filename) as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"JSON 格式错误: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "不是 JSON 对象"
+                continue
+            yield line_number, record, None
+
+
+def parse_full_date(text):
+    """解析带年份的日期（2024-01-15、2024/1/15、20240115、2024年1月15日，可带时间）"""
+    match = DATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"无法识别的日期: {text}")
+    try:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        raise ValueError(f"无效的日期: {text}")
+
+
+def convert_amount(text, amount_mode):
+    """将导入的金额转换为账单的流水文本"""
+    text = text.strip().replace(',', '').replace('¥', '').replace('￥', '')
+    number = text[1:] if amount_mode == "ledger" and text.startswith('+') else text
+    if amount_mode == "ledger" and number.startswith('-'):
+        # 账单格式中支出不带符号，带负号的金额无法判断收支
+        raise ValueError(f"账单格式的流水不能带负号: {text}")
+    value = float(number)
+    # inf、nan 及换算为分时溢出的金额不写入账单
+    if not math.isfinite(value * 100):
+        raise ValueError(f"金额不是有限数值: {text}")
+    if amount_mode == "ledger":
+        return text
+    digits = text.lstrip('+-')
+    return digits if value <= 0 else '+' + digits
+
+
+def clean_text(value):
+    """去掉会破坏 Markdown 表格的字符"""
+    return ' '.join(str(value).replace('|', '/').split())
+
+
+def convert_record(record, mapping):
+    """将一条导入记录转换为 (年月, 条目)，数据有误时抛出 ValueError"""
+    def field(column):
+        value = record.get(column) if column else None
+        return "" if value is None else str(value)
+
+    day = parse_full_date(field(mapping.date))
+    name = clean_text(field(mapping.name))
+    if not name:
+        raise ValueError("名称为空")
+    amount_text = field(mapping.amount)
+    try:
+        amount = convert_amount(amount_text, mapping.amount_mode)
+    except ValueError:
+        raise ValueError(f"金额格式不正确: {amount_text}")
+    note = clean_text(field(mapping.note))
+    return f"{day.year:04d}{day.month:02d}", BillEntry(f"{day.day:02d}", name, amount, note)
+
+
+class SpooledPlan(Mapping):
+    """按月暂存在临时文件中的导入条目 {文件名: 条目列表}
+
+    读取某月时才从临时文件载入，写入各账单时同一时间只有一个月的条目在内存中。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.counts = {}  # 文件名 -> 条目数
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename + '.jsonl')
+
+    def append(self, filename, entries):
+        with open(self._path(filename), 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps([e.date, e.name, e.amount, e.note], ensure_ascii=False) + '\n'
+                         for e in entries)
+        self.counts[filename] = self.counts.get(filename, 0) + len(entries)
+
+    def __getitem__(self, filename):
+        if filename not in self.counts:
+            raise KeyError(filename)
+        with open(self._path(filename), 'r', encoding='utf-8') as f:
+            return [BillEntry(*json.loads(line)) for line in f]
+
+    def __iter__(self):
+        return iter(sorted(self.counts))
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class LedgerImporter:
+    """流式导入：逐批校验记录并按年月分流到临时文件，内存占用与导入文件大小无关
+
+    用法：stage() 读取并校验导入文件，plan 交给 write_ledgers（或应用的 apply_batch）
+    按月写入，最后 close() 清理临时文件。
+    """
+
+    def __init__(self, mapping, batch_size=1000):
+        self.mapping = mapping
+        self.batch_size = batch_size
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='import-', dir=CACHE_DIR)
+        self.plan = SpooledPlan(self.directory)
+
+    def stage(self, filename, fmt=None, progress=None):
+        """读取导入文件，返回 ImportResult；出错的行记录下来并继续导入其余行"""
+        fmt = fmt or detect_format(filename)
+        imported = error_count = 0
+        errors = []
+        records = iter_records(filename, fmt)
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                break
+            months = {}
+            for line_number, record, error in batch:
+                if error is None:
+                    try:
+                        month, entry = convert_record(record, self.mapping)
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    error_count += 1
+                    if len(errors) < MAX_ERRORS:
+                        errors.append((line_number, error))
+                    continue
+                months.setdefault(f"{month}.md", []).append(entry)
+                imported += 1
+            for ledger_file, entries in months.items():
+                self.plan.append(ledger_file, entries)
+            if progress is not None:
+                progress(imported, error_count)
+        return ImportResult(imported, error_count, errors)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def format_errors(result):
+    """错误说明文本"""
+    lines = [f"第 {line_number} 行: {error}" for line_number, error in result.errors]
+    if result.error_count > len(result.errors):
+        lines.append(f"……另有 {result.error_count - len(result.errors)} 行出错")
+    return "\n".join(lines)
@@ -0,0 +1,325 @@
+import math
+import os
+import re
+from array import array
+from datetime import date
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
+
+# 账单文件名：年月.md，如 202401.md
+LEDGER_FILE_PATTERN = re.compile(r'^\d{6}\.md$')
+
+# 缓存目录（月度汇总等），位于账单文件所在目录
+CACHE_DIR = '.loi'
+
+
+class BillEntry:
+    __slots__ = ("date", "name", "amount", "note")
+
+    def __init__(self, date, name, amount, note=""):
+        self.date = date
+        self.name = name
+        self.amount = amount
+        self.note = note
+
+
+ENTRY_FIELDS = attrgetter("date", "name", "amount", "note")
+
+
+class StringTable:
+    """账单的字符串表：相同的日期、名称、流水、备注文本只保留一个对象，并编为小整数
+
+    同一账单的条目共用表中的字符串，按名称比较和分组时多数在比较对象本身时就能得出结果；
+    快照只需保存每个字段的编号。
+    """
+
+    def __init__(self):
+        self.codes = {}  # 文本 -> 编号
+        self.texts = []  # 编号 -> 文本
+
+    def code(self, text):
+        code = self.codes.get(text)
+        if code is None:
+            code = self.codes[text] = len(self.texts)
+            self.texts.append(text)
+        return code
+
+    def intern(self, text):
+        """表中与 text 相同的字符串对象"""
+        return self.texts[self.code(text)]
+
+    def entry(self, date, name, amount, note=""):
+        """用表中的字符串创建条目"""
+        intern = self.intern
+        return BillEntry(intern(date), intern(name), intern(amount), intern(note))
+
+    def adopt(self, entries):
+        """用表中的字符串重新创建这些条目（如导入、粘贴的条目），返回新列表"""
+        return [self.entry(e.date, e.name, e.amount, e.note) for e in entries]
+
+    def encode(self, entries):
+        """条目列表编码为编号数组，每个条目依次为日期、名称、流水、备注四个编号"""
+        try:
+            return array('I', map(self.codes.__getitem__, chain.from_iterable(map(ENTRY_FIELDS, entries))))
+        except KeyError:
+            # 有表中还没有的文本时逐个编号
+            return array('I', map(self.code, chain.from_iterable(map(ENTRY_FIELDS, entries))))
+
+    def decode(self, codes):
+        """编号序列还原为条目列表"""
+        fields = map(self.texts.__getitem__, codes)
+        return [BillEntry(*entry) for entry in zip(fields, fields, fields, fields)]
+
+
+class EncodedEntries:
+    """条目列表的紧凑快照（用于撤销）：每个条目只占四个编号，文本由字符串表保存"""
+
+    def __init__(self, strings, entries):
+        self.strings = strings
+        self.codes = strings.encode(entries)
+
+    def entries(self):
+        return self.strings.decode(self.codes)
+
+
+def amount_value(amount):
+    """将流水文本转换为带符号的数值：收入(以+开头)为正，支出为负；inf、nan 视为格式错误"""
+    value = float(amount[1:]) if amount.startswith('+') else -float(amount)
+    if not math.isfinite(value):
+        raise ValueError(f"金额不是有限数值: {amount}")
+    return value
+
+
+def amount_cents(amount):
+    """流水文本对应的带符号金额（分），用整数累加避免浮点误差
+
+    格式错误时抛出 ValueError，金额过大无法换算为分时抛出 OverflowError。
+    """
+    return round(amount_value(amount) * 100)
+
+
+def check_entry(date, name, amount, note=""):
+    """检查条目是否可以录入，返回问题说明，没有问题时返回空字符串"""
+    if not all([date, name, amount]):
+        return "日期、名称和流水不能为空"
+    try:
+        amount_cents(amount)
+    except (ValueError, OverflowError):
+        return "金额格式不正确"
+    if any('|' in text for text in (date, name, amount, note)):
+        return "不能包含字符 |"
+    return ""
+
+
+def note_tags(note):
+    """备注中的 #标签；没有标签时整条备注作为一个标签"""
+    tags = re.findall(r'#(\S+)', note)
+    return tags or [note or "(无备注)"]
+
+
+def parse_pasted_rows(text):
+    """解析粘贴的多行文本，返回每行的 [日期, 名称, 流水, 备注]
+
+    每行可以用制表符（从表格软件复制）或逗号分隔，也可以是账单的 Markdown 表格行；
+    空行、没有内容的行、表头和分隔线跳过。
+    """
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('|'):
+            cells = [part.strip() for part in line.split('|')[1:-1]]
+        elif '\t' in line:
+            cells = [part.strip() for part in line.split('\t')]
+        else:
+            import csv  # 只在粘贴逗号分隔的行时需要，不在启动时导入
+            cells = [part.strip() for part in next(csv.reader([line]))]
+        if not any(cells):
+            continue  # 只有分隔符（如单独的 |）的行
+        if cells[0] == '日期' or (cells[0] and set(cells[0]) <= set('-: ')):
+            continue
+        cells = (cells + [""] * 4)[:4]
+        rows.append(cells)
+    return rows
+
+
+def parse_table_rows(lines, first_header):
+    """逐行返回 Markdown 表格的单元格列表，表头以 | first_header 开头
+
+    找不到表头时从第一行开始解析。
+    """
+    lines = list(lines)
+
+    # 跳过文件头
+    start_index = 0
+    for i, line in enumerate(lines):
+        if line.startswith('| ' + first_header):
+            start_index = i + 2  # 跳过表头和分隔线
+            break
+
+    for i in range(start_index, len(lines)):
+        line = lines[i].strip()
+        if not line or not line.startswith('|'):
+            continue
+        yield [part.strip() for part in line.split('|')[1:-1]]
+
+
+def parse_ledger(lines, strings=None):
+    """解析账单文件的各行，返回条目列表；条目的文本放入字符串表 strings（默认为新表）"""
+    entry = (strings or StringTable()).entry
+    entries = []
+    for parts in parse_table_rows(lines, '日期'):
+        if len(parts) >= 3:
+            note = parts[3] if len(parts) > 3 else ""
+            entries.append(entry(parts[0], parts[1], parts[2], note))
+    return entries
+
+
+def read_ledger(filename, strings=None):
+    """读取一个月的账单文件"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return parse_ledger(f, strings)
+
+
+def format_ledger(filename, entries):
+    """生成账单文件内容"""
+    month = os.path.basename(filename)
+    lines = [f"# {month[:4]}年{month[4:6]}月账单\n\n| 日期 | 名称 | 流水 | 备注 |\n| ---- | ---- | ---- | ---- |\n"]
+    lines.extend(f"| {entry.date} | {entry.name} | {entry.amount} | {entry.note} |\n" for entry in entries)
+    return "".join(lines)
+
+
+def write_ledger(filename, entries):
+    """写入账单文件，返回写入的内容"""
+    content = format_ledger(filename, entries)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return content
+
+
+def merge_entries(entries, new_entries):
+    """将新条目按日期并入已有条目：放在日期不晚于它的已有条目之后
+
+    新条目先按日期排序再与已有条目归并，日期不是数字的新条目放在末尾。返回新列表。
+    """
+    dated = []
+    undated = []
+    for entry in new_entries:
+        try:
+            dated.append((int(entry.date), entry))
+        except ValueError:
+            undated.append(entry)
+    dated.sort(key=lambda item: item[0])
+
+    merged = []
+    position = 0
+    for entry in entries:
+        try:
+            day = int(entry.date)
+        except ValueError:
+            day = None
+        if day is not None:
+            while position < len(dated) and dated[position][0] < day:
+                merged.append(dated[position][1])
+                position += 1
+        merged.append(entry)
+    merged.extend(entry for _, entry in dated[position:])
+    merged.extend(undated)
+    return merged
+
+
+class LedgerBackup:
+    """批量写入多个账单文件前的原内容，用于一步撤销
+
+    entries 保存当前打开账单在内存中的条目（批量操作也改动它时）。
+    """
+
+    def __init__(self, description=""):
+        self.description = description
+        self.files = {}  # 文件名 -> 原内容，None 表示原本不存在
+        self.entries = None
+
+    def keep(self, filename):
+        if filename in self.files:
+            return
+        try:
+            with open(filename, 'rb') as f:
+                self.files[filename] = f.read()
+        except FileNotFoundError:
+            self.files[filename] = None
+
+    def restore(self):
+        for filename, content in self.files.items():
+            if content is None:
+                if os.path.exists(filename):
+                    os.remove(filename)
+                continue
+            with open(filename, 'wb') as f:
+                f.write(content)
+
+
+def write_ledgers(plan, backup, skip=()):
+    """将 {文件名: 新条目列表} 合并写入各账单文件，每个文件只读写一次
+
+    skip 中的文件（如当前打开的账单）由调用方处理。plan 可以是按需读取条目的映射，
+    这样同一时间只有一个月的条目在内存中。返回 (写入的文件数, 写入的新条目数)。
+    """
+    written = count = 0
+    for filename, new_entries in plan.items():
+        if filename in skip or not new_entries:
+            continue
+        backup.keep(filename)
+        entries = read_ledger(filename) if os.path.exists(filename) else []
+        write_ledger(filename, merge_entries(entries, new_entries))
+        written += 1
+        count += len(new_entries)
+    return written, count
+
+
+def list_ledger_files(directory='.'):
+    """按年月顺序列出目录中的账单文件名"""
+    return sorted(f for f in os.listdir(directory) if LEDGER_FILE_PATTERN.match(f))
+
+
+def ledger_balance(entries):
+    """条目的收支合计，无法解析的金额按0计"""
+    total = 0
+    for entry in entries:
+        try:
+            total += amount_value(entry.amount)
+        except ValueError:
+            continue
+    return total
+
+
+@lru_cache(maxsize=4096)
+def entry_date(month, date_text):
+    """根据账单年月（如 202401）和日期文本推算实际日期，无法识别时返回 None
+
+    日期文本可以是日（15）、月日（0115、1-15、1/15）或完整日期（20240115、2024-01-15）。
+    """
+    parts = re.findall(r'\d+', date_text)
+    year, month_number = int(month[:4]), int(month[4:6])
+    try:
+        if len(parts) == 1:
+            digits = parts[0]
+            if len(digits) == 8:
+                return date(int(digits[:4]), int(digits[4:6]), int(digits[6:]))
+            if len(digits) == 4:
+                return date(year, int(digits[:2]), int(digits[2:]))
+            if len(digits) <= 2:
+                return date(year, month_number, int(digits))
+        elif len(parts) == 2:
+            return date(year, int(parts[0]), int(parts[1]))
+        elif len(parts) == 3:
+            return date(int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:
+        pass
+    return None
+
+
+def iter_months(start_month, end_month, directory='.'):
+    """按顺序返回年月在 [start_month, end_month] 内的账单文件名"""
+    return [f for f in list_ledger_files(directory) if start_month <= f[:6] <= end_month]
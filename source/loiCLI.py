@@ -0,0 +1,246 @@
+"""账单命令行工具，不需要图形界面，可在脚本和定时任务中使用
+
+    python loiCLI.py add 202401 15 午饭 25 "#餐饮"
+    python loiCLI.py totals 202401 202412
+    python loiCLI.py stats 202401 --name 饭 --type 支出
+    python loiCLI.py gui
+
+除 gui 命令外不导入 tkinter，其余模块也只在用到的命令中导入，启动很快。
+"""
+import argparse
+import csv
+import os
+import sys
+
+from ledger import BillEntry, check_entry, read_ledger, write_ledger
+
+
+def ledger_file(month):
+    """年月（202401 或 202401.md）对应的账单文件名"""
+    month = os.path.basename(month)
+    if month.endswith('.md'):
+        month = month[:-3]
+    if len(month) != 6 or not month.isdigit():
+        raise SystemExit(f"无效的年月: {month}，应为 202401 这样的格式")
+    return f"{month}.md"
+
+
+def load_month(month):
+    filename = ledger_file(month)
+    if not os.path.exists(filename):
+        raise SystemExit(f"账单文件不存在: {filename}")
+    return filename, read_ledger(filename)
+
+
+def month_span(args):
+    """命令的年月范围，结束年月默认同起始年月"""
+    start = ledger_file(args.start)[:6]
+    end = ledger_file(args.end)[:6] if args.end else start
+    return start, end
+
+
+def update_summary(filename, entries, content):
+    """保持月度汇总缓存与文件一致，图形界面启动时不必重读"""
+    from summary import MonthChain
+    MonthChain().update_month(filename, entries, content)
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--start-date", default="", help="起始日期")
+    parser.add_argument("--end-date", default="", help="结束日期")
+    parser.add_argument("--name", default="", help="名称包含")
+    parser.add_argument("--note", default="", help="备注包含")
+    parser.add_argument("--type", default="全部", choices=("全部", "收入", "支出"), help="金额类型")
+
+
+def filter_conditions(args):
+    from stats import normalize_filter
+    return normalize_filter(args.start_date, args.end_date, args.name, args.note, args.type)
+
+
+def print_entries(entries):
+    for entry in entries:
+        print(f"{entry.date}\t{entry.name}\t{entry.amount}\t{entry.note}")
+
+
+def command_add(args):
+    problem = check_entry(args.date, args.name, args.amount, args.note)
+    if problem:
+        raise SystemExit(problem)
+    filename = ledger_file(args.month)
+    entries = read_ledger(filename) if os.path.exists(filename) else []
+    entries.append(BillEntry(args.date, args.name, args.amount, args.note))
+    content = write_ledger(filename, entries)
+    update_summary(filename, entries, content)
+    print(f"已添加到 {filename}: {args.date} {args.name} {args.amount}")
+
+
+def command_list(args):
+    _, entries = load_month(args.month)
+    print_entries(entries)
+
+
+def command_query(args):
+    from stats import match_entry
+    _, entries = load_month(args.month)
+    conditions = filter_conditions(args)
+    print_entries(entry for entry in entries if match_entry(entry, conditions))
+
+
+def command_stats(args):
+    from stats import calculate_stats, format_stats
+    _, entries = load_month(args.month)
+    print(format_stats(calculate_stats(entries, filter_conditions(args))))
+
+
+def command_totals(args):
+    """各月收支合计，取自月度汇总缓存（只重读有变动的文件）"""
+    from summary import MonthChain
+    start, end = month_span(args)
+    chain = MonthChain()
+    chain.refresh()
+    months = [chain.months[month] for month in sorted(chain.months) if start <= month <= end]
+    if not months:
+        raise SystemExit(f"{start} 至 {end} 没有账单")
+    print("年月\t收入\t支出\t净额\t期末结余")
+    for summary in months:
+        print(f"{summary.month}\t{summary.income / 100:.2f}\t{summary.expense / 100:.2f}\t"
+              f"{(summary.income - summary.expense) / 100:.2f}\t{summary.closing / 100:.2f}")
+    if len(months) > 1:
+        income = sum(summary.income for summary in months)
+        expense = sum(summary.expense for summary in months)
+        print(f"合计\t{income / 100:.2f}\t{expense / 100:.2f}\t{(income - expense) / 100:.2f}")
+
+
+def command_import(args):
+    from importer import ImportMapping, LedgerImporter, format_errors
+    from ledger import LedgerBackup, write_ledgers
+    from summary import MonthChain
+    mapping = ImportMapping(args.date_column, args.name_column, args.amount_column, args.note_column,
+                            args.amount_mode)
+    importer = LedgerImporter(mapping)
+    try:
+        result = importer.stage(args.file, args.format)
+        written, count = write_ledgers(importer.plan, LedgerBackup())
+    finally:
+        importer.close()
+    MonthChain().refresh()
+    print(f"导入 {count} 条，写入 {written} 个账单，出错 {result.error_count} 条")
+    if result.error_count:
+        print(format_errors(result), file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_export(args):
+    from exporter import export_rows
+    from report import load_rows
+    start, end = month_span(args)
+    count = export_rows(load_rows(start, end), args.output)
+    print(f"已导出 {count} 行到 {args.output}")
+
+
+def command_validate(args):
+    """检查账单中无法识别的条目，有问题时返回 1"""
+    from ledger import iter_months, list_ledger_files
+    if args.start:
+        start, end = month_span(args)
+        files = iter_months(start, end)
+    else:
+        files = list_ledger_files()
+    problems = 0
+    for filename in files:
+        for number, entry in enumerate(read_ledger(filename), 1):
+            problem = check_entry(entry.date, entry.name, entry.amount, entry.note)
+            if problem:
+                problems += 1
+                print(f"{filename} 第 {number} 条: {problem}（{entry.date} | {entry.name} | {entry.amount}）")
+    print(f"检查了 {len(files)} 个账单，发现 {problems} 个问题")
+    return 1 if problems else 0
+
+
+def command_gui(args):
+    """启动图形界面（只有这个命令会导入 tkinter）"""
+    import tkinter as tk
+    root = tk.Tk()
+    if args.classic:
+        from Loi import BillApp
+        BillApp(root)
+    else:
+        from loiUI import ElegantBillApp
+        ElegantBillApp(root)
+    root.mainloop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="loi", description="账单命令行工具")
+    parser.add_argument("--dir", default=".", help="账单所在目录，默认为当前目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="添加一个条目（追加到末尾）")
+    add.add_argument("month", help="年月，如 202401")
+    add.add_argument("date", help="日期")
+    add.add_argument("name", help="名称")
+    add.add_argument("amount", help="流水：支出直接写数字，收入以 + 开头")
+    add.add_argument("note", nargs="?", default="", help="备注")
+    add.set_defaults(handler=command_add)
+
+    listing = commands.add_parser("list", help="列出某月的全部条目")
+    listing.add_argument("month")
+    listing.set_defaults(handler=command_list)
+
+    query = commands.add_parser("query", help="列出某月符合条件的条目")
+    query.add_argument("month")
+    add_filter_arguments(query)
+    query.set_defaults(handler=command_query)
+
+    stats = commands.add_parser("stats", help="某月符合条件的条目的统计")
+    stats.add_argument("month")
+    add_filter_arguments(stats)
+    stats.set_defaults(handler=command_stats)
+
+    totals = commands.add_parser("totals", help="各月收支合计与结余")
+    totals.add_argument("start", help="起始年月")
+    totals.add_argument("end", nargs="?", help="结束年月，默认同起始年月")
+    totals.set_defaults(handler=command_totals)
+
+    import_parser = commands.add_parser("import", help="从 CSV 或 JSON Lines 文件导入")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"), help="默认按扩展名判断")
+    import_parser.add_argument("--date-column", required=True, help="日期列（需带年份）")
+    import_parser.add_argument("--name-column", required=True, help="名称列")
+    import_parser.add_argument("--amount-column", required=True, help="金额列")
+    import_parser.add_argument("--note-column", default="", help="备注列")
+    import_parser.add_argument("--amount-mode", choices=("signed", "ledger"), default="signed",
+                               help="signed: 负数为支出；ledger: + 开头为收入")
+    import_parser.set_defaults(handler=command_import)
+
+    export = commands.add_parser("export", help="导出年月范围内的条目（CSV、JSON Lines 或 xlsx）")
+    export.add_argument("start")
+    export.add_argument("end", nargs="?")
+    export.add_argument("-o", "--output", required=True, help="导出文件，格式由扩展名决定")
+    export.set_defaults(handler=command_export)
+
+    validate = commands.add_parser("validate", help="检查账单中无法识别的条目")
+    validate.add_argument("start", nargs="?")
+    validate.add_argument("end", nargs="?")
+    validate.set_defaults(handler=command_validate)
+
+    gui = commands.add_parser("gui", help="启动图形界面")
+    gui.add_argument("--classic", action="store_true", help="使用经典界面（Loi.py）")
+    gui.set_defaults(handler=command_gui)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        os.chdir(args.dir)
+        return args.handler(args) or 0
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
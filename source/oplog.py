@@ -0,0 +1,112 @@
+import os
+import time
+from collections import deque, namedtuple
+
+from ledger import CACHE_DIR
+
+# 日志级别
+LOG_INFO = "info"
+LOG_WARNING = "warning"
+LOG_ERROR = "error"
+
+LEVEL_NAMES = {
+    LOG_INFO: "信息",
+    LOG_WARNING: "警告",
+    LOG_ERROR: "错误",
+}
+
+# 日志面板默认最多保留的行数
+LOG_LINES = 500
+
+# 操作日志文件：超过 LOG_FILE_BYTES 时轮换，保留 LOG_FILE_BACKUPS 个旧文件
+LOG_FILE = os.path.join(CACHE_DIR, 'operations.log')
+LOG_FILE_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+LogRecord = namedtuple("LogRecord", "time level message")
+
+
+def format_record(record):
+    """日志面板中的一条记录（以换行结尾）"""
+    prefix = "" if record.level == LOG_INFO else LEVEL_NAMES[record.level] + ": "
+    return f"[{time.strftime('%H:%M', time.localtime(record.time))}] {prefix}{record.message}\n"
+
+
+class LogView:
+    """日志面板的环形缓冲：最多显示 max_lines 行，新记录先暂存，每帧一次性插入
+
+    flush() 返回需要从面板开头删除的行数和需要插入的记录；暂存的记录多于上限时，
+    较早的记录不会被插入。
+    """
+
+    def __init__(self, max_lines=LOG_LINES):
+        self.max_lines = max(1, max_lines)
+        self.pending = []
+        self.shown = deque()  # 面板中每条记录的行数
+        self.shown_lines = 0
+
+    def add(self, record):
+        """暂存一条记录，返回是否需要安排刷新（暂存区原本为空）"""
+        self.pending.append(record)
+        return len(self.pending) == 1
+
+    def flush(self):
+        records, self.pending = self.pending, []
+        old_count = len(self.shown)
+        texts = []
+        for record in records:
+            text = format_record(record)
+            texts.append(text)
+            self.shown.append(text.count("\n"))
+            self.shown_lines += self.shown[-1]
+
+        # 超出上限时整条移除最早的记录（至少保留最新的一条）
+        removed = delete_lines = 0
+        while self.shown_lines > self.max_lines and len(self.shown) > 1:
+            lines = self.shown.popleft()
+            self.shown_lines -= lines
+            if removed < old_count:
+                delete_lines += lines
+            removed += 1
+        skipped = max(0, removed - old_count)
+        return delete_lines, list(zip(records[skipped:], texts[skipped:]))
+
+    def clear(self):
+        self.pending = []
+        self.shown.clear()
+        self.shown_lines = 0
+
+
+class OperationLog:
+    """写入磁盘的操作日志：记录放入队列，由后台线程写入并按大小轮换，界面线程不等待磁盘"""
+
+    def __init__(self, filename=LOG_FILE, max_bytes=LOG_FILE_BYTES, backups=LOG_FILE_BACKUPS):
+        # 只在开启时导入 logging
+        import logging
+        import logging.handlers
+        import queue
+
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.logging = logging
+        self.queue = queue.SimpleQueue()
+        handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        self.listener = logging.handlers.QueueListener(self.queue, handler)
+        self.listener.start()
+
+    def write(self, record):
+        levelno = {LOG_INFO: self.logging.INFO, LOG_WARNING: self.logging.WARNING}.get(record.level,
+                                                                                      self.logging.ERROR)
+        self.queue.put(self.logging.makeLogRecord({
+            "msg": record.message.replace("\n", " | "),
+            "levelno": levelno,
+            "levelname": LEVEL_NAMES[record.level],
+            "created": record.time,
+        }))
+
+    def close(self):
+        """写完队列中剩余的记录后停止后台线程"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
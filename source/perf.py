@@ -0,0 +1,280 @@
+import functools
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from ledger import CACHE_DIR
+
+# 每个操作保留最近多少次耗时用于计算分位数
+WINDOW = 1000
+
+PERF_FILE = os.path.join(CACHE_DIR, 'perf.json')
+
+
+class ActionTimings:
+    """按操作记录最近若干次的耗时（单调时钟），计算 p50/p95/最大值
+
+    未开启时被计时的方法只多一次属性判断。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.samples = {}  # 操作 -> 最近的耗时（秒）
+        self.counts = {}  # 操作 -> 总次数
+        self.active = []  # 正在执行的操作（嵌套时最内层在最后）
+
+    def record(self, action, seconds):
+        samples = self.samples.get(action)
+        if samples is None:
+            samples = self.samples[action] = deque(maxlen=WINDOW)
+        samples.append(seconds)
+        self.counts[action] = self.counts.get(action, 0) + 1
+
+    def reset(self):
+        self.samples.clear()
+        self.counts.clear()
+
+    def summary(self):
+        """[(操作, 次数, p50, p95, 最大)]，耗时单位为毫秒，按 p95 从大到小排列"""
+        rows = []
+        for action, samples in self.samples.items():
+            ordered = sorted(samples)
+            rows.append((
+                action,
+                self.counts[action],
+                percentile(ordered, 50) * 1000,
+                percentile(ordered, 95) * 1000,
+                ordered[-1] * 1000,
+            ))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def format_summary(self):
+        rows = self.summary()
+        if not rows:
+            return "没有计时数据" + ("" if self.enabled else "（计时未开启）")
+        lines = [f"{'操作':<18}{'次数':>6}{'p50':>10}{'p95':>10}{'最大':>10}  (毫秒)"]
+        for action, count, p50, p95, longest in rows:
+            lines.append(f"{action:<20}{count:>6}{p50:>10.2f}{p95:>10.2f}{longest:>10.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path=PERF_FILE):
+        """将汇总写入 JSON 文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([dict(zip(("action", "count", "p50_ms", "p95_ms", "max_ms"), row))
+                       for row in self.summary()], f, ensure_ascii=False, indent=1)
+
+
+def percentile(ordered, percent):
+    """已排序样本的分位数（最近秩法）"""
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * percent // 100) - 1))
+    return ordered[index]
+
+
+# 全局计时器：启动参数 --perf 或环境变量 LOI_PERF=1 时开启，也可在菜单中切换
+timings = ActionTimings(enabled=bool(os.environ.get("LOI_PERF")))
+
+
+def timed(action):
+    """计时装饰器，用于界面上的各项操作"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not timings.enabled:
+                return function(*args, **kwargs)
+            timings.active.append(action)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.record(action, time.perf_counter() - started)
+                timings.active.pop()
+        return wrapper
+    return decorator
+
+
+# 不在任何被计时的操作中时的 Tcl 调用（事件回调、空闲刷新等）
+IDLE_ACTION = "（其他）"
+
+
+class TkProxy:
+    """代替控件的 tk 属性，统计经过它的 Tcl 调用；其余属性原样转发"""
+
+    def __init__(self, tk, counter, label):
+        self._tk = tk
+        self._counter = counter
+        self._label = label
+
+    def call(self, *args):
+        started = time.perf_counter()
+        try:
+            return self._tk.call(*args)
+        finally:
+            self._counter.record(self._label, args, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+
+class TkCallCounter:
+    """Tk 调用统计：记录 Treeview、Text 等控件每种 Tcl 命令的次数和耗时，归入当时正在执行的操作
+
+    用于确认界面优化确实减少了与 Tcl 的往返。
+    """
+
+    def __init__(self):
+        self.calls = {}  # (操作, 控件.命令) -> [次数, 耗时（秒）]
+        self.widgets = []
+
+    @property
+    def enabled(self):
+        return bool(self.widgets)
+
+    def install(self, widget, label):
+        if not isinstance(widget.tk, TkProxy):
+            widget.tk = TkProxy(widget.tk, self, label)
+            self.widgets.append(widget)
+
+    def remove(self):
+        for widget in self.widgets:
+            widget.tk = widget.tk._tk
+        self.widgets = []
+
+    def reset(self):
+        self.calls.clear()
+
+    def record(self, label, args, seconds):
+        # Text 等控件把整条命令作为一个元组传入
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        command = str(args[1]) if len(args) > 1 and str(args[0]).startswith('.') else str(args[0]) if args else ""
+        key = (timings.active[-1] if timings.active else IDLE_ACTION, f"{label}.{command}")
+        total = self.calls.get(key)
+        if total is None:
+            self.calls[key] = [1, seconds]
+        else:
+            total[0] += 1
+            total[1] += seconds
+
+    def summary(self):
+        """[(操作, 调用次数, 耗时毫秒, [(控件.命令, 次数, 毫秒)])]，按耗时从大到小排列"""
+        actions = {}
+        for (action, command), (count, seconds) in self.calls.items():
+            actions.setdefault(action, []).append((command, count, seconds * 1000))
+        rows = []
+        for action, commands in actions.items():
+            commands.sort(key=lambda row: row[2], reverse=True)
+            rows.append((action, sum(row[1] for row in commands), sum(row[2] for row in commands), commands))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def format_summary(self, limit=5, commands=3):
+        """耗时最多的 limit 个操作，以及每个操作中耗时最多的几种命令"""
+        rows = self.summary()
+        if not rows:
+            return "没有 Tk 调用记录" + ("" if self.enabled else "（统计未开启）")
+        lines = []
+        for action, count, milliseconds, details in rows[:limit]:
+            runs = timings.counts.get(action)
+            per_run = f"，每次 {count / runs:.0f} 次" if runs else ""
+            lines.append(f"{action}: {count} 次调用，{milliseconds:.1f} 毫秒{per_run}")
+            for command, command_count, command_ms in details[:commands]:
+                lines.append(f"    {command}: {command_count} 次，{command_ms:.1f} 毫秒")
+        return "\n".join(lines)
+
+
+# 全局 Tk 调用统计：启动参数 --tk-trace 或菜单中开启
+tk_calls = TkCallCounter()
+
+
+PROFILE_DIR = os.path.join(CACHE_DIR, 'profiles')
+
+
+def deep_size(obj, seen=None):
+    """对象及其引用的列表、字典、条目等的总内存（字节），同一对象只计一次"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_size(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+class Profiler:
+    """用 cProfile 和 tracemalloc 采样界面线程，停止时把结果写入 .loi/profiles
+
+    每次采样写出两个文件：.pstats 可用 pstats 或 snakeviz 等工具分析；
+    .txt 包含各数据结构的内存、分配最多的代码行和累计耗时最多的函数。
+    """
+
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = directory
+        self.profile = None
+        self.started = None
+
+    @property
+    def running(self):
+        return self.profile is not None
+
+    def start(self):
+        # 只在用到时导入，不影响普通启动
+        import cProfile
+        import tracemalloc
+        if self.running:
+            return
+        tracemalloc.start()
+        self.started = time.time()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, structures):
+        """停止采样并写出结果，structures 为 {名称: 对象或数值}，返回写出的 .txt 文件名"""
+        import io
+        import pstats
+        import tracemalloc
+        if not self.running:
+            return None
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, time.strftime('profile-%Y%m%d-%H%M%S', time.localtime(self.started)))
+        self.profile.dump_stats(base + '.pstats')
+
+        lines = [f"采样时长: {time.time() - self.started:.1f} 秒",
+                 f"tracemalloc: 当前 {current / 1024:.1f} KB，峰值 {peak / 1024:.1f} KB", "", "数据结构:"]
+        for name, value in structures.items():
+            if isinstance(value, int):
+                lines.append(f"    {name}: {value}")
+            else:
+                count = f"{len(value)} 项，" if hasattr(value, '__len__') else ""
+                lines.append(f"    {name}: {count}{deep_size(value) / 1024:.1f} KB")
+        lines += ["", "分配最多的代码行:"]
+        lines += [f"    {stat}" for stat in snapshot.statistics('lineno')[:15]]
+        lines += ["", "累计耗时最多的函数:"]
+        output = io.StringIO()
+        pstats.Stats(self.profile, stream=output).sort_stats('cumulative').print_stats(30)
+        lines.append(output.getvalue())
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+        self.profile = None
+        return base + '.txt'
+
+
+# 全局采样器：启动参数 --profile 时从启动开始采样，F9 开始/停止
+profiler = Profiler()
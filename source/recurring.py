@@ -0,0 +1,122 @@
+import calendar
+import os
+from collections import namedtuple
+
+from ledger import BillEntry, check_entry, parse_table_rows, read_ledger
+
+# 周期条目定义文件：与账单同目录的 Markdown 表格
+RECURRING_FILE = 'recurring.md'
+
+# 周期：每月按几号，每周按星期几（1 为周一）
+PERIODS = {
+    "每月": "monthly",
+    "每周": "weekly",
+}
+
+# 一次最多生成的月数，避免年份输错时生成成百上千个账单
+MAX_MONTHS = 120
+
+RecurringRule = namedtuple("RecurringRule", "period day name amount note")
+
+
+def parse_rules(lines):
+    """解析周期条目表格 | 周期 | 日期 | 名称 | 流水 | 备注 |，返回 (规则列表, 有误的规则)
+
+    无法识别的行跳过。生成的条目与录入表单一样用 check_entry 检查，不能录入的规则
+    （如流水格式不正确）不生成条目，以 (名称, 问题说明) 列在有误的规则中。
+    """
+    rules = []
+    problems = []
+    for cells in parse_table_rows(lines, "周期"):
+        if len(cells) < 4:
+            continue
+        period = PERIODS.get(cells[0])
+        try:
+            day = int(cells[1])
+        except ValueError:
+            continue
+        if period is None or not cells[2] or not cells[3]:
+            continue
+        if not (1 <= day <= (31 if period == "monthly" else 7)):
+            continue
+        note = cells[4] if len(cells) > 4 else ""
+        problem = check_entry(f"{day:02d}", cells[2], cells[3], note)
+        if problem:
+            problems.append((cells[2], problem))
+            continue
+        rules.append(RecurringRule(period, day, cells[2], cells[3], note))
+    return rules, problems
+
+
+def load_rules(filename=RECURRING_FILE):
+    """读取周期条目定义文件，返回 (规则列表, 有误的规则)；文件不存在时没有规则"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return parse_rules(f.readlines())
+    except OSError:
+        return [], []
+
+
+def month_range(start_month, end_month):
+    """[start_month, end_month] 内的全部年月（不论账单文件是否存在）"""
+    year, month = int(start_month[:4]), int(start_month[4:6])
+    months = []
+    while f"{year:04d}{month:02d}" <= end_month:
+        months.append(f"{year:04d}{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def month_span(start_month, end_month):
+    """[start_month, end_month] 包含的月数"""
+    start = int(start_month[:4]) * 12 + int(start_month[4:6])
+    end = int(end_month[:4]) * 12 + int(end_month[4:6])
+    return end - start + 1
+
+
+def due_days(rule, month):
+    """规则在某月应记账的日子"""
+    year, month_number = int(month[:4]), int(month[4:6])
+    first_weekday, days = calendar.monthrange(year, month_number)
+    if rule.period == "monthly":
+        # 31号之类的日子在小月记到月末
+        return [min(rule.day, days)]
+    first = (rule.day - 1 - first_weekday) % 7 + 1
+    return list(range(first, days + 1, 7))
+
+
+def entry_key(entry):
+    """判断重复用的键，日期 5 与 05 视为相同"""
+    try:
+        day = int(entry.date)
+    except ValueError:
+        day = entry.date
+    return day, entry.name, entry.amount
+
+
+def plan_recurring(rules, months, existing=None):
+    """生成各月到期的周期条目 {文件名: 条目列表}
+
+    existing(文件名) 返回该月已有的条目，同日期、名称、流水的条目已存在时不重复生成。
+    """
+    plan = {}
+    for month in months:
+        filename = f"{month}.md"
+        present = set()
+        if existing is not None:
+            present = {entry_key(entry) for entry in existing(filename)}
+        entries = []
+        for rule in rules:
+            for day in due_days(rule, month):
+                entry = BillEntry(f"{day:02d}", rule.name, rule.amount, rule.note)
+                if entry_key(entry) not in present:
+                    entries.append(entry)
+        if entries:
+            entries.sort(key=lambda entry: entry.date)
+            plan[filename] = entries
+    return plan
+
+
+def read_existing(filename):
+    """磁盘上某月已有的条目，文件不存在时为空"""
+    return read_ledger(filename) if os.path.exists(filename) else []
@@ -0,0 +1,226 @@
+import argparse
+import csv
+import heapq
+import os
+from collections import namedtuple
+from operator import attrgetter
+
+from ledger import StringTable, amount_value, entry_date, iter_months, note_tags, read_ledger
+
+# 分组方式
+GROUP_BY = {
+    "name": "名称",
+    "tag": "备注标签",
+    "day": "日期",
+    "weekday": "星期",
+    "bucket": "金额区间",
+}
+
+# 排名指标
+MEASURES = {
+    "total": "合计",
+    "count": "条数",
+    "average": "平均",
+}
+
+WEEKDAYS = "一二三四五六日"
+
+# 金额区间的上界（按绝对值）
+AMOUNT_BUCKETS = (10, 50, 100, 500, 1000, 5000)
+
+# 透视表的取值方式
+PIVOT_VALUES = {
+    "expense": "支出",
+    "income": "收入",
+    "net": "净额",
+    "count": "条数",
+}
+
+ReportRow = namedtuple("ReportRow", "key count total income expense average")
+Report = namedtuple("Report", "group_by measure rows top bottom row_count skipped")
+Pivot = namedtuple("Pivot", "names months cells row_totals column_totals grand_total row_count skipped")
+
+
+def bucket_label(value):
+    """金额（绝对值）所在区间的名称"""
+    lower = 0
+    for upper in AMOUNT_BUCKETS:
+        if value < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}以上"
+
+
+def group_keys(month, entry, value, group_by):
+    """条目所属的分组（按标签分组时一个条目可以属于多个分组）"""
+    if group_by == "name":
+        return (entry.name,)
+    if group_by == "tag":
+        return note_tags(entry.note)
+    if group_by == "bucket":
+        return (bucket_label(abs(value)),)
+    day = entry_date(month, entry.date)
+    if group_by == "day":
+        return (day.isoformat() if day else f"{month}/{entry.date}",)
+    if group_by == "weekday":
+        return ("周" + WEEKDAYS[day.weekday()] if day else "(未知)",)
+    raise ValueError(f"未知的分组方式: {group_by}")
+
+
+def build_report(rows, group_by="name", top=10, measure="total"):
+    """对 (年月, 条目) 序列分组汇总，并用堆选出排名前后 top 个分组"""
+    groups = {}
+    row_count = skipped = 0
+    for month, entry in rows:
+        try:
+            value = amount_value(entry.amount)
+        except ValueError:
+            skipped += 1
+            continue
+        row_count += 1
+        for key in group_keys(month, entry, value, group_by):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, 0, 0, 0]  # 条数、合计、收入、支出
+            group[0] += 1
+            group[1] += value
+            if value >= 0:
+                group[2] += value
+            else:
+                group[3] -= value
+
+    report_rows = [
+        ReportRow(key, count, round(total, 2), round(income, 2), round(expense, 2), round(total / count, 2))
+        for key, (count, total, income, expense) in groups.items()
+    ]
+    sort_key = attrgetter(measure)
+    return Report(
+        group_by,
+        measure,
+        report_rows,
+        heapq.nlargest(top, report_rows, key=sort_key),
+        heapq.nsmallest(top, report_rows, key=sort_key),
+        row_count,
+        skipped,
+    )
+
+
+def ledger_rows(month, entries):
+    """单个账单的 (年月, 条目) 序列"""
+    return ((month, entry) for entry in entries)
+
+
+def load_rows(start_month, end_month, directory='.', overrides=None):
+    """逐个读取年月范围内的账单，overrides 为 {文件名: 条目列表}，用于代替磁盘上的内容"""
+    strings = StringTable()  # 各月共用，按名称汇总时相同名称是同一个字符串对象
+    for filename in iter_months(start_month, end_month, directory):
+        if overrides and filename in overrides:
+            entries = overrides[filename]
+        else:
+            entries = read_ledger(os.path.join(directory, filename), strings)
+        yield from ledger_rows(filename[:6], entries)
+
+
+def build_pivot(rows):
+    """一次遍历 (年月, 条目) 序列，累计 名称×月份 的稀疏矩阵
+
+    每格、每行、每列及总计都记录 [收入, 支出, 条数]，切换取值方式时不必重新读取账单。
+    """
+    cells = {}
+    row_totals = {}
+    column_totals = {}
+    grand_total = [0.0, 0.0, 0]
+    row_count = skipped = 0
+    for month, entry in rows:
+        try:
+            value = amount_value(entry.amount)
+        except ValueError:
+            skipped += 1
+            continue
+        row_count += 1
+        slot = 0 if value >= 0 else 1
+        for totals, key in ((cells, (entry.name, month)), (row_totals, entry.name), (column_totals, month)):
+            cell = totals.get(key)
+            if cell is None:
+                cell = totals[key] = [0.0, 0.0, 0]
+            cell[slot] += abs(value)
+            cell[2] += 1
+        grand_total[slot] += abs(value)
+        grand_total[2] += 1
+    return Pivot(sorted(row_totals), sorted(column_totals), cells, row_totals, column_totals,
+                 grand_total, row_count, skipped)
+
+
+def pivot_value(cell, value):
+    """按取值方式取出格子的值，空格子返回 None"""
+    if cell is None:
+        return None
+    if value == "expense":
+        return round(cell[1], 2)
+    if value == "income":
+        return round(cell[0], 2)
+    if value == "net":
+        return round(cell[0] - cell[1], 2)
+    return cell[2]
+
+
+def pivot_names(pivot, value):
+    """按行合计从大到小排列的名称"""
+    return sorted(pivot.names, key=lambda name: pivot_value(pivot.row_totals[name], value), reverse=True)
+
+
+def format_pivot_value(number):
+    if number is None:
+        return ""
+    return str(number) if isinstance(number, int) else f"{number:.2f}"
+
+
+def write_pivot_csv(pivot, filename, value="expense"):
+    """将透视表导出为 CSV（含行、列合计）"""
+    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["名称"] + pivot.months + ["合计"])
+        for name in pivot_names(pivot, value):
+            writer.writerow(
+                [name]
+                + [format_pivot_value(pivot_value(pivot.cells.get((name, month)), value)) for month in pivot.months]
+                + [format_pivot_value(pivot_value(pivot.row_totals[name], value))]
+            )
+        writer.writerow(
+            ["合计"]
+            + [format_pivot_value(pivot_value(pivot.column_totals[month], value)) for month in pivot.months]
+            + [format_pivot_value(pivot_value(pivot.grand_total, value))]
+        )
+
+
+def format_report(report):
+    """将报表格式化为文本"""
+    lines = [f"按{GROUP_BY[report.group_by]}分组，共 {len(report.rows)} 组，{report.row_count} 个条目"]
+    if report.skipped:
+        lines.append(f"跳过金额无法识别的条目 {report.skipped} 个")
+    for title, rows in ((f"{MEASURES[report.measure]}最高", report.top), (f"{MEASURES[report.measure]}最低", report.bottom)):
+        lines.append("")
+        lines.append(title)
+        for row in rows:
+            lines.append(f"  {row.key}\t条数 {row.count}\t合计 {row.total:.2f}\t平均 {row.average:.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="账单分组报表")
+    parser.add_argument("start", help="起始年月，如 202401")
+    parser.add_argument("end", nargs="?", help="结束年月，默认同起始年月")
+    parser.add_argument("--by", choices=GROUP_BY, default="name", help="分组方式")
+    parser.add_argument("--measure", choices=MEASURES, default="total", help="排名指标")
+    parser.add_argument("--top", type=int, default=10, help="列出前后多少组")
+    parser.add_argument("--dir", default=".", help="账单所在目录")
+    parser.add_argument("--pivot", metavar="CSV", help="改为生成 名称×月份 透视表并导出到 CSV 文件")
+    parser.add_argument("--value", choices=PIVOT_VALUES, default="expense", help="透视表取值方式")
+    args = parser.parse_args()
+    rows = load_rows(args.start, args.end or args.start, args.dir)
+    if args.pivot:
+        pivot = build_pivot(rows)
+        write_pivot_csv(pivot, args.pivot, args.value)
+        print(f"已导出 {len(pivot.names)} 个名称 × {len(pivot.months)} 个月到 {args.pivot}")
+    else:
+        print(format_report(build_report(rows, args.by, args.top, args.measure)))
@@ -0,0 +1,73 @@
+import json
+import os
+import re
+
+from ledger import CACHE_DIR, StringTable
+
+# 会话状态：上次打开的账单、排序、滚动位置、选中项、字体大小、主题、窗口位置大小
+SESSION_FILE = os.path.join(CACHE_DIR, 'session.json')
+
+
+def load_session(path=SESSION_FILE):
+    """读取上次保存的会话状态，没有或无法读取时返回空字典"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_session(state, path=SESSION_FILE):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+    except OSError:
+        pass  # 会话状态保存失败不影响退出
+
+
+def ledger_snapshot(filename, entries):
+    """已保存的账单的条目快照，连同文件修改时间和大小，下次启动时免去解析"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    # 条目按字符串表编码：重复的名称、备注只保存一次
+    strings = StringTable()
+    codes = strings.encode(entries)
+    return {
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "strings": strings.texts,
+        "entries": codes.tolist(),
+    }
+
+
+def snapshot_entries(snapshot, filename, strings=None):
+    """文件未变时返回快照中的条目（文本放入字符串表 strings），否则返回 None（需要重新解析）"""
+    if not snapshot:
+        return None
+    try:
+        stat = os.stat(filename)
+        if stat.st_mtime_ns != snapshot["mtime"] or stat.st_size != snapshot["size"]:
+            return None
+        strings = strings or StringTable()
+        codes = [strings.code(text) for text in snapshot["strings"]]
+        entries = strings.decode(codes[code] for code in snapshot["entries"])
+        if len(entries) * 4 != len(snapshot["entries"]):
+            return None
+        return entries
+    except (OSError, KeyError, TypeError, IndexError):
+        return None
+
+
+def session_value(state, key, default):
+    """会话状态中的值，缺失或类型与默认值不符时返回默认值"""
+    value = state.get(key, default)
+    return value if type(value) is type(default) else default
+
+
+def valid_geometry(geometry):
+    """是否为 宽x高+x+y 形式的窗口位置大小"""
+    return bool(re.match(r'^\d+x\d+[+-]-?\d+[+-]-?\d+$', geometry))
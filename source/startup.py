@@ -0,0 +1,32 @@
+import sys
+import time
+
+
+class StartupProfile:
+    """记录启动各阶段的耗时（--profile-startup 时输出到标准错误）"""
+
+    def __init__(self, started, enabled=False):
+        self.started = started
+        self.last = started
+        self.enabled = enabled
+        self.phases = []
+
+    def mark(self, phase):
+        """记录上一个标记到现在的阶段耗时"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def elapsed(self):
+        """从启动到现在的总耗时（毫秒）"""
+        return (time.perf_counter() - self.started) * 1000
+
+    def report(self):
+        if not self.enabled:
+            return
+        lines = ["启动耗时:"]
+        total = 0
+        for phase, seconds in self.phases:
+            total += seconds
+            lines.append(f"  {phase:<10}{seconds * 1000:8.1f} 毫秒  (累计 {total * 1000:.1f})")
+        print("\n".join(lines), file=sys.stderr)
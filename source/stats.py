@@ -0,0 +1,496 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+
+from ledger import amount_cents, amount_value
+
+# 统计条件：日期范围、名称包含、备注包含、金额类型（全部/收入/支出）
+StatsFilter = namedtuple("StatsFilter", "start_date end_date name note amount_type")
+
+# 统计结果
+StatsResult = namedtuple("StatsResult", "count income_count expense_count income_total expense_total total")
+
+
+def normalize_filter(start_date, end_date, name, note, amount_type):
+    """规整统计条件，使等价的条件得到相同的缓存键"""
+    amount_type = amount_type if amount_type in ("收入", "支出") else "全部"
+    return StatsFilter(start_date.strip(), end_date.strip(), name.strip(), note.strip(), amount_type)
+
+
+def match_entry(entry, conditions):
+    """判断条目是否符合统计条件"""
+    start_date, end_date = conditions.start_date, conditions.end_date
+
+    # 日期筛选
+    if start_date and end_date:
+        try:
+            if not (int(start_date) <= int(entry.date) <= int(end_date)):
+                return False
+        except ValueError:
+            # 如果日期不是数字，使用字符串比较
+            if not (start_date <= entry.date <= end_date):
+                return False
+    elif start_date and entry.date != start_date:
+        return False
+    elif end_date and entry.date != end_date:
+        return False
+
+    # 名称、备注筛选
+    if conditions.name and conditions.name not in entry.name:
+        return False
+    if conditions.note and conditions.note not in entry.note:
+        return False
+
+    # 金额类型筛选
+    if conditions.amount_type == "收入" and not entry.amount.startswith('+'):
+        return False
+    if conditions.amount_type == "支出" and entry.amount.startswith('+'):
+        return False
+    return True
+
+
+def calculate_stats(entries, conditions, date_index=None):
+    """对符合条件的条目计算统计结果，条件只涉及日期时优先使用日期索引"""
+    if date_index is not None:
+        result = date_index.query(conditions)
+        if result is not None:
+            return result
+
+    count = income_count = expense_count = 0
+    income_total = expense_total = 0
+
+    for entry in entries:
+        if not match_entry(entry, conditions):
+            continue
+        try:
+            value = amount_value(entry.amount)
+        except ValueError:
+            continue  # 金额无法识别的条目不计入
+        count += 1
+        if entry.amount.startswith('+'):
+            income_count += 1
+            income_total += value
+        else:
+            expense_count += 1
+            expense_total -= value
+
+    return StatsResult(count, income_count, expense_count, income_total, expense_total,
+                       income_total - expense_total)
+
+
+def format_stats(result):
+    """将统计结果格式化为显示文本"""
+    result_text = f"符合条件的条目数: {result.count}\n"
+    result_text += f"总收入条目: {result.income_count}, 总支出条目: {result.expense_count}\n"
+    result_text += f"总收入: {result.income_total:.2f}, 总支出: {result.expense_total:.2f}\n"
+    result_text += f"净收入: {result.total:.2f}"
+    return result_text
+
+
+def date_key(date):
+    """日期文本转换为可比较的整数，非数字日期返回 None"""
+    try:
+        return int(date)
+    except ValueError:
+        return None
+
+
+class FenwickTree:
+    """树状数组：单点增减和前缀求和均为 O(log n)"""
+
+    def __init__(self, values):
+        self.tree = [0] + list(values)
+        size = len(self.tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, position, delta):
+        """第 position 个元素（从0开始）增加 delta"""
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count):
+        """前 count 个元素之和"""
+        total = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+
+class DateIndex:
+    """按日期汇总收支的前缀和索引
+
+    每个日期一格，分别用树状数组记录收入金额、收入条数、支出金额、支出条数，
+    金额以分为单位保存为整数，反复增删也不会累积浮点误差。
+    编辑时只更新对应日期的格子；出现新日期时按日期重建（一个月最多几十格）。
+    """
+
+    INCOME, INCOME_COUNT, EXPENSE, EXPENSE_COUNT = range(4)
+
+    def __init__(self, entries=()):
+        self.rebuild(entries)
+
+    def rebuild(self, entries):
+        self.buckets = {}  # 日期 -> [收入(分), 收入条数, 支出(分), 支出条数]
+        self.unindexed = 0  # 日期或金额无法解析的条目数
+        for entry in entries:
+            cell = self._cell(entry)
+            if cell is None:
+                self.unindexed += 1
+                continue
+            key, slot, cents = cell
+            bucket = self.buckets.setdefault(key, [0, 0, 0, 0])
+            bucket[slot] += cents
+            bucket[slot + 1] += 1
+        self._build()
+
+    def _build(self):
+        self.keys = sorted(self.buckets)
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.trees = [FenwickTree([self.buckets[key][slot] for key in self.keys]) for slot in range(4)]
+
+    def _cell(self, entry):
+        """返回 (日期, 收入或支出的格子, 金额分)，无法索引时返回 None
+
+        金额与 calculate_stats 的算法相同：收入为带符号金额，支出为带符号金额取反，
+        因此 -5 这样的支出记为 -5 分而不是 5 分。
+        """
+        key = date_key(entry.date)
+        if key is None:
+            return None
+        try:
+            cents = amount_cents(entry.amount)
+        except (ValueError, OverflowError):
+            return None
+        if entry.amount.startswith('+'):
+            return key, self.INCOME, cents
+        return key, self.EXPENSE, -cents
+
+    def _update(self, entry, sign):
+        cell = self._cell(entry)
+        if cell is None:
+            self.unindexed += sign
+            return
+        key, slot, cents = cell
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            # 新日期：加入后重建
+            self.buckets[key] = bucket = [0, 0, 0, 0]
+            bucket[slot] += sign * cents
+            bucket[slot + 1] += sign
+            self._build()
+            return
+        bucket[slot] += sign * cents
+        bucket[slot + 1] += sign
+        position = self.positions[key]
+        self.trees[slot].add(position, sign * cents)
+        self.trees[slot + 1].add(position, sign)
+
+    def add(self, entry):
+        self._update(entry, 1)
+
+    def remove(self, entry):
+        self._update(entry, -1)
+
+    def _range(self, start, end):
+        """日期在 [start, end] 内的各格合计"""
+        low = 0 if start is None else bisect_left(self.keys, start)
+        high = len(self.keys) if end is None else bisect_right(self.keys, end)
+        if high <= low:
+            return [0, 0, 0, 0]
+        return [tree.prefix(high) - tree.prefix(low) for tree in self.trees]
+
+    def range_totals(self, start=None, end=None):
+        """日期范围内的统计结果，索引不完整时返回 None"""
+        if self.unindexed:
+            return None
+        income, income_count, expense, expense_count = self._range(start, end)
+        return StatsResult(income_count + expense_count, income_count, expense_count,
+                           income / 100, expense / 100, (income - expense) / 100)
+
+    def balance_as_of(self, day):
+        """截至某日（含）的收支结余"""
+        result = self.range_totals(None, day)
+        return None if result is None else result.total
+
+    def query(self, conditions):
+        """只含日期范围和金额类型的条件直接由索引回答，否则返回 None"""
+        if self.unindexed or conditions.name or conditions.note:
+            return None
+        if bool(conditions.start_date) != bool(conditions.end_date):
+            # 只给出一端日期时按原逻辑精确匹配日期文本
+            return None
+        start = end = None
+        if conditions.start_date:
+            start, end = date_key(conditions.start_date), date_key(conditions.end_date)
+            if start is None or end is None:
+                return None
+        result = self.range_totals(start, end)
+        if conditions.amount_type == "收入":
+            return StatsResult(result.income_count, result.income_count, 0,
+                               result.income_total, 0, result.income_total)
+        if conditions.amount_type == "支出":
+            return StatsResult(result.expense_count, 0, result.expense_count,
+                               0, result.expense_total, -result.expense_total)
+        return result
+
+
+class RunningBalance:
+    """逐行累计结余（按账单中的顺序），编辑后只从第一个变动的位置开始重算"""
+
+    def __init__(self):
+        self.opening = 0  # 期初结余（上月结转）
+        self.balances = []
+        self.dirty_from = 0  # 从该位置起的结余需要重算
+
+    def set_opening(self, opening):
+        self.opening = opening
+        self.dirty_from = 0
+
+    def invalidate(self, index):
+        """标记从 index 开始的结余已失效"""
+        self.dirty_from = min(self.dirty_from, max(0, index))
+
+    def refresh(self, entries):
+        """重算失效部分的结余，返回第一个被重算的位置"""
+        start = min(self.dirty_from, len(entries), len(self.balances))
+        del self.balances[start:]
+        balance = self.balances[-1] if self.balances else self.opening
+        for i in range(start, len(entries)):
+            try:
+                balance = round(balance + amount_value(entries[i].amount), 2)
+            except ValueError:
+                pass
+            self.balances.append(balance)
+        self.dirty_from = len(entries)
+        return start
+
+    def closing(self):
+        """期末结余"""
+        return self.balances[-1] if self.balances else self.opening
+
+
+class NameTotals:
+    """总流水和按名称的流水合计（分），随编辑增量维护，供状态栏的总流水和同类流水使用"""
+
+    def __init__(self):
+        self.totals = None  # 名称 -> 合计；None 表示需要重建
+        self.total = 0
+
+    def invalidate(self):
+        self.totals = None
+
+    def refresh(self, entries):
+        """需要时重建合计"""
+        if self.totals is not None:
+            return
+        self.totals = {}
+        self.total = 0
+        self.update(added=entries)
+
+    def update(self, removed=(), added=()):
+        if self.totals is None:
+            return
+        for sign, entries in ((-1, removed), (1, added)):
+            for entry in entries:
+                try:
+                    cents = sign * amount_cents(entry.amount)
+                except (ValueError, OverflowError):
+                    continue
+                self.total += cents
+                self.totals[entry.name] = self.totals.get(entry.name, 0) + cents
+
+    def same_name_total(self, names):
+        """几个名称的流水合计"""
+        return sum(self.totals.get(name, 0) for name in names)
+
+
+class StatsAccumulator:
+    """某个统计条件下的统计结果，编辑后只按移除和新增的条目调整（金额以分累计）"""
+
+    def __init__(self, conditions, result):
+        self.conditions = conditions
+        self.count = result.count
+        self.income_count = result.income_count
+        self.expense_count = result.expense_count
+        self.income = round(result.income_total * 100)
+        self.expense = round(result.expense_total * 100)
+
+    def update(self, removed=(), added=()):
+        for sign, entries in ((-1, removed), (1, added)):
+            for entry in entries:
+                if not match_entry(entry, self.conditions):
+                    continue
+                try:
+                    cents = amount_cents(entry.amount)
+                except (ValueError, OverflowError):
+                    continue  # 与 calculate_stats 相同，金额无法识别的条目不计入
+                self.count += sign
+                if entry.amount.startswith('+'):
+                    self.income_count += sign
+                    self.income += sign * cents
+                else:
+                    self.expense_count += sign
+                    self.expense -= sign * cents
+
+    def result(self):
+        return StatsResult(self.count, self.income_count, self.expense_count, self.income / 100,
+                           self.expense / 100, (self.income - self.expense) / 100)
+
+
+class LiveFilter:
+    """表格上方筛选框的增量筛选
+
+    查询按空格分为几个词，条目的日期、名称、流水或备注包含全部的词即匹配（不区分大小写）。
+    数据未变且新查询只是把上次的查询加长时（上次的每个词都包含在新查询的某个词中），
+    只在上次的结果中继续筛选，不必重新扫描全部条目。
+    """
+
+    def __init__(self):
+        self.version = None  # 上次筛选时的数据版本
+        self.texts = []  # 各条目用于匹配的小写文本
+        self.terms = ()
+        self.matches = None  # 上次匹配的条目位置（按账单中的顺序）
+
+    def reset(self):
+        self.version = None
+        self.texts = []
+        self.terms = ()
+        self.matches = None
+
+    def narrows(self, terms):
+        return all(any(old in new for new in terms) for old in self.terms)
+
+    @staticmethod
+    def text(entry):
+        return f"{entry.date}\n{entry.name}\n{entry.amount}\n{entry.note}".lower()
+
+    def accepts(self, entry):
+        """条目是否符合当前的查询（未筛选时总是符合），用于编辑后只重新检查改动的条目"""
+        text = self.text(entry)
+        return all(term in text for term in self.terms)
+
+    def filter(self, entries, query, version):
+        """返回匹配的条目列表（按账单中的顺序），查询为空时返回 None"""
+        terms = tuple(query.lower().split())
+        if not terms:
+            self.terms = ()
+            self.matches = None
+            return None
+        if version != self.version or len(self.texts) != len(entries):
+            self.version = version
+            self.texts = [self.text(e) for e in entries]
+            self.matches = None
+        texts = self.texts
+        if self.matches is not None and self.narrows(terms):
+            candidates = self.matches
+        else:
+            candidates = range(len(texts))
+        # 最长的词通常最有区分度，先检查它
+        ordered = sorted(terms, key=len, reverse=True)
+        self.matches = [i for i in candidates if all(term in texts[i] for term in ordered)]
+        self.terms = terms
+        return [entries[i] for i in self.matches]
+
+
+def amount_sort_key(entry):
+    """按流水排序的键：金额数值（不区分收支），无法识别时为 0"""
+    try:
+        if entry.amount.startswith('+'):
+            return float(entry.amount[1:])
+        return float(entry.amount)
+    except ValueError:
+        return 0
+
+
+# 表格各列的排序键
+SORT_KEYS = {
+    "date": lambda entry: entry.date,
+    "name": lambda entry: entry.name,
+    "amount": amount_sort_key,
+    "note": lambda entry: entry.note,
+}
+
+
+class SortedView:
+    """排序后的显示数据及其排序键（与显示数据一一对应）
+
+    编辑时用二分查找确定新行的位置，不必重新排序；相同排序键的行按加入的先后排列，
+    与稳定排序的结果一致。
+    """
+
+    def __init__(self):
+        self.column = None
+        self.reverse = False
+        self.keys = []
+
+    def sort(self, entries, column, reverse=False):
+        """按列原地排序 entries，并记下各行的排序键"""
+        key = SORT_KEYS[column]
+        entries.sort(key=key, reverse=reverse)
+        self.column = column
+        self.reverse = reverse
+        self.keys = [key(entry) for entry in entries]
+
+    def position(self, entry):
+        """条目应插入的位置（排在排序键相同的行之后）"""
+        key = SORT_KEYS[self.column](entry)
+        keys = self.keys
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (key > keys[mid]) if self.reverse else (key < keys[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def insert(self, entries, entry):
+        """将条目插入排序后的位置，返回该位置"""
+        index = self.position(entry)
+        entries.insert(index, entry)
+        self.keys.insert(index, SORT_KEYS[self.column](entry))
+        return index
+
+    def remove(self, entries, index):
+        del entries[index]
+        del self.keys[index]
+
+
+class StatsCache:
+    """统计结果缓存，键为 (账单, 数据版本, 统计条件)，按最近最少使用淘汰"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ledger_id, version, conditions):
+        key = (ledger_id, version, conditions)
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, ledger_id, version, conditions, result):
+        key = (ledger_id, version, conditions)
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, ledger_id):
+        """丢弃某个账单的全部缓存结果（数据被编辑后调用）"""
+        for key in [k for k in self.entries if k[0] == ledger_id]:
+            del self.entries[key]
+
+    def describe(self):
+        return f"缓存命中: {self.hits}, 未命中: {self.misses}, 已缓存: {len(self.entries)}"
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from ledger import CACHE_DIR, amount_cents, list_ledger_files, parse_ledger
+
+# 月度汇总：金额均以分为单位的整数保存
+MonthSummary = namedtuple("MonthSummary", "month opening income expense closing rows content_hash mtime size")
+
+
+def content_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def summarize_entries(entries):
+    """返回 (收入分, 支出分, 条目数)，无法解析或无法换算为分的金额不计入"""
+    income = expense = 0
+    for entry in entries:
+        try:
+            cents = amount_cents(entry.amount)
+        except (ValueError, OverflowError):
+            continue
+        if cents >= 0:
+            income += cents
+        else:
+            expense -= cents
+    return income, expense, len(entries)
+
+
+class MonthChain:
+    """各月汇总组成的结转链：上月期末结余即下月期初结余
+
+    汇总缓存在 .loi/summary.json 中。刷新时只按文件修改时间和大小判断哪些月份
+    可能变动，只重读这些文件；结转只从最早变动的月份开始向后重算。
+    """
+
+    def __init__(self, directory='.'):
+        self.directory = directory
+        self.path = os.path.join(directory, CACHE_DIR, 'summary.json')
+        self.months = {}  # 年月 -> MonthSummary
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            self.months = {record[0]: MonthSummary(*record) for record in records}
+        except (OSError, ValueError, TypeError):
+            self.months = {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump([list(self.months[month]) for month in sorted(self.months)], f)
+        except OSError:
+            pass  # 缓存写不进去不影响使用，下次启动重新计算
+
+    def refresh(self):
+        """按目录中的账单文件更新汇总，返回最早变动的年月（无变动返回 None）"""
+        changed = []
+        touched = False
+        files = list_ledger_files(self.directory)
+        present = {filename[:6] for filename in files}
+        for month in list(self.months):
+            if month not in present:
+                del self.months[month]
+                changed.append(month)
+
+        for filename in files:
+            month = filename[:6]
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cached = self.months.get(month)
+            if cached is not None and cached.mtime == stat.st_mtime_ns and cached.size == stat.st_size:
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest = content_hash(content)
+            if cached is not None and cached.content_hash == digest:
+                # 内容未变，只记下新的修改时间
+                self.months[month] = cached._replace(mtime=stat.st_mtime_ns, size=stat.st_size)
+                touched = True
+                continue
+            entries = parse_ledger(content.decode('utf-8', errors='replace').splitlines(True))
+            self._set_month(month, entries, digest, stat)
+            changed.append(month)
+
+        if not changed:
+            if touched:
+                self.save()
+            return None
+        earliest = min(changed)
+        self.recompute_from(earliest)
+        return earliest
+
+    def update_month(self, filename, entries, content):
+        """某月文件保存后更新其汇总，并向后重算结转"""
+        month = os.path.basename(filename)[:6]
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return
+        # 文本模式写入时换行符会转换为系统换行符，哈希按实际写入的内容计算
+        data = content.replace('\n', os.linesep).encode('utf-8')
+        self._set_month(month, entries, content_hash(data), stat)
+        self.recompute_from(month)
+
+    def _set_month(self, month, entries, digest, stat):
+        income, expense, rows = summarize_entries(entries)
+        self.months[month] = MonthSummary(month, 0, income, expense, 0, rows, digest,
+                                          stat.st_mtime_ns, stat.st_size)
+
+    def recompute_from(self, month):
+        """从某月开始向后重算期初、期末结余并保存"""
+        months = sorted(self.months)
+        previous = [m for m in months if m < month]
+        balance = self.months[previous[-1]].closing if previous else 0
+        for current in months[len(previous):]:
+            summary = self.months[current]
+            closing = balance + summary.income - summary.expense
+            self.months[current] = summary._replace(opening=balance, closing=closing)
+            balance = closing
+        self.save()
+
+    def opening_balance(self, filename):
+        """某月的期初结余（元）：之前最近一个月的期末结余"""
+        month = os.path.basename(filename)[:6]
+        previous = [m for m in self.months if m < month]
+        return self.months[max(previous)].closing / 100 if previous else 0
+
+    def current_balance(self):
+        """全部账单的累计结余（元）"""
+        if not self.months:
+            return 0
+        return self.months[max(self.months)].closing / 100
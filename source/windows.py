@@ -0,0 +1,1005 @@
+import csv
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from ledger import BillEntry, StringTable, check_entry, iter_months, parse_pasted_rows, read_ledger
+from exporter import EXPORT_FORMATS, ExportJob, export_format
+from oplog import LOG_WARNING
+from importer import (AMOUNT_MODES, IMPORT_FORMATS, ImportMapping, LedgerImporter, detect_format,
+                      format_errors, read_columns)
+from recurring import MAX_MONTHS, RECURRING_FILE, load_rules, month_range, month_span, plan_recurring, read_existing
+from stats import StatsAccumulator, calculate_stats, date_key, format_stats, match_entry, normalize_filter
+from report import (GROUP_BY, MEASURES, PIVOT_VALUES, build_pivot, build_report, format_pivot_value,
+                    ledger_rows, load_rows, pivot_names, pivot_value, write_pivot_csv)
+
+
+def center_window_on(window, root):
+    """将子窗口居中到主窗口上"""
+    window.update_idletasks()
+    x = root.winfo_x() + (root.winfo_width() - window.winfo_width()) // 2
+    y = root.winfo_y() + (root.winfo_height() - window.winfo_height()) // 2
+    window.geometry(f"+{x}+{y}")
+
+
+class LedgerFileCache:
+    """按文件修改时间缓存已读取的账单，窗口反复重算时不必重读未变的文件"""
+
+    def __init__(self):
+        self.files = {}  # 文件名 -> (修改时间, 条目列表)
+        self.strings = StringTable()  # 各月账单共用，相同的名称、备注只保存一份
+
+    def entries(self, filename):
+        mtime = os.stat(filename).st_mtime_ns
+        cached = self.files.get(filename)
+        if cached is None or cached[0] != mtime:
+            cached = self.files[filename] = (mtime, read_ledger(filename, self.strings))
+        return cached[1]
+
+
+def iter_range_rows(app, start_month, end_month, file_cache):
+    """逐个账单地产生年月范围内的 (年月, 条目)，当前账单用内存中的数据（含未保存的修改）"""
+    for filename in iter_months(start_month, end_month):
+        entries = app.bill_data if filename == app.current_file else file_cache.entries(filename)
+        yield from ledger_rows(filename[:6], entries)
+
+
+def collect_rows(app, scope, start_month, end_month, file_cache):
+    """按范围收集 (年月, 条目)"""
+    if scope == "current":
+        if not app.current_file:
+            return []
+        return list(ledger_rows(app.current_file[:6], app.bill_data))
+    return list(iter_range_rows(app, start_month, end_month, file_cache))
+
+
+# 统计条件改变后等待多久再重算（毫秒）
+STATS_DELAY = 200
+
+# 需要逐条扫描的条目数超过此值时，在后台线程中统计
+STATS_THREAD_ROWS = 50000
+
+
+class StatsWindow:
+    """高级统计窗口（非模态）：条件改变或账单编辑后自动更新结果
+
+    编辑时只按移除和新增的条目调整结果；需要整体重算时，只涉及日期的条件用日期索引，
+    其余条件在条目很多时放到后台线程中扫描，界面线程不等待。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.accumulator = None  # 当前条件下的结果，编辑时增量调整
+        self.job = None
+        self.poll_job = None
+        self.generation = 0  # 每次整体重算加一，丢弃过时的后台结果
+        self.pending = None  # 正在后台计算的重算编号
+        self.messages = queue.Queue()
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("高级统计")
+        self.window.geometry("500x400")
+        self.window.transient(app.root)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        # 统计条件
+        condition_frame = ttk.LabelFrame(self.window, text="统计条件", padding="10")
+        condition_frame.pack(fill="x", padx=10, pady=5)
+
+        ttk.Label(condition_frame, text="日期范围:").grid(row=0, column=0, sticky="w", pady=2)
+        date_frame = ttk.Frame(condition_frame)
+        date_frame.grid(row=0, column=1, sticky="ew", pady=2)
+        self.start_date_var = tk.StringVar()
+        ttk.Entry(date_frame, textvariable=self.start_date_var, width=8).pack(side="left", padx=(0, 5))
+        ttk.Label(date_frame, text="至").pack(side="left", padx=5)
+        self.end_date_var = tk.StringVar()
+        ttk.Entry(date_frame, textvariable=self.end_date_var, width=8).pack(side="left")
+
+        ttk.Label(condition_frame, text="名称包含:").grid(row=1, column=0, sticky="w", pady=2)
+        self.name_filter_var = tk.StringVar()
+        ttk.Entry(condition_frame, textvariable=self.name_filter_var, width=20).grid(row=1, column=1, sticky="w", pady=2)
+
+        ttk.Label(condition_frame, text="备注包含:").grid(row=2, column=0, sticky="w", pady=2)
+        self.note_filter_var = tk.StringVar()
+        ttk.Entry(condition_frame, textvariable=self.note_filter_var, width=20).grid(row=2, column=1, sticky="w", pady=2)
+
+        ttk.Label(condition_frame, text="金额类型:").grid(row=3, column=0, sticky="w", pady=2)
+        self.amount_type_var = tk.StringVar(value="全部")
+        amount_frame = ttk.Frame(condition_frame)
+        amount_frame.grid(row=3, column=1, sticky="w", pady=2)
+        for value in ("全部", "收入", "支出"):
+            ttk.Radiobutton(amount_frame, text=value, variable=self.amount_type_var,
+                            value=value).pack(side="left", padx=(0, 10))
+
+        for var in (self.start_date_var, self.end_date_var, self.name_filter_var, self.note_filter_var,
+                    self.amount_type_var):
+            var.trace_add("write", self.schedule)
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Button(button_frame, text="导出", command=self.export).pack(side="left", padx=(0, 10))
+        ttk.Button(button_frame, text="关闭", command=self.close).pack(side="left")
+
+        # 结果
+        result_frame = ttk.LabelFrame(self.window, text="统计结果（随条件和账单自动更新）", padding="10")
+        result_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        self.result_var = tk.StringVar()
+        ttk.Label(result_frame, textvariable=self.result_var, wraplength=400).pack(anchor="w")
+
+        center_window_on(self.window, app.root)
+        self.refresh()
+
+    def conditions(self):
+        return normalize_filter(
+            self.start_date_var.get(),
+            self.end_date_var.get(),
+            self.name_filter_var.get(),
+            self.note_filter_var.get(),
+            self.amount_type_var.get(),
+        )
+
+    def schedule(self, *args):
+        """条件改变：合并连续的输入，稍后整体重算"""
+        self.accumulator = None
+        self.pending = None  # 正在后台计算的结果已过时
+        if self.job is not None:
+            self.window.after_cancel(self.job)
+        self.job = self.window.after(STATS_DELAY, self.refresh)
+
+    def refresh(self):
+        """按当前条件整体重算：先取缓存和日期索引，条目很多时在后台线程中扫描"""
+        self.job = None
+        self.generation += 1
+        app = self.app
+        conditions = self.conditions()
+        result = app.stats_cache.get(app.current_file, app.data_version, conditions)
+        if result is None:
+            result = app.date_index.query(conditions)
+        if result is None and len(app.bill_data) < STATS_THREAD_ROWS:
+            try:
+                result = calculate_stats(app.bill_data, conditions)
+            except ValueError as e:
+                self.result_var.set(f"统计时出错: {e}")
+                return
+        if result is not None:
+            self.pending = None
+            self.accept(conditions, result)
+            return
+
+        # 后台线程只读取条目列表的副本；期间的编辑会再次触发重算，过时的结果被丢弃
+        self.pending = self.generation
+        self.result_var.set(f"正在统计 {len(app.bill_data)} 个条目……")
+        entries = list(app.bill_data)
+        generation = self.generation
+
+        def work():
+            try:
+                self.messages.put((generation, conditions, calculate_stats(entries, conditions), None))
+            except ValueError as e:
+                self.messages.put((generation, conditions, None, str(e)))
+
+        threading.Thread(target=work, daemon=True).start()
+        if self.poll_job is None:
+            self.poll_job = self.window.after(50, self.poll)
+
+    def poll(self):
+        self.poll_job = None
+        try:
+            while True:
+                generation, conditions, result, error = self.messages.get_nowait()
+                if generation != self.pending:
+                    continue
+                self.pending = None
+                if error is not None:
+                    self.result_var.set(f"统计时出错: {error}")
+                else:
+                    self.accept(conditions, result)
+        except queue.Empty:
+            pass
+        if self.pending is not None:
+            self.poll_job = self.window.after(50, self.poll)
+
+    def accept(self, conditions, result):
+        """记下整体重算的结果，之后的编辑在此基础上增量调整"""
+        self.app.stats_cache.put(self.app.current_file, self.app.data_version, conditions, result)
+        self.accumulator = StatsAccumulator(conditions, result)
+        self.show(result)
+
+    def data_changed(self, removed=(), added=(), rebuild=False):
+        """账单被编辑（或打开了另一个账单）后由应用调用"""
+        if rebuild or self.accumulator is None or self.pending is not None:
+            self.schedule()
+            return
+        try:
+            self.accumulator.update(removed, added)
+        except ValueError:
+            self.schedule()
+            return
+        result = self.accumulator.result()
+        self.app.stats_cache.put(self.app.current_file, self.app.data_version, self.accumulator.conditions, result)
+        self.show(result)
+
+    def show(self, result):
+        app = self.app
+        conditions = self.accumulator.conditions
+        result_text = format_stats(result)
+        end_day = date_key(conditions.end_date) if conditions.end_date else None
+        if end_day is not None:
+            balance = app.date_index.balance_as_of(end_day)
+            if balance is not None:
+                result_text += f"\n截至 {conditions.end_date} 结余: {balance:.2f}"
+        self.result_var.set(result_text + "\n" + app.stats_cache.describe())
+
+    def export(self):
+        """导出符合当前统计条件的条目"""
+        if not self.app.current_file:
+            messagebox.showinfo("提示", "没有打开的账单", parent=self.window)
+            return
+        conditions = self.conditions()
+        filename = ask_export_filename(self.window)
+        if not filename:
+            return
+        month = self.app.current_file[:6]
+        rows = [(month, entry) for entry in self.app.bill_data if match_entry(entry, conditions)]
+        start_export(self.app, rows, filename)
+
+    def close(self):
+        for job in (self.job, self.poll_job):
+            if job is not None:
+                self.window.after_cancel(job)
+        self.app.stats_window = None
+        self.window.destroy()
+
+
+class ReportWindow:
+    """分组报表窗口（非模态），更改分组方式、指标或范围时立即重算"""
+
+    def __init__(self, app):
+        self.app = app
+        self.file_cache = LedgerFileCache()
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("分组报表")
+        self.window.geometry("640x520")
+        self.window.transient(app.root)
+
+        # 条件区域
+        condition_frame = ttk.LabelFrame(self.window, text="报表条件", padding="10")
+        condition_frame.pack(fill="x", padx=10, pady=5)
+
+        month = app.current_file[:6] if app.current_file else ""
+        ttk.Label(condition_frame, text="范围:").grid(row=0, column=0, sticky="w", pady=2)
+        scope_frame = ttk.Frame(condition_frame)
+        scope_frame.grid(row=0, column=1, columnspan=3, sticky="w", pady=2)
+        self.scope_var = tk.StringVar(value="current")
+        ttk.Radiobutton(scope_frame, text="当前账单", variable=self.scope_var, value="current",
+                        command=self.update_report).pack(side="left")
+        ttk.Radiobutton(scope_frame, text="年月范围", variable=self.scope_var, value="range",
+                        command=self.update_report).pack(side="left", padx=(10, 5))
+        self.start_month_var = tk.StringVar(value=month[:4] + "01" if month else "")
+        ttk.Entry(scope_frame, textvariable=self.start_month_var, width=8).pack(side="left")
+        ttk.Label(scope_frame, text="至").pack(side="left", padx=5)
+        self.end_month_var = tk.StringVar(value=month)
+        ttk.Entry(scope_frame, textvariable=self.end_month_var, width=8).pack(side="left")
+
+        ttk.Label(condition_frame, text="分组:").grid(row=1, column=0, sticky="w", pady=2)
+        self.group_by_combo = ttk.Combobox(condition_frame, values=list(GROUP_BY.values()), width=10, state="readonly")
+        self.group_by_combo.current(0)
+        self.group_by_combo.grid(row=1, column=1, sticky="w", pady=2)
+        self.group_by_combo.bind("<<ComboboxSelected>>", lambda e: self.update_report())
+
+        ttk.Label(condition_frame, text="指标:").grid(row=1, column=2, sticky="w", padx=(10, 0), pady=2)
+        self.measure_combo = ttk.Combobox(condition_frame, values=list(MEASURES.values()), width=8, state="readonly")
+        self.measure_combo.current(0)
+        self.measure_combo.grid(row=1, column=3, sticky="w", pady=2)
+        self.measure_combo.bind("<<ComboboxSelected>>", lambda e: self.update_report())
+
+        ttk.Label(condition_frame, text="前后N组:").grid(row=2, column=0, sticky="w", pady=2)
+        self.top_var = tk.StringVar(value="10")
+        top_spinbox = ttk.Spinbox(condition_frame, from_=1, to=100, textvariable=self.top_var, width=6,
+                                  command=self.update_report)
+        top_spinbox.grid(row=2, column=1, sticky="w", pady=2)
+        top_spinbox.bind("<Return>", lambda e: self.update_report())
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Button(button_frame, text="刷新", command=self.update_report).pack(side="left", padx=(0, 10))
+        ttk.Button(button_frame, text="关闭", command=self.window.destroy).pack(side="left")
+
+        # 结果区域
+        result_frame = ttk.LabelFrame(self.window, text="报表结果", padding="10")
+        result_frame.pack(fill="both", expand=True, padx=10, pady=5)
+
+        self.summary_var = tk.StringVar()
+        ttk.Label(result_frame, textvariable=self.summary_var).pack(anchor="w", pady=(0, 5))
+
+        columns = ("count", "total", "average")
+        self.tree = ttk.Treeview(result_frame, columns=columns, show="tree headings")
+        self.tree.heading("#0", text="分组")
+        self.tree.heading("count", text="条数")
+        self.tree.heading("total", text="合计")
+        self.tree.heading("average", text="平均")
+        self.tree.column("#0", width=240)
+        for column in columns:
+            self.tree.column(column, width=100, anchor="e")
+        scrollbar = ttk.Scrollbar(result_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        center_window_on(self.window, app.root)
+        self.update_report()
+
+    def selected_key(self, combo, options):
+        return list(options)[max(0, combo.current())]
+
+    def update_report(self):
+        """按当前条件重算并显示报表"""
+        try:
+            top = max(1, int(self.top_var.get()))
+        except ValueError:
+            top = 10
+        group_by = self.selected_key(self.group_by_combo, GROUP_BY)
+        measure = self.selected_key(self.measure_combo, MEASURES)
+
+        started = time.perf_counter()
+        try:
+            rows = collect_rows(self.app, self.scope_var.get(), self.start_month_var.get().strip(),
+                                self.end_month_var.get().strip(), self.file_cache)
+            report = build_report(rows, group_by, top, measure)
+        except OSError as e:
+            messagebox.showerror("错误", f"读取账单时出错: {str(e)}", parent=self.window)
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.tree.delete(*self.tree.get_children())
+        measure_text = MEASURES[measure]
+        for title, report_rows in ((f"{measure_text}最高", report.top), (f"{measure_text}最低", report.bottom)):
+            section = self.tree.insert("", "end", text=title, open=True)
+            for row in report_rows:
+                self.tree.insert(section, "end", text=row.key,
+                                 values=(row.count, f"{row.total:.2f}", f"{row.average:.2f}"))
+
+        summary = f"共 {len(report.rows)} 组，{report.row_count} 个条目，用时 {elapsed:.1f} 毫秒"
+        if report.skipped:
+            summary += f"，跳过金额无法识别的条目 {report.skipped} 个"
+        self.summary_var.set(summary)
+
+
+class PivotWindow:
+    """名称×月份 透视表窗口
+
+    账单只遍历一次得到稀疏矩阵；表格画在 Canvas 上，只绘制可见的行和列，
+    名称再多滚动也不卡。表头和名称列固定显示。
+    """
+
+    ROW_HEIGHT = 24
+    NAME_WIDTH = 160
+    CELL_WIDTH = 90
+
+    def __init__(self, app):
+        self.app = app
+        self.pivot = None
+        self.names = []
+        self.columns = []
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("透视表")
+        self.window.geometry("800x560")
+        self.window.transient(app.root)
+
+        condition_frame = ttk.Frame(self.window, padding="10")
+        condition_frame.pack(fill="x")
+
+        month = app.current_file[:6] if app.current_file else ""
+        ttk.Label(condition_frame, text="年月范围:").pack(side="left")
+        self.start_month_var = tk.StringVar(value=month[:4] + "01" if month else "")
+        ttk.Entry(condition_frame, textvariable=self.start_month_var, width=8).pack(side="left", padx=(5, 0))
+        ttk.Label(condition_frame, text="至").pack(side="left", padx=5)
+        self.end_month_var = tk.StringVar(value=month[:4] + "12" if month else "")
+        ttk.Entry(condition_frame, textvariable=self.end_month_var, width=8).pack(side="left")
+
+        ttk.Label(condition_frame, text="取值:").pack(side="left", padx=(15, 5))
+        self.value_combo = ttk.Combobox(condition_frame, values=list(PIVOT_VALUES.values()), width=6, state="readonly")
+        self.value_combo.current(0)
+        self.value_combo.pack(side="left")
+        self.value_combo.bind("<<ComboboxSelected>>", lambda e: self.update_layout())
+
+        ttk.Button(condition_frame, text="计算", command=self.compute).pack(side="left", padx=(15, 5))
+        ttk.Button(condition_frame, text="导出CSV", command=self.export_csv).pack(side="left", padx=5)
+        ttk.Button(condition_frame, text="关闭", command=self.window.destroy).pack(side="left", padx=5)
+
+        self.summary_var = tk.StringVar(value="设置年月范围后点击\"计算\"")
+        ttk.Label(self.window, textvariable=self.summary_var).pack(anchor="w", padx=10)
+
+        grid_frame = ttk.Frame(self.window)
+        grid_frame.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        self.canvas = tk.Canvas(grid_frame, bg="white", highlightthickness=0)
+        v_scrollbar = ttk.Scrollbar(grid_frame, orient=tk.VERTICAL, command=self.yview)
+        h_scrollbar = ttk.Scrollbar(grid_frame, orient=tk.HORIZONTAL, command=self.xview)
+        self.canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        v_scrollbar.grid(row=0, column=1, sticky="ns")
+        h_scrollbar.grid(row=1, column=0, sticky="ew")
+        grid_frame.columnconfigure(0, weight=1)
+        grid_frame.rowconfigure(0, weight=1)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+
+        center_window_on(self.window, app.root)
+        if month:
+            self.compute()
+
+    def value(self):
+        return list(PIVOT_VALUES)[max(0, self.value_combo.current())]
+
+    def compute(self):
+        """遍历一次年月范围内的账单，生成透视表"""
+        started = time.perf_counter()
+        try:
+            rows = iter_range_rows(self.app, self.start_month_var.get().strip(),
+                                   self.end_month_var.get().strip(), LedgerFileCache())
+            self.pivot = build_pivot(rows)
+        except OSError as e:
+            messagebox.showerror("错误", f"读取账单时出错: {str(e)}", parent=self.window)
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        summary = (f"{len(self.pivot.names)} 个名称 × {len(self.pivot.months)} 个月，"
+                   f"{self.pivot.row_count} 个条目，用时 {elapsed:.1f} 毫秒")
+        if self.pivot.skipped:
+            summary += f"，跳过金额无法识别的条目 {self.pivot.skipped} 个"
+        self.summary_var.set(summary)
+        self.update_layout()
+
+    def update_layout(self):
+        """按取值方式排列行，并更新滚动区域"""
+        if self.pivot is None:
+            return
+        self.names = pivot_names(self.pivot, self.value())
+        self.columns = self.pivot.months + ["合计"]
+        width = self.NAME_WIDTH + self.CELL_WIDTH * len(self.columns)
+        height = self.ROW_HEIGHT * (len(self.names) + 2)  # 表头 + 数据行 + 合计行
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        self.redraw()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self.redraw()
+
+    def on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        self.redraw()
+
+    def row_cells(self, row):
+        """第 row 行（0 为表头，最后一行为合计）的名称和取值函数"""
+        value = self.value()
+        if row == 0:
+            return "名称", lambda column: self.columns[column]
+        if row == len(self.names) + 1:
+            def total_cell(column):
+                if column == len(self.columns) - 1:
+                    return format_pivot_value(pivot_value(self.pivot.grand_total, value))
+                return format_pivot_value(pivot_value(self.pivot.column_totals[self.columns[column]], value))
+            return "合计", total_cell
+        name = self.names[row - 1]
+
+        def cell(column):
+            if column == len(self.columns) - 1:
+                return format_pivot_value(pivot_value(self.pivot.row_totals[name], value))
+            return format_pivot_value(pivot_value(self.pivot.cells.get((name, self.columns[column])), value))
+        return name, cell
+
+    def redraw(self):
+        """只绘制当前可见范围内的单元格"""
+        self.canvas.delete("all")
+        if self.pivot is None:
+            return
+        left = self.canvas.canvasx(0)
+        top = self.canvas.canvasy(0)
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+
+        total_rows = len(self.names) + 2
+        first_row = max(1, int(top // self.ROW_HEIGHT))
+        last_row = min(total_rows - 1, int((top + height) // self.ROW_HEIGHT))
+        first_column = max(0, int(left // self.CELL_WIDTH))
+        last_column = min(len(self.columns) - 1, int((left + width - self.NAME_WIDTH) // self.CELL_WIDTH) + 1)
+
+        def draw_row(row, y):
+            name, cell = self.row_cells(row)
+            shade = "#e9ecef" if row in (0, total_rows - 1) else "white"
+            for column in range(first_column, last_column + 1):
+                x = self.NAME_WIDTH + column * self.CELL_WIDTH
+                self.canvas.create_rectangle(x, y, x + self.CELL_WIDTH, y + self.ROW_HEIGHT,
+                                             fill=shade, outline="#dee2e6")
+                self.canvas.create_text(x + self.CELL_WIDTH - 6, y + self.ROW_HEIGHT / 2,
+                                        text=cell(column), anchor="e")
+            # 名称列固定在左侧
+            self.canvas.create_rectangle(left, y, left + self.NAME_WIDTH, y + self.ROW_HEIGHT,
+                                         fill="#e9ecef" if row else "#dee2e6", outline="#dee2e6")
+            self.canvas.create_text(left + 6, y + self.ROW_HEIGHT / 2, text=name, anchor="w")
+
+        for row in range(first_row, last_row + 1):
+            draw_row(row, row * self.ROW_HEIGHT)
+        # 表头固定在顶部
+        draw_row(0, top)
+
+    def export_csv(self):
+        if self.pivot is None:
+            messagebox.showinfo("提示", "请先计算透视表", parent=self.window)
+            return
+        filename = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                                filetypes=[("CSV 文件", "*.csv")])
+        if not filename:
+            return
+        try:
+            write_pivot_csv(self.pivot, filename, self.value())
+        except OSError as e:
+            messagebox.showerror("错误", f"导出时出错: {str(e)}", parent=self.window)
+            return
+        self.app.log_message(f"已导出透视表: {filename}")
+
+
+class RecurringWindow:
+    """周期条目窗口：按 recurring.md 中的规则为一段年月批量生成条目"""
+
+    PERIOD_LABELS = {"monthly": "每月", "weekly": "每周"}
+
+    def __init__(self, app):
+        self.app = app
+        self.rules, problems = load_rules()
+        self.plan = None
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("周期条目")
+        self.window.geometry("560x460")
+        self.window.transient(app.root)
+
+        rule_frame = ttk.LabelFrame(self.window, text=f"规则（{RECURRING_FILE}）", padding="10")
+        rule_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        if not self.rules:
+            ttk.Label(rule_frame, text="没有规则。在 recurring.md 中添加表格：\n"
+                                       "| 周期 | 日期 | 名称 | 流水 | 备注 |\n"
+                                       "周期填\"每月\"（日期为几号）或\"每周\"（日期为星期几，1为周一）").pack(anchor="w")
+        columns = ("period", "day", "name", "amount", "note")
+        tree = ttk.Treeview(rule_frame, columns=columns, show="headings", height=6)
+        for column, text, width in zip(columns, ("周期", "日期", "名称", "流水", "备注"), (60, 50, 120, 80, 160)):
+            tree.heading(column, text=text)
+            tree.column(column, width=width)
+        for rule in self.rules:
+            tree.insert("", "end", values=(self.PERIOD_LABELS[rule.period], rule.day, rule.name, rule.amount, rule.note))
+        tree.pack(fill="both", expand=True)
+        if problems:
+            text = "以下规则有误，不会生成条目：\n" + "\n".join(f"{name}: {problem}" for name, problem in problems)
+            ttk.Label(rule_frame, text=text, foreground="red", justify="left").pack(anchor="w", pady=(5, 0))
+            app.log_message(f"{RECURRING_FILE} 中有 {len(problems)} 条规则有误，已跳过", LOG_WARNING)
+
+        range_frame = ttk.Frame(self.window, padding="10")
+        range_frame.pack(fill="x")
+        month = app.current_file[:6] if app.current_file else datetime.now().strftime("%Y%m")
+        ttk.Label(range_frame, text="年月范围:").pack(side="left")
+        self.start_month_var = tk.StringVar(value=month)
+        ttk.Entry(range_frame, textvariable=self.start_month_var, width=8).pack(side="left", padx=(5, 0))
+        ttk.Label(range_frame, text="至").pack(side="left", padx=5)
+        self.end_month_var = tk.StringVar(value=month)
+        ttk.Entry(range_frame, textvariable=self.end_month_var, width=8).pack(side="left")
+        ttk.Button(range_frame, text="预览", command=self.preview).pack(side="left", padx=(15, 5))
+        ttk.Button(range_frame, text="生成", command=self.generate).pack(side="left", padx=5)
+        ttk.Button(range_frame, text="关闭", command=self.window.destroy).pack(side="left", padx=5)
+
+        self.preview_var = tk.StringVar(value="已存在的相同条目（日期、名称、流水相同）不会重复生成")
+        ttk.Label(self.window, textvariable=self.preview_var, justify="left").pack(anchor="w", padx=10, pady=(0, 10))
+
+        center_window_on(self.window, app.root)
+
+    def existing(self, filename):
+        """某月已有的条目，当前账单用内存中的数据"""
+        if filename == self.app.current_file:
+            return self.app.bill_data
+        return read_existing(filename)
+
+    def preview(self):
+        start, end = self.start_month_var.get().strip(), self.end_month_var.get().strip()
+        month_pattern = r'^\d{4}(0[1-9]|1[0-2])$'
+        if not (re.match(month_pattern, start) and re.match(month_pattern, end)) or start > end:
+            messagebox.showwarning("警告", "请输入正确的年月范围，如 202401 至 202412", parent=self.window)
+            return None
+        if month_span(start, end) > MAX_MONTHS:
+            messagebox.showwarning("警告", f"一次最多生成 {MAX_MONTHS} 个月的条目", parent=self.window)
+            return None
+        try:
+            self.plan = plan_recurring(self.rules, month_range(start, end), self.existing)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"读取账单时出错: {str(e)}", parent=self.window)
+            return None
+        if not self.plan:
+            self.preview_var.set("没有需要生成的条目")
+        else:
+            lines = [f"{filename[:6]}: {len(entries)} 个条目" for filename, entries in self.plan.items()]
+            total = sum(len(entries) for entries in self.plan.values())
+            self.preview_var.set(f"共 {total} 个条目，写入 {len(self.plan)} 个账单\n" + "，".join(lines))
+        return self.plan
+
+    def generate(self):
+        plan = self.preview()
+        if not plan:
+            return
+        self.app.apply_batch(plan, "生成周期条目")
+        self.window.destroy()
+
+
+class ImportWindow:
+    """导入窗口：选择 CSV / JSON Lines 文件，指定各列对应的字段后批量导入"""
+
+    # 按列名猜测列映射时使用的关键词
+    COLUMN_HINTS = {
+        "date": ("日期", "时间", "date", "time"),
+        "name": ("名称", "对方", "商户", "交易对象", "name", "payee", "description"),
+        "amount": ("流水", "金额", "amount"),
+        "note": ("备注", "摘要", "说明", "note", "memo"),
+    }
+    FIELDS = (("date", "日期"), ("name", "名称"), ("amount", "流水"), ("note", "备注"))
+
+    def __init__(self, app):
+        self.app = app
+        self.columns = []
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("导入账单")
+        self.window.geometry("560x520")
+        self.window.transient(app.root)
+
+        file_frame = ttk.LabelFrame(self.window, text="导入文件", padding="10")
+        file_frame.pack(fill="x", padx=10, pady=5)
+        self.file_var = tk.StringVar()
+        ttk.Entry(file_frame, textvariable=self.file_var, width=45).grid(row=0, column=0, columnspan=2, sticky="we")
+        ttk.Button(file_frame, text="浏览", command=self.choose_file).grid(row=0, column=2, padx=(5, 0))
+        ttk.Label(file_frame, text="格式:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        self.format_combo = ttk.Combobox(file_frame, values=list(IMPORT_FORMATS.values()), width=12, state="readonly")
+        self.format_combo.current(0)
+        self.format_combo.grid(row=1, column=1, sticky="w", pady=(5, 0))
+        self.format_combo.bind("<<ComboboxSelected>>", lambda e: self.load_columns())
+
+        mapping_frame = ttk.LabelFrame(self.window, text="列对应", padding="10")
+        mapping_frame.pack(fill="x", padx=10, pady=5)
+        self.field_combos = {}
+        for row, (field, label) in enumerate(self.FIELDS):
+            ttk.Label(mapping_frame, text=f"{label}:").grid(row=row, column=0, sticky="w", pady=2)
+            combo = ttk.Combobox(mapping_frame, width=20, state="readonly")
+            combo.grid(row=row, column=1, sticky="w", pady=2)
+            self.field_combos[field] = combo
+        ttk.Label(mapping_frame, text="金额格式:").grid(row=len(self.FIELDS), column=0, sticky="w", pady=2)
+        self.amount_mode_combo = ttk.Combobox(mapping_frame, values=list(AMOUNT_MODES.values()), width=20,
+                                              state="readonly")
+        self.amount_mode_combo.current(0)
+        self.amount_mode_combo.grid(row=len(self.FIELDS), column=1, sticky="w", pady=2)
+        ttk.Label(mapping_frame, text="日期需带年份，条目按日期写入对应月份的账单").grid(
+            row=len(self.FIELDS) + 1, column=0, columnspan=2, sticky="w", pady=(5, 0))
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Button(button_frame, text="导入", command=self.run_import).pack(side="left", padx=(0, 10))
+        ttk.Button(button_frame, text="关闭", command=self.window.destroy).pack(side="left")
+
+        self.status_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.status_var).pack(anchor="w", padx=10)
+        self.error_text = tk.Text(self.window, height=8, wrap="none")
+        self.error_text.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+
+        center_window_on(self.window, app.root)
+
+    def file_format(self):
+        return list(IMPORT_FORMATS)[max(0, self.format_combo.current())]
+
+    def choose_file(self):
+        filename = filedialog.askopenfilename(parent=self.window, filetypes=[
+            ("CSV 文件", "*.csv"), ("JSON Lines 文件", "*.jsonl *.json *.ndjson"), ("所有文件", "*.*")])
+        if not filename:
+            return
+        self.file_var.set(filename)
+        self.format_combo.current(list(IMPORT_FORMATS).index(detect_format(filename)))
+        self.load_columns()
+
+    def load_columns(self):
+        """读取列名并按列名猜测各字段对应的列"""
+        filename = self.file_var.get().strip()
+        if not filename:
+            return
+        try:
+            self.columns = read_columns(filename, self.file_format())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"读取导入文件时出错: {str(e)}", parent=self.window)
+            return
+        for field, combo in self.field_combos.items():
+            choices = self.columns + ([""] if field == "note" else [])
+            combo['values'] = choices
+            guess = next((column for column in self.columns
+                          if any(hint in column.lower() for hint in self.COLUMN_HINTS[field])), "")
+            combo.set(guess)
+
+    def run_import(self):
+        filename = self.file_var.get().strip()
+        mapping = ImportMapping(*(self.field_combos[field].get() for field, _ in self.FIELDS),
+                                list(AMOUNT_MODES)[max(0, self.amount_mode_combo.current())])
+        if not filename or not (mapping.date and mapping.name and mapping.amount):
+            messagebox.showwarning("警告", "请选择导入文件，并指定日期、名称和流水对应的列", parent=self.window)
+            return
+
+        def progress(imported, error_count):
+            self.status_var.set(f"已读取 {imported} 条，出错 {error_count} 条……")
+            self.window.update_idletasks()
+
+        importer = LedgerImporter(mapping)
+        try:
+            result = importer.stage(filename, self.file_format(), progress)
+            if result.imported:
+                self.app.apply_batch(importer.plan, f"导入 {os.path.basename(filename)}")
+        except (OSError, ValueError, csv.Error) as e:
+            # ValueError 包括文件不是 UTF-8 编码时的 UnicodeDecodeError
+            self.status_var.set("导入失败")
+            messagebox.showerror("错误", f"导入时出错: {str(e)}", parent=self.window)
+            return
+        finally:
+            importer.close()
+
+        self.status_var.set(f"导入 {result.imported} 条，出错 {result.error_count} 条")
+        self.error_text.delete("1.0", tk.END)
+        if result.error_count:
+            self.error_text.insert(tk.END, format_errors(result))
+            self.app.log_message(f"导入时有 {result.error_count} 行出错，未导入")
+
+
+def ask_export_filename(parent):
+    """选择导出文件，格式由扩展名决定；取消或格式不支持时返回 None"""
+    filename = filedialog.asksaveasfilename(parent=parent, defaultextension=".csv", filetypes=[
+        (f"{label} 文件", f"*{extension}") for extension, label in EXPORT_FORMATS.items()])
+    if not filename:
+        return None
+    if export_format(filename) is None:
+        messagebox.showwarning("警告", "只支持导出为 " + "、".join(EXPORT_FORMATS), parent=parent)
+        return None
+    return filename
+
+
+def start_export(app, rows, filename):
+    """在后台线程中导出 (年月, 条目) 序列，进度显示在日志区域
+
+    rows 在后台线程中遍历，不能直接引用会被编辑的列表，调用方需传入副本。
+    """
+    messages = queue.Queue()
+    ExportJob(rows, filename, messages).start()
+    app.log_message(f"开始导出: {filename}")
+
+    def poll():
+        try:
+            while True:
+                kind, value = messages.get_nowait()
+                if kind == "progress":
+                    app.log_message(f"已导出 {value} 行……")
+                elif kind == "done":
+                    app.log_message(f"导出完成: {value} 行，{filename}")
+                    return
+                else:
+                    app.log_message(f"导出失败: {value}")
+                    messagebox.showerror("错误", f"导出时出错: {value}")
+                    return
+        except queue.Empty:
+            pass
+        app.root.after(200, poll)
+
+    app.root.after(200, poll)
+
+
+class ExportWindow:
+    """导出窗口：导出当前视图或年月范围内的账单"""
+
+    def __init__(self, app):
+        self.app = app
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("导出")
+        self.window.geometry("420x180")
+        self.window.transient(app.root)
+
+        scope_frame = ttk.LabelFrame(self.window, text="导出范围", padding="10")
+        scope_frame.pack(fill="x", padx=10, pady=5)
+        month = app.current_file[:6] if app.current_file else ""
+        self.scope_var = tk.StringVar(value="view")
+        ttk.Radiobutton(scope_frame, text="当前视图（按当前排序）", variable=self.scope_var,
+                        value="view").grid(row=0, column=0, columnspan=4, sticky="w")
+        ttk.Radiobutton(scope_frame, text="年月范围", variable=self.scope_var,
+                        value="range").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        self.start_month_var = tk.StringVar(value=month[:4] + "01" if month else "")
+        ttk.Entry(scope_frame, textvariable=self.start_month_var, width=8).grid(row=1, column=1, pady=(5, 0))
+        ttk.Label(scope_frame, text="至").grid(row=1, column=2, padx=5, pady=(5, 0))
+        self.end_month_var = tk.StringVar(value=month)
+        ttk.Entry(scope_frame, textvariable=self.end_month_var, width=8).grid(row=1, column=3, pady=(5, 0))
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Button(button_frame, text="导出", command=self.export).pack(side="left", padx=(0, 10))
+        ttk.Button(button_frame, text="关闭", command=self.window.destroy).pack(side="left")
+        ttk.Label(self.window, text="格式由文件扩展名决定：" + "、".join(EXPORT_FORMATS)).pack(anchor="w", padx=10)
+
+        center_window_on(self.window, app.root)
+
+    def export(self):
+        if self.scope_var.get() == "view":
+            if not self.app.current_file:
+                messagebox.showinfo("提示", "没有打开的账单", parent=self.window)
+                return
+            rows = list(ledger_rows(self.app.current_file[:6], self.app.display_data))
+        else:
+            start, end = self.start_month_var.get().strip(), self.end_month_var.get().strip()
+            if not start or not end or start > end:
+                messagebox.showwarning("警告", "请输入正确的年月范围，如 202401 至 202412", parent=self.window)
+                return
+            # 当前账单用内存中的副本（含未保存的修改），其余账单在后台线程中逐个读取
+            overrides = {self.app.current_file: list(self.app.bill_data)} if self.app.current_file else None
+            rows = load_rows(start, end, '.', overrides)
+        filename = ask_export_filename(self.window)
+        if not filename:
+            return
+        start_export(self.app, rows, filename)
+        self.window.destroy()
+
+
+class BulkEntryWindow:
+    """批量录入窗口：粘贴或逐格填写多行条目，全部校验通过后一次插入
+
+    双击单元格编辑，回车或 Tab 确认（Tab 跳到下一格）。
+    """
+
+    FIELDS = (("date", "日期", 90), ("name", "名称", 140), ("amount", "流水", 90), ("note", "备注", 180))
+
+    def __init__(self, app):
+        self.app = app
+        self.rows = []  # 每行 [日期, 名称, 流水, 备注]
+        self.editor = None
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("批量录入")
+        self.window.geometry("720x480")
+        self.window.transient(app.root)
+
+        button_frame = ttk.Frame(self.window, padding="10")
+        button_frame.pack(fill="x")
+        ttk.Button(button_frame, text="从剪贴板粘贴", command=self.paste).pack(side="left", padx=(0, 5))
+        ttk.Button(button_frame, text="添加空行", command=self.add_row).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="删除选中行", command=self.delete_rows).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="全部插入", command=self.insert_all).pack(side="left", padx=(20, 5))
+        ttk.Button(button_frame, text="关闭", command=self.window.destroy).pack(side="left", padx=5)
+
+        ttk.Label(self.window, text="每行一个条目，可从表格软件复制（制表符分隔）或粘贴逗号分隔的文本，"
+                                    "列顺序为 日期、名称、流水、备注").pack(anchor="w", padx=10)
+
+        grid_frame = ttk.Frame(self.window)
+        grid_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        columns = [field for field, _, _ in self.FIELDS] + ["problem"]
+        self.tree = ttk.Treeview(grid_frame, columns=columns, show="headings", selectmode="extended")
+        for field, text, width in self.FIELDS:
+            self.tree.heading(field, text=text)
+            self.tree.column(field, width=width)
+        self.tree.heading("problem", text="问题")
+        self.tree.column("problem", width=180)
+        self.tree.tag_configure("invalid", foreground="#dc3545")
+        scrollbar = ttk.Scrollbar(grid_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", self.on_double_click)
+        # 正在编辑单元格时 Ctrl+V 只粘贴到输入框中
+        self.window.bind("<Control-v>", lambda e: self.paste() if self.editor is None else None)
+        self.window.bind("<Control-V>", lambda e: self.paste() if self.editor is None else None)
+
+        self.status_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.status_var).pack(anchor="w", padx=10, pady=(0, 10))
+
+        center_window_on(self.window, app.root)
+        self.paste(quiet=True)
+
+    def paste(self, quiet=False):
+        """把剪贴板中的多行文本追加为条目"""
+        try:
+            text = self.window.clipboard_get()
+        except tk.TclError:
+            text = ""
+        rows = parse_pasted_rows(text)
+        if not rows:
+            if not quiet:
+                messagebox.showinfo("提示", "剪贴板中没有可识别的条目", parent=self.window)
+            return
+        self.rows.extend(rows)
+        self.refresh()
+
+    def add_row(self):
+        self.rows.append(["", "", "", ""])
+        self.refresh()
+        last = self.tree.get_children()[-1]
+        self.tree.see(last)
+        self.edit_cell(last, 0)
+
+    def delete_rows(self):
+        indices = sorted((self.tree.index(item) for item in self.tree.selection()), reverse=True)
+        for index in indices:
+            del self.rows[index]
+        self.refresh()
+
+    def refresh(self):
+        """重新校验全部行并刷新表格"""
+        self.tree.delete(*self.tree.get_children())
+        invalid = 0
+        for row in self.rows:
+            problem = check_entry(*row)
+            invalid += bool(problem)
+            self.tree.insert("", "end", values=row + [problem], tags=("invalid",) if problem else ())
+        self.status_var.set(f"共 {len(self.rows)} 行，有问题 {invalid} 行")
+
+    def on_double_click(self, event):
+        item = self.tree.identify_row(event.y)
+        column = self.tree.identify_column(event.x)
+        if not item or not column:
+            return
+        index = int(column[1:]) - 1
+        if index < len(self.FIELDS):
+            self.edit_cell(item, index)
+
+    def edit_cell(self, item, column_index):
+        """在单元格上放一个输入框进行编辑"""
+        self.close_editor()
+        bbox = self.tree.bbox(item, f"#{column_index + 1}")
+        if not bbox:
+            return
+        row_index = self.tree.index(item)
+        x, y, width, height = bbox
+        var = tk.StringVar(value=self.rows[row_index][column_index])
+        editor = ttk.Entry(self.tree, textvariable=var)
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+        editor.select_range(0, tk.END)
+
+        def commit(move=0):
+            self.rows[row_index][column_index] = var.get().strip()
+            self.close_editor()
+            self.refresh()
+            next_column = column_index + move
+            if move and next_column < len(self.FIELDS):
+                self.edit_cell(self.tree.get_children()[row_index], next_column)
+            return "break"
+
+        editor.bind("<Return>", lambda e: commit())
+        editor.bind("<Tab>", lambda e: commit(1))
+        editor.bind("<Escape>", lambda e: self.close_editor())
+        editor.bind("<FocusOut>", lambda e: commit() if self.editor is editor else None)
+        self.editor = editor
+
+    def close_editor(self):
+        if self.editor is not None:
+            editor, self.editor = self.editor, None
+            editor.destroy()
+
+    def insert_all(self):
+        """全部行校验通过后一次插入到当前账单"""
+        if not self.app.current_file:
+            messagebox.showwarning("警告", "没有打开的文件", parent=self.window)
+            return
+        self.close_editor()
+        problems = [i + 1 for i, row in enumerate(self.rows) if check_entry(*row)]
+        if problems:
+            messagebox.showwarning("警告", f"第 {', '.join(map(str, problems[:10]))} 行有问题，请修改后再插入",
+                                   parent=self.window)
+            return
+        if not self.rows:
+            return
+        self.app.insert_entries([BillEntry(*row) for row in self.rows])
+        self.window.destroy()
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "source"))
+
+from ledger import BillEntry, read_ledger, write_ledger  # noqa: E402
+from test_sorted_edit import SortedEditApp  # noqa: E402
+
+
+class ApplyBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        write_ledger("202401.md", [BillEntry("03", "工资", "+1000", "")])
+        write_ledger("202402.md", [BillEntry("01", "午饭", "20", ""), BillEntry("09", "晚饭", "30", "")])
+        self.app = SortedEditApp(read_ledger("202402.md"))
+        self.app.file_combo = {}
+        self.app.current_file = "202402.md"
+        self.app.file_var.set("202402.md")
+        self.app.load_available_files()
+        self.app.refresh_opening_balance()
+        self.app.refresh_treeview()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def balances(self):
+        return [self.app.tree.item(item, "values")[4] for item in self.app.tree.get_children()]
+
+    def test_current_month_writes_only_batch_rows(self):
+        app = self.app
+        # 未保存的修改
+        app.bill_data[0] = app.strings.entry("01", "午饭", "25")
+        app.modified = True
+        app.apply_batch({"202402.md": [BillEntry("05", "房租", "500", "")]}, "测试")
+
+        on_disk = [(e.date, e.name, e.amount) for e in read_ledger("202402.md")]
+        self.assertEqual(on_disk, [("01", "午饭", "20"), ("05", "房租", "500"), ("09", "晚饭", "30")])
+        self.assertEqual([e.amount for e in app.bill_data], ["25", "500", "30"])
+        self.assertTrue(app.modified)
+
+    def test_earlier_month_updates_opening_balance(self):
+        self.assertEqual(self.balances(), ["980.00", "950.00"])
+        self.app.apply_batch({"202401.md": [BillEntry("20", "奖金", "+100", "")]}, "测试")
+        self.assertEqual(self.balances(), ["1080.00", "1050.00"])
+
+    def test_undecodable_ledger_is_restored(self):
+        with open("202401.md", "rb") as f:
+            original = f.read()
+        with open("202403.md", "wb") as f:
+            f.write(b"| 01 | \xff\xfe | 1 | |\n")
+        plan = {"202401.md": [BillEntry("20", "奖金", "+100", "")],
+                "202403.md": [BillEntry("02", "车费", "5", "")]}
+        with mock.patch("appbase.messagebox") as messagebox:
+            self.app.apply_batch(plan, "测试")
+        messagebox.showerror.assert_called_once()
+        with open("202401.md", "rb") as f:
+            self.assertEqual(f.read(), original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,298 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "source"))
+
+from appbase import BillAppBase  # noqa: E402
+from ledger import BillEntry  # noqa: E402
+from stats import SORT_KEYS  # noqa: E402
+
+COLUMNS = ("date", "name", "amount", "note", "balance")
+
+
+class FakeVar:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeRoot:
+    """只记录 after 回调，不运行事件循环"""
+
+    def __init__(self):
+        self.jobs = 0
+
+    def after(self, ms, callback):
+        self.jobs += 1
+        return f"after#{self.jobs}"
+
+    def after_idle(self, callback):
+        return self.after(0, callback)
+
+    def after_cancel(self, job):
+        pass
+
+
+class FakeTree:
+    """Treeview 中用到的部分：只有顶层行，行的值按列保存"""
+
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.selected = ()
+        self.headings = {column: {"text": column} for column in COLUMNS}
+        self.count = 0
+
+    def insert(self, parent, index, values=()):
+        self.count += 1
+        item = f"I{self.count}"
+        self.rows.insert(len(self.rows) if index == "end" else index, item)
+        self.values[item] = tuple(values)
+        return item
+
+    def index(self, item):
+        return self.rows.index(item)
+
+    def move(self, item, parent, index):
+        self.rows.remove(item)
+        self.rows.insert(index, item)
+
+    def item(self, item, option=None, values=None):
+        if values is not None:
+            self.values[item] = tuple(values)
+        return self.values[item]
+
+    def set(self, item, column, value):
+        values = list(self.values[item]) + [""] * len(COLUMNS)
+        values[COLUMNS.index(column)] = value
+        self.values[item] = tuple(values[:len(COLUMNS)])
+
+    def delete(self, *items):
+        for item in items:
+            self.rows.remove(item)
+            del self.values[item]
+
+    def get_children(self, parent=""):
+        return tuple(self.rows)
+
+    def exists(self, item):
+        return item in self.values
+
+    def heading(self, column, text=None):
+        if text is not None:
+            self.headings[column]["text"] = text
+        return self.headings[column]
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, items):
+        self.selected = tuple([items] if isinstance(items, str) else items)
+
+    def focus(self, item):
+        pass
+
+    def see(self, item):
+        pass
+
+
+class SortedEditApp(BillAppBase):
+    def __init__(self, entries):
+        self.root = FakeRoot()
+        self.init_state()
+        self.tree = FakeTree()
+        for name in ("date_var", "name_var", "amount_var", "note_var", "total_var", "selected_var",
+                     "same_type_var", "budget_var", "balance_var", "filter_var", "file_var"):
+            setattr(self, name, FakeVar())
+        self.bill_data = [self.strings.entry(e.date, e.name, e.amount, e.note) for e in entries]
+        self.display_data = list(self.bill_data)
+        self.show_balance = True
+        self.running_balance.set_opening(0)
+        self.refresh_treeview()
+
+    def select(self, *positions):
+        rows = self.tree.get_children()
+        self.selected_items = [rows[i] for i in positions]
+        self.tree.selection_set(self.selected_items)
+
+    def fill_form(self, date, name, amount, note=""):
+        self.date_var.set(date)
+        self.name_var.set(name)
+        self.amount_var.set(amount)
+        self.note_var.set(note)
+
+    def set_filter(self, query):
+        self.filter_var.set(query)
+        self.apply_filter()
+
+
+class ViewEditCase(unittest.TestCase):
+    def setUp(self):
+        # 会话、预算等文件都从当前目录读取，放到空的临时目录中
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        entries = [BillEntry(f"{i % 28 + 1:02d}", f"名称{i % 5}", f"{(i * 37) % 101 + 1}", "") for i in range(30)]
+        self.app = SortedEditApp(entries)
+        self.app.sort_treeview("amount")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def assert_consistent(self, query="", column="amount"):
+        app = self.app
+        rows = app.tree.get_children()
+        # 表格中的行与 display_data 一致
+        shown = [app.tree.item(item, "values")[:4] for item in rows]
+        self.assertEqual(shown, [(e.date, e.name, e.amount, e.note) for e in app.display_data])
+        # display_data 恰好是账单中符合筛选的条目
+        terms = query.lower().split()
+        expected = [e for e in app.bill_data
+                    if all(term in f"{e.date}\n{e.name}\n{e.amount}\n{e.note}".lower() for term in terms)]
+        if column is None:
+            self.assertEqual([id(e) for e in app.display_data], [id(e) for e in expected])
+        else:
+            # 仍按该列排序，且排序键跟上了编辑
+            self.assertEqual(sorted(map(id, app.display_data)), sorted(map(id, expected)))
+            key = SORT_KEYS[column]
+            self.assertEqual([key(e) for e in app.display_data], sorted(key(e) for e in app.display_data))
+            self.assertEqual(app.sorted_view.keys, [key(e) for e in app.display_data])
+        self.assertEqual(app.sort_column, column)
+        self.assertEqual(app.applied_filter, query)
+        # 结余列与按账单顺序重新计算的结果一致
+        balance = 0
+        balances = {}
+        for entry in app.bill_data:
+            sign = 1 if entry.amount.startswith('+') else -1
+            balance = round(balance + sign * float(entry.amount.lstrip('+')), 2)
+            balances[id(entry)] = f"{balance:.2f}"
+        for item, entry in zip(rows, app.display_data):
+            self.assertEqual(app.tree.item(item, "values")[4], balances[id(entry)])
+
+class SortedEditWithBalanceTest(ViewEditCase):
+    def test_update_keeps_sort_and_balances(self):
+        self.app.select(3)
+        self.app.fill_form("05", "改", "500")
+        self.app.update_item()
+        self.assertEqual(self.app.sort_column, "amount")
+        self.assert_consistent()
+        self.assertEqual(self.app.tree.item(self.app.selected_items[0], "values")[2], "500")
+
+        # 排序键必须跟上编辑：之后插入的条目仍落在正确的位置
+        self.app.select(0)
+        self.app.fill_form("06", "新", "250")
+        self.app.add_item()
+        self.assert_consistent()
+
+    def test_delete_keeps_sort_and_balances(self):
+        self.app.select(2, 7, 11)
+        self.app.delete_item()
+        self.assertEqual(self.app.sort_column, "amount")
+        self.assertEqual(len(self.app.bill_data), 27)
+        self.assert_consistent()
+
+        self.app.select(5)
+        self.app.fill_form("07", "改", "1")
+        self.app.update_item()
+        self.assert_consistent()
+
+    def test_add_keeps_sort_and_balances(self):
+        self.app.select(4)
+        self.app.fill_form("08", "新", "+40.5")
+        self.app.add_item()
+        self.assertEqual(len(self.app.bill_data), 31)
+        self.assert_consistent()
+        self.assertEqual(self.app.tree.item(self.app.tree.selection()[0], "values")[2], "+40.5")
+
+    def test_paste_keeps_sort_and_balances(self):
+        pasted = [BillEntry("12", "粘贴", amount, "") for amount in ("3", "+60", "99.5", "3")]
+        self.app.select(6)
+        self.app.insert_entries(pasted)
+        self.assertEqual(len(self.app.bill_data), 34)
+        self.assert_consistent()
+        self.assertEqual(len(self.app.selected_items), 4)
+
+
+class FilteredEditTest(ViewEditCase):
+    """筛选（以及筛选加排序）时，编辑只重新检查改动的条目，不清空筛选和排序"""
+
+    def setUp(self):
+        super().setUp()
+        self.app.set_filter("名称1")
+
+    def test_update_moves_or_hides_rows(self):
+        app = self.app
+        count = len(app.display_data)
+        app.select(1)
+        app.fill_form("05", "名称1", "500")
+        app.update_item()
+        self.assert_consistent("名称1")
+        self.assertEqual(len(app.display_data), count)
+        self.assertEqual(app.tree.item(app.selected_items[0], "values")[2], "500")
+
+        # 改名后不再符合筛选的行移出表格
+        app.select(0, 2)
+        app.fill_form("06", "其他", "3")
+        app.update_item()
+        self.assert_consistent("名称1")
+        self.assertEqual(len(app.display_data), count - 2)
+        self.assertEqual(app.selected_items, [])
+
+    def test_add_respects_filter(self):
+        app = self.app
+        count = len(app.display_data)
+        app.select(0)
+        app.fill_form("09", "名称1", "77")
+        app.add_item()
+        self.assert_consistent("名称1")
+        self.assertEqual(len(app.display_data), count + 1)
+
+        # 不符合筛选的新条目只加入账单
+        app.fill_form("10", "其他", "88")
+        app.add_item()
+        self.assert_consistent("名称1")
+        self.assertEqual(len(app.display_data), count + 1)
+        self.assertEqual(len(app.bill_data), 32)
+
+    def test_delete_keeps_filter(self):
+        app = self.app
+        count = len(app.display_data)
+        app.select(0, 3)
+        app.delete_item()
+        self.assert_consistent("名称1")
+        self.assertEqual(len(app.display_data), count - 2)
+
+    def test_paste_respects_filter(self):
+        app = self.app
+        count = len(app.display_data)
+        app.insert_entries([BillEntry("12", "名称1", "5", ""), BillEntry("13", "其他", "6", ""),
+                            BillEntry("14", "名称1", "+200", "")])
+        self.assert_consistent("名称1")
+        self.assertEqual(len(app.display_data), count + 2)
+        self.assertEqual(len(app.selected_items), 2)
+
+    def test_filter_without_sort(self):
+        app = self.app
+        app.reset_display()
+        app.set_filter("名称2")
+        app.select(2)
+        app.fill_form("01", "名称2", "+9")
+        app.add_item()
+        app.select(1)
+        app.fill_form("11", "名称2", "12")
+        app.update_item()
+        app.select(0)
+        app.delete_item()
+        self.assert_consistent("名称2", column=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
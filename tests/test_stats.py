@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "source"))
+
+from ledger import BillEntry  # noqa: E402
+from stats import DateIndex, StatsAccumulator, calculate_stats, normalize_filter  # noqa: E402
+
+
+class DateIndexTest(unittest.TestCase):
+    def test_index_agrees_with_scan_on_mixed_signs(self):
+        entries = [BillEntry("01", "a", "-5"), BillEntry("02", "b", "10"), BillEntry("02", "c", "+3"),
+                   BillEntry("03", "d", "+-2"), BillEntry("03", "e", "7.25")]
+        index = DateIndex(entries)
+        for start, end in (("", ""), ("1", "2"), ("2", "3"), ("3", "3")):
+            for amount_type in ("全部", "收入", "支出"):
+                conditions = normalize_filter(start, end, "", "", amount_type)
+                expected = calculate_stats(entries, conditions)
+                result = index.query(conditions)
+                for field in expected._fields:
+                    self.assertAlmostEqual(getattr(result, field), getattr(expected, field),
+                                           msg=(start, end, amount_type, field))
+
+    def test_incremental_updates_match_scan(self):
+        entries = [BillEntry("01", "a", "-5"), BillEntry("02", "b", "10")]
+        index = DateIndex(entries)
+        conditions = normalize_filter("", "", "", "", "全部")
+        accumulator = StatsAccumulator(conditions, index.query(conditions))
+        added = [BillEntry("02", "c", "+3"), BillEntry("04", "d", "-1.5")]
+        for entry in added:
+            index.add(entry)
+        index.remove(entries[1])
+        accumulator.update(removed=[entries[1]], added=added)
+        expected = calculate_stats([entries[0]] + added, conditions)
+        for result in (index.query(conditions), accumulator.result()):
+            for field in expected._fields:
+                self.assertAlmostEqual(getattr(result, field), getattr(expected, field), msg=field)
+
+
+if __name__ == "__main__":
+    unittest.main()